@@ -1,21 +1,40 @@
 """
 API Endpoints برای جست‌وجو
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, HttpUrl
+import asyncio
+import json
+import time
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse, JSONResponse
+from pydantic import BaseModel, HttpUrl, Field
 from typing import Optional, List, Dict, Any
 from core.rag_engine import rag_engine
 from api.config import settings, update_openai_config
-from core.openai_client import openai_client
+from core.openai_client import openai_client, LLMError, LLMClientError
+from core.ingest_jobs import ingest_job_manager
+from db.document_store import document_store
+from db.search_history import search_history
+from core.metrics import start_request, span, observe
+from core.text_processing import normalize_cache_stats
 
 router = APIRouter()
 
 
+async def require_ready():
+    """رد درخواست‌های وابسته به مدل Embedding تا پایان آماده‌سازی موتور"""
+    if not rag_engine.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=rag_engine.startup_error or "سرویس در حال آماده‌سازی است؛ لطفاً کمی بعد تلاش کنید"
+        )
+
+
 class SearchRequest(BaseModel):
     """مدل درخواست جست‌وجو"""
     query: str
     use_web_search: bool = False
     top_k: int = 5
+    include_timings: bool = False  # بازگرداندن زمان مراحل و توکن‌های مصرفی
 
 
 class SearchResponse(BaseModel):
@@ -24,6 +43,8 @@ class SearchResponse(BaseModel):
     sources: List[str]
     query: str
     search_results: List[Dict[str, Any]]
+    timings: Optional[Dict[str, float]] = None  # میلی‌ثانیه به ازای هر مرحله
+    usage: Optional[Dict[str, int]] = None  # توکن‌های مدل زبانی
 
 
 class IngestURLRequest(BaseModel):
@@ -31,6 +52,30 @@ class IngestURLRequest(BaseModel):
     url: HttpUrl
 
 
+class IngestJobRequest(BaseModel):
+    """مدل درخواست کار افزودن چند URL"""
+    urls: List[HttpUrl] = Field(..., min_length=1)
+
+
+class CrawlJobRequest(BaseModel):
+    """مدل درخواست کار کراول وب‌سایت"""
+    url: HttpUrl
+    max_pages: int = Field(10, ge=1)
+    include_paths: Optional[List[str]] = None
+
+
+class DocumentInput(BaseModel):
+    """سند ورودی کار افزودن دسته‌ای"""
+    url: str = Field(..., min_length=1)
+    title: str = ""
+    content: Optional[str] = None  # در صورت خالی بودن، صفحه دریافت می‌شود
+
+
+class DocumentsJobRequest(BaseModel):
+    """مدل درخواست کار افزودن دسته‌ای اسناد"""
+    documents: List[DocumentInput] = Field(..., min_length=1)
+
+
 class ConfigRequest(BaseModel):
     """مدل درخواست تنظیمات"""
     api_key: str
@@ -44,7 +89,7 @@ class ConfigResponse(BaseModel):
     model: str
 
 
-@router.post("/search", response_model=SearchResponse)
+@router.post("/search", response_model=SearchResponse, dependencies=[Depends(require_ready)])
 async def search(request: SearchRequest):
     """
     جست‌وجوی هوشمند با RAG
@@ -52,19 +97,76 @@ async def search(request: SearchRequest):
     - **query**: پرسش فارسی کاربر
     - **use_web_search**: استفاده از جست‌وجوی وب (پیش‌فرض: False)
     - **top_k**: تعداد نتایج (پیش‌فرض: 5)
+    - **include_timings**: زمان هر مرحله (normalize، embed، vector_search، ...) و توکن‌ها در پاسخ
     """
+    request_metrics = start_request()
     try:
-        result = rag_engine.process_query(
-            query=request.query,
-            use_web_search=request.use_web_search,
-            top_k=request.top_k
-        )
+        with span("total"):
+            result = await rag_engine.process_query(
+                query=request.query,
+                use_web_search=request.use_web_search,
+                top_k=request.top_k
+            )
+        if request.include_timings:
+            result = {**result, "timings": request_metrics.timings, "usage": request_metrics.tokens}
         return SearchResponse(**result)
+    except LLMClientError as e:
+        # سرویس مدل زبانی درخواست را رد کرد (کلید، مدل یا پارامتر نامعتبر): تکرار بی‌فایده است
+        raise HTTPException(status_code=502, detail=f"سرویس مدل زبانی درخواست را رد کرد: {str(e)}")
+    except LLMError as e:
+        # کندی یا خطای سرویس مدل زبانی: خطای موقت، قابل تکرار توسط کاربر
+        raise HTTPException(status_code=503, detail=f"سرویس مدل زبانی در دسترس نیست: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطا در پردازش جست‌وجو: {str(e)}")
 
 
-@router.post("/ingest-url")
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """قالب‌بندی یک رویداد Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/search/stream", dependencies=[Depends(require_ready)])
+async def search_stream(request: SearchRequest):
+    """
+    جست‌وجوی هوشمند با RAG به صورت stream (Server-Sent Events)
+    
+    ابتدا رویداد `sources` با نتایج بازیابی ارسال می‌شود، سپس رویدادهای `token`
+    با تکه‌های پاسخ و در پایان رویداد `done`. در صورت خطا رویداد `error` ارسال می‌شود
+    (خطای مدل زبانی با status برابر 503).
+    با include_timings، رویداد `done` شامل زمان مراحل و توکن‌ها است.
+    """
+    async def event_stream():
+        request_metrics = start_request()
+        started = time.perf_counter()
+        try:
+            async for event, data in rag_engine.stream_query(
+                query=request.query,
+                use_web_search=request.use_web_search,
+                top_k=request.top_k
+            ):
+                if event == "done":
+                    observe("total", time.perf_counter() - started)
+                    if request.include_timings:
+                        data = {**data, "timings": request_metrics.timings, "usage": request_metrics.tokens}
+                yield _sse_event(event, data)
+        except LLMClientError as e:
+            yield _sse_event("error", {"detail": f"سرویس مدل زبانی درخواست را رد کرد: {str(e)}", "status": 502})
+        except LLMError as e:
+            yield _sse_event("error", {"detail": f"سرویس مدل زبانی در دسترس نیست: {str(e)}", "status": 503})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"خطا در پردازش جست‌وجو: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # جلوگیری از بافر شدن در nginx
+        }
+    )
+
+
+@router.post("/ingest-url", dependencies=[Depends(require_ready)])
 async def ingest_url(request: IngestURLRequest):
     """
     افزودن URL به پایگاه داده
@@ -72,12 +174,86 @@ async def ingest_url(request: IngestURLRequest):
     - **url**: آدرس صفحه وب برای کراول و افزودن
     """
     try:
-        result = rag_engine.ingest_url(str(request.url))
+        result = await rag_engine.ingest_url(str(request.url))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطا در افزودن URL: {str(e)}")
 
 
+@router.post("/ingest-jobs", status_code=202, dependencies=[Depends(require_ready)])
+async def create_ingest_job(request: IngestJobRequest):
+    """
+    ثبت کار پس‌زمینه برای افزودن یک یا چند URL
+    
+    - **urls**: لیست آدرس‌ها؛ شناسه کار بلافاصله برگردانده می‌شود
+    """
+    job = ingest_job_manager.submit_urls([str(url) for url in request.urls])
+    return job.to_dict(include_items=False)
+
+
+@router.post("/ingest-jobs/crawl", status_code=202, dependencies=[Depends(require_ready)])
+async def create_crawl_job(request: CrawlJobRequest):
+    """
+    ثبت کار پس‌زمینه برای کراول یک وب‌سایت و افزودن صفحات آن
+    
+    - **url**: آدرس شروع کراول
+    - **max_pages**: حداکثر تعداد صفحات (پیش‌فرض: 10)
+    - **include_paths**: الگوی مسیرهای مجاز (اختیاری)
+    """
+    job = ingest_job_manager.submit_crawl(
+        str(request.url),
+        max_pages=request.max_pages,
+        include_paths=request.include_paths
+    )
+    return job.to_dict(include_items=False)
+
+
+@router.post("/ingest-jobs/documents", status_code=202, dependencies=[Depends(require_ready)])
+async def create_documents_job(request: DocumentsJobRequest):
+    """
+    ثبت کار پس‌زمینه برای افزودن دسته‌ای اسناد با خط لوله چند-process
+    
+    - **documents**: لیست اسناد (url، title و content)؛ نرمال‌سازی و تقسیم در processهای
+      جداگانه و Embedding/ذخیره به صورت دسته‌ای انجام می‌شود
+    """
+    job = ingest_job_manager.submit_documents([document.model_dump() for document in request.documents])
+    return job.to_dict(include_items=False)
+
+
+@router.post("/ingest-jobs/refresh", status_code=202, dependencies=[Depends(require_ready)])
+async def refresh_documents():
+    """
+    ثبت کار به‌روزرسانی همه URLهای دریافت‌شده با Firecrawl
+    
+    صفحات بدون تغییر نادیده گرفته می‌شوند و فقط تکه‌های تغییرکرده Embedding می‌شوند.
+    اسناد با محتوای ارسال‌شده (ingest.py و /ingest-jobs/documents) به‌روزرسانی نمی‌شوند.
+    """
+    urls = await asyncio.to_thread(document_store.list_refreshable_urls)
+    job = ingest_job_manager.submit_urls(urls)
+    return job.to_dict(include_items=False)
+
+
+@router.get("/ingest-jobs")
+async def list_ingest_jobs():
+    """لیست کارهای افزودن (جدیدترین ابتدا)"""
+    return [job.to_dict(include_items=False) for job in ingest_job_manager.list()]
+
+
+@router.get("/ingest-jobs/metrics")
+async def ingest_jobs_metrics():
+    """معیارهای throughput افزودن (صفحه در دقیقه، تکه در ثانیه)"""
+    return ingest_job_manager.metrics()
+
+
+@router.get("/ingest-jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """وضعیت و پیشرفت یک کار افزودن"""
+    job = ingest_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="کار موردنظر یافت نشد")
+    return job.to_dict()
+
+
 @router.get("/config", response_model=ConfigResponse)
 async def get_config():
     """
@@ -114,10 +290,60 @@ async def update_config(request: ConfigRequest):
         raise HTTPException(status_code=500, detail=f"خطا در به‌روزرسانی تنظیمات: {str(e)}")
 
 
+@router.get("/cache/stats")
+async def cache_stats():
+    """آمار کش معنایی پاسخ‌ها، کش Embeddingها و کش نرمال‌سازی پرسش‌ها (hit/miss)"""
+    if rag_engine.cache is None:
+        answers = {"enabled": False}
+    else:
+        answers = {"enabled": True, **rag_engine.cache.stats()}
+    
+    return {
+        "answers": answers,
+        "embeddings": rag_engine.vector_store.embedding_cache.stats(),
+        "normalize": normalize_cache_stats()
+    }
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """پاک کردن کش معنایی پاسخ‌ها و کش Embeddingها"""
+    if rag_engine.cache is not None:
+        rag_engine.cache.clear()
+    rag_engine.vector_store.embedding_cache.clear()
+    return {
+        "success": True,
+        "message": "✅ کش پاک شد"
+    }
+
+
+@router.get("/search-history/stats")
+async def search_history_stats():
+    """وضعیت ذخیره تاریخچه جست‌وجوها (رکوردهای در انتظار، ذخیره‌شده و دور ریخته‌شده)"""
+    return search_history.stats()
+
+
 @router.get("/health")
 async def health_check():
-    """بررسی سلامت API"""
+    """بررسی سلامت API (زنده بودن process؛ مستقل از بارگذاری مدل)"""
     return {
         "status": "healthy",
         "message": "🚀 API در حال اجرا است"
     }
+
+
+@router.get("/ready")
+async def readiness_check():
+    """آمادگی پاسخ به جست‌وجو و افزودن (مدل Embedding و اتصال Qdrant آماده شده‌اند)"""
+    if rag_engine.ready:
+        return {
+            "status": "ready",
+            "message": "✅ سرویس آماده است"
+        }
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "failed" if rag_engine.startup_error else "starting",
+            "message": rag_engine.startup_error or "⏳ سرویس در حال آماده‌سازی است"
+        }
+    )
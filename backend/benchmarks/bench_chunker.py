@@ -0,0 +1,102 @@
+"""
+بنچمارک تقسیم‌بندی اسناد بزرگ: زمان و اوج مصرف حافظه
+
+نمونه اجرا:
+    python -m benchmarks.bench_chunker --sizes 1 4 16
+
+برای هر اندازه (مگابایت) یک صفحه فارسی مصنوعی با پاراگراف و جمله ساخته می‌شود و
+روش قبلی (word_tokenize و join روی پنجره کلمات) با chunker جریانی مقایسه می‌شود.
+اوج حافظه با tracemalloc و نسبت به حافظه متن ورودی اندازه‌گیری می‌شود.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable, Iterable, List
+
+from hazm import word_tokenize
+
+from api.config import settings
+from core.chunker import iter_chunks
+
+
+SAMPLE_SENTENCES = [
+    "هوش مصنوعی شاخه‌ای از علوم رایانه است که به ساخت ماشین‌های هوشمند می‌پردازد.",
+    "تهران پایتخت ایران و پرجمعیت‌ترین شهر کشور است.",
+    "یادگیری ماشین به سیستم‌ها امکان می‌دهد از داده‌ها بیاموزند!",
+    "آیا زبان فارسی در سال‌های اخیر در وب رشد کرده است؟",
+    "کتابخانه‌های متن‌باز زیادی برای پردازش زبان طبیعی فارسی وجود دارد.",
+]
+
+
+def make_document(size_mb: float, seed: int = 0) -> str:
+    """ساخت متن مصنوعی با اندازه تقریبی size_mb مگابایت (UTF-8)"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    paragraphs: List[str] = []
+    total = 0
+    while total < target:
+        paragraph = " ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(3, 12)))
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode()) + 2
+    return "\n\n".join(paragraphs)
+
+
+def legacy_chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """پیاده‌سازی قبلی RAGEngine.chunk_text (برای مقایسه)"""
+    words = word_tokenize(text)
+    chunks = []
+    for i in range(0, len(words), chunk_size - overlap):
+        chunk = ' '.join(words[i:i + chunk_size])
+        if chunk:
+            chunks.append(chunk)
+    return chunks
+
+
+def consume(chunks: Iterable[str]):
+    """مصرف تکه‌ها بدون نگه‌داشتن آن‌ها (مانند pipeline جریانی)"""
+    count = 0
+    total_chars = 0
+    for chunk in chunks:
+        count += 1
+        total_chars += len(chunk)
+    return count, total_chars
+
+
+def measure(name: str, chunker: Callable[[str], Iterable[str]], text: str):
+    """اجرای chunker روی متن و چاپ زمان، تعداد تکه و اوج حافظه"""
+    # زمان بدون tracemalloc اندازه‌گیری می‌شود (tracemalloc تخصیص‌ها را کند می‌کند)
+    started = time.perf_counter()
+    count, total_chars = consume(chunker(text))
+    elapsed = time.perf_counter() - started
+    
+    tracemalloc.start()
+    consume(chunker(text))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(
+        f"  {name:<10} {elapsed:8.2f}s  {count:7d} chunks  "
+        f"{total_chars / max(elapsed, 1e-9) / 1e6:7.2f} Mchar/s  peak {peak / 1024 / 1024:8.1f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک chunker")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--chunk-size", type=int, default=settings.chunk_size)
+    parser.add_argument("--overlap", type=int, default=settings.chunk_overlap)
+    parser.add_argument("--skip-legacy", action="store_true", help="اجرا نکردن روش قبلی (کند روی اسناد بزرگ)")
+    args = parser.parse_args()
+    
+    for size in args.sizes:
+        text = make_document(size)
+        print(f"📄 {size:g} MB ({len(text):,} کاراکتر)، chunk_size={args.chunk_size}, overlap={args.overlap}")
+        
+        if not args.skip_legacy:
+            measure("legacy", lambda t: legacy_chunk_text(t, args.chunk_size, args.overlap), text)
+        measure("streaming", lambda t: iter_chunks(t, args.chunk_size, args.overlap), text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+بنچمارک backendهای Embedding: تأخیر، throughput و کیفیت بازیابی روی پرسش‌های فارسی
+
+نمونه اجرا:
+    python -m benchmarks.bench_embedding_backends \\
+        sentence-transformers/paraphrase-multilingual-mpnet-base-v2 \\
+        onnx:./models/mpnet-onnx openai:text-embedding-3-small --onnx-int8
+
+هر backend با همان مقدار EMBEDDING_MODEL مشخص می‌شود. کیفیت با recall@1 و MRR
+بازیابی متن درست از میان همه متن‌های مجموعه ارزیابی (شباهت کسینوسی) سنجیده می‌شود.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from api.config import settings
+from db.embedding_backends import create_embedding_backend, EmbeddingBackend
+
+
+# (پرسش، متن مرتبط)
+EVAL_SET: List[Tuple[str, str]] = [
+    ("پایتخت ایران کجاست؟", "تهران پایتخت و بزرگ‌ترین شهر ایران است و مرکز استان تهران به شمار می‌رود."),
+    ("بلندترین کوه ایران", "قله دماوند با ارتفاع حدود ۵۶۱۰ متر بلندترین کوه ایران و آتشفشانی خاموش در رشته‌کوه البرز است."),
+    ("حافظ چه کسی بود؟", "خواجه شمس‌الدین محمد حافظ شیرازی شاعر بزرگ قرن هشتم هجری و صاحب دیوان غزلیات است."),
+    ("نوروز چه زمانی است", "نوروز جشن آغاز سال نو در ایران است که در اعتدال بهاری و نخستین روز فروردین برگزار می‌شود."),
+    ("طرز تهیه قورمه سبزی", "برای پخت قورمه سبزی سبزی سرخ‌شده، لوبیا قرمز، گوشت و لیمو عمانی را با هم می‌پزند."),
+    ("دریای خزر", "دریای خزر بزرگ‌ترین دریاچه جهان است که در شمال ایران قرار دارد و به دریای مازندران نیز مشهور است."),
+    ("چطور رمز عبور امن بسازم", "یک گذرواژه امن دست‌کم دوازده نویسه دارد و ترکیبی از حروف، اعداد و نمادها را به کار می‌برد."),
+    ("مزایای ورزش منظم", "فعالیت بدنی منظم خطر بیماری‌های قلبی را کاهش می‌دهد و خواب و خلق‌وخو را بهتر می‌کند."),
+    ("فردوسی شاهنامه را کی سرود", "ابوالقاسم فردوسی سرودن شاهنامه را حدود سی سال به طول انجامید و آن را در اوایل قرن پنجم به پایان رساند."),
+    ("تخت جمشید کجاست", "تخت جمشید مجموعه کاخ‌های هخامنشی در نزدیکی شهر مرودشت استان فارس است."),
+    ("یادگیری ماشین چیست", "یادگیری ماشین شاخه‌ای از هوش مصنوعی است که در آن الگوریتم‌ها از روی داده الگو می‌آموزند."),
+    ("قیمت نفت چرا بالا رفت", "کاهش تولید کشورهای صادرکننده و افزایش تقاضای جهانی باعث افزایش بهای نفت خام شد."),
+    ("چگونه زبان انگلیسی یاد بگیرم", "برای یادگیری زبان خارجی تمرین روزانه، شنیدن پادکست و گفت‌وگو با گویشوران بومی مؤثر است."),
+    ("علائم سرماخوردگی", "آبریزش بینی، گلودرد، سرفه و تب خفیف از نشانه‌های رایج سرماخوردگی هستند."),
+    ("بهترین زمان سفر به اصفهان", "بهار و پاییز به دلیل هوای معتدل مناسب‌ترین فصل‌ها برای دیدن میدان نقش جهان و سی‌وسه‌پل هستند."),
+    ("فتوسنتز چیست", "گیاهان در فرایند فتوسنتز با نور خورشید، آب و دی‌اکسید کربن را به قند و اکسیژن تبدیل می‌کنند."),
+    ("تیم ملی فوتبال ایران", "تیم ملی فوتبال ایران چندین بار به جام جهانی راه یافته و سه بار قهرمان جام ملت‌های آسیا شده است."),
+    ("نرخ تورم را چگونه حساب می‌کنند", "تورم از مقایسه شاخص قیمت سبد کالاها و خدمات مصرفی در دو دوره زمانی به دست می‌آید."),
+    ("زلزله بم", "زمین‌لرزه سال ۱۳۸۲ بم بخش بزرگی از شهر و ارگ تاریخی آن را ویران کرد."),
+    ("مولوی اهل کجا بود", "جلال‌الدین محمد بلخی معروف به مولوی در بلخ زاده شد و بیشتر عمر خود را در قونیه گذراند."),
+    ("چرا آسمان آبی است", "پراکندگی نور خورشید توسط مولکول‌های هوا در طول‌موج‌های کوتاه‌تر باعث آبی دیده شدن آسمان می‌شود."),
+    ("پایتون برای چه استفاده می‌شود", "زبان برنامه‌نویسی پایتون در تحلیل داده، توسعه وب، خودکارسازی و هوش مصنوعی کاربرد دارد."),
+    ("مالیات بر ارزش افزوده", "مالیات بر ارزش افزوده درصدی از بهای کالا و خدمات است که در هر مرحله از زنجیره عرضه دریافت می‌شود."),
+    ("خواص زعفران", "زعفران ادویه‌ای گران‌بها است که به بهبود خلق و هضم غذا کمک می‌کند و بیشتر در خراسان کشت می‌شود."),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+async def evaluate(backend: EmbeddingBackend, executor: ThreadPoolExecutor, throughput_texts: int, batch_size: int):
+    queries = [query for query, _ in EVAL_SET]
+    passages = [passage for _, passage in EVAL_SET]
+    
+    # گرم کردن (بارگذاری lazy، ساخت گراف)
+    await backend.aencode(queries[:2], executor)
+    
+    # تأخیر پرسش تکی
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        await backend.aencode([query], executor)
+        latencies.append((time.perf_counter() - started) * 1000)
+    
+    # throughput در batchهای اسناد
+    corpus = (passages * (throughput_texts // len(passages) + 1))[:throughput_texts]
+    started = time.perf_counter()
+    for start in range(0, len(corpus), batch_size):
+        await backend.aencode(corpus[start:start + batch_size], executor)
+    throughput = len(corpus) / (time.perf_counter() - started)
+    
+    # کیفیت بازیابی
+    query_vectors = np.asarray(await backend.aencode(queries, executor), dtype=np.float32)
+    passage_vectors = np.asarray(await backend.aencode(passages, executor), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    passage_vectors /= np.linalg.norm(passage_vectors, axis=1, keepdims=True)
+    scores = query_vectors @ passage_vectors.T
+    ranks = (scores > scores[np.arange(len(queries)), np.arange(len(queries))][:, None]).sum(axis=1) + 1
+    
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "throughput": throughput,
+        "recall@1": float((ranks == 1).mean()),
+        "mrr": float((1.0 / ranks).mean())
+    }
+
+
+async def main(args):
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+    runs = []
+    for spec in args.backends:
+        runs.append((spec, False))
+        if args.onnx_int8 and spec.startswith("onnx:"):
+            runs.append((spec, True))
+    
+    print(f"📊 {len(EVAL_SET)} جفت پرسش/متن فارسی، throughput روی {args.texts} متن در batchهای {args.batch_size} تایی")
+    print(f"{'backend':<50} {'dim':>5} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>9} {'R@1':>6} {'MRR':>6}")
+    
+    for spec, int8 in runs:
+        settings.embedding_onnx_quantize = int8
+        label = spec + (" (int8)" if int8 else "")
+        started = time.perf_counter()
+        try:
+            backend = create_embedding_backend(spec)
+            await backend.initialize()
+        except Exception as e:
+            print(f"{label:<50} ❌ {e}")
+            continue
+        load_seconds = time.perf_counter() - started
+        try:
+            result = await evaluate(backend, executor, args.texts, args.batch_size)
+        finally:
+            await backend.close()
+        print(
+            f"{label:<50} {backend.dimension:5d} {load_seconds:7.1f} {result['p50']:8.1f} {result['p95']:8.1f} "
+            f"{result['throughput']:9.1f} {result['recall@1']:6.2f} {result['mrr']:6.3f}"
+        )
+    
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="بنچمارک backendهای Embedding")
+    parser.add_argument("backends", nargs="*", default=[settings.embedding_model], help="مقادیر EMBEDDING_MODEL")
+    parser.add_argument("--onnx-int8", action="store_true", help="اجرای نسخه int8 هر backend onnx")
+    parser.add_argument("--texts", type=int, default=256, help="تعداد متن‌ها در آزمون throughput")
+    parser.add_argument("--batch-size", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
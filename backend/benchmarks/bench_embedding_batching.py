@@ -0,0 +1,106 @@
+"""
+بنچمارک micro-batching برای Embedding پرسش‌های همزمان
+
+نمونه اجرا:
+    python -m benchmarks.bench_embedding_batching --queries 512 --concurrency 1 8 32 128
+
+برای هر سطح همزمانی، پرسش‌ها یک‌بار با encode تکی (batch یک‌عضوی) و یک‌بار
+از طریق EmbeddingBatcher پردازش می‌شوند و queries/sec به ازای هر هسته گزارش می‌شود.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Awaitable, List
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from api.config import settings
+from db.embedding_batcher import EmbeddingBatcher
+
+
+SAMPLE_QUERIES = [
+    "هوش مصنوعی چیست",
+    "تاریخچه ایران باستان",
+    "یادگیری ماشین چگونه کار می‌کند",
+    "بهترین روش یادگیری زبان انگلیسی",
+    "آب و هوای تهران در زمستان",
+]
+
+
+async def run_level(
+    embed: Callable[[str], Awaitable[np.ndarray]],
+    queries: List[str],
+    concurrency: int
+) -> float:
+    """اجرای پرسش‌ها با همزمانی مشخص و بازگرداندن queries/sec"""
+    pending = iter(queries)
+    
+    async def worker():
+        for query in pending:
+            await embed(query)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(queries) / (time.perf_counter() - started)
+
+
+async def main_async(args):
+    model = SentenceTransformer(settings.embedding_model)
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    loop = asyncio.get_running_loop()
+    cores = torch.get_num_threads()
+    
+    async def encode(texts: List[str]) -> np.ndarray:
+        return await loop.run_in_executor(executor, partial(model.encode, texts))
+    
+    async def embed_single(text: str) -> np.ndarray:
+        return (await encode([text]))[0]
+    
+    # گرم کردن مدل
+    await encode(SAMPLE_QUERIES)
+    
+    # پرسش‌های یکتا تا اثر کش در نتایج دخیل نباشد
+    queries = [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} {i}" for i in range(args.queries)]
+    
+    print(f"model: {settings.embedding_model}  torch threads: {cores}  encode workers: {args.workers}")
+    print(f"{'concurrency':>11} {'single q/s':>11} {'batched q/s':>12} {'speedup':>8} {'q/s/core':>9} {'avg batch':>10}")
+    
+    for concurrency in args.concurrency:
+        single_qps = await run_level(embed_single, queries, concurrency)
+        
+        batcher = EmbeddingBatcher(
+            encode_fn=encode,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+            max_concurrent_batches=args.workers
+        )
+        batched_qps = await run_level(batcher.embed, queries, concurrency)
+        avg_batch = batcher.stats()["avg_batch_size"]
+        await batcher.close()
+        
+        print(
+            f"{concurrency:>11} {single_qps:>11.1f} {batched_qps:>12.1f} "
+            f"{batched_qps / single_qps:>7.2f}x {batched_qps / cores:>9.1f} {avg_batch:>10.1f}"
+        )
+    
+    executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک micro-batching Embedding")
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--max-batch-size", type=int, default=settings.embedding_batch_max_size)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.embedding_batch_max_wait_ms)
+    parser.add_argument("--workers", type=int, default=settings.embedding_workers)
+    args = parser.parse_args()
+    
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
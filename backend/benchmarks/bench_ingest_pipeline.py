@@ -0,0 +1,97 @@
+"""
+بنچمارک خط لوله افزودن دسته‌ای: تکه در ثانیه بر حسب تعداد processها
+
+نمونه اجرا:
+    python -m benchmarks.bench_ingest_pipeline --documents 200 --doc-kb 20 --workers 1 2 4 8
+
+Qdrant در حالت memory و دیتابیس در یک فایل SQLite موقت اجرا می‌شود. برای هر
+تعداد process مجموعه جدیدی از اسناد (با URL متفاوت) افزوده می‌شود؛ خط پایه
+افزودن همزمان با ingest_document (نرمال‌سازی در thread) است.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# پیش از بارگذاری تنظیمات
+os.environ["QDRANT_MODE"] = "memory"
+os.environ.setdefault("VECTOR_DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite3")
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+
+from benchmarks.bench_chunker import make_document  # noqa: E402
+from api.config import settings  # noqa: E402
+from db.models import init_db  # noqa: E402
+from core.rag_engine import rag_engine  # noqa: E402
+from core.ingest_pipeline import IngestPipeline  # noqa: E402
+
+
+def make_documents(run: str, count: int, doc_kb: float):
+    return [
+        {"url": f"https://bench.local/{run}/{i}", "title": f"سند {i}", "content": make_document(doc_kb / 1024, seed=i)}
+        for i in range(count)
+    ]
+
+
+async def run_baseline(documents, concurrency: int):
+    """افزودن با ingest_document و همزمانی محدود (روش workerهای صف کار)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    chunks = 0
+    
+    async def ingest(document):
+        nonlocal chunks
+        async with semaphore:
+            result = await rag_engine.ingest_document(document["url"], document["title"], document["content"])
+            chunks += result.get("added", 0)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*[ingest(document) for document in documents])
+    elapsed = time.perf_counter() - started
+    return chunks, elapsed
+
+
+async def run_pipeline(documents, workers: int, batch_size: int):
+    pipeline = IngestPipeline(rag_engine, process_workers=workers, encode_batch_size=batch_size)
+    
+    async def source():
+        for document in documents:
+            yield document
+    
+    try:
+        # راه‌اندازی processها خارج از زمان‌سنجی
+        await asyncio.get_running_loop().run_in_executor(pipeline._get_pool(), len, "")
+        stats = await pipeline.run(source())
+    finally:
+        pipeline.close()
+    return stats["embedded"], stats["elapsed_seconds"]
+
+
+async def main(args):
+    init_db()
+    await rag_engine.initialize()
+    
+    print(f"📄 {args.documents} سند × {args.doc_kb:g} KB، مدل {settings.embedding_model}، {os.cpu_count()} هسته")
+    print(f"{'mode':<14} {'chunks':>8} {'seconds':>9} {'chunks/s':>10}")
+    
+    # محتوای یکسان در همه اجراها؛ کش Embedding پیش از هر اجرا خالی می‌شود
+    documents = make_documents("baseline", args.documents, args.doc_kb)
+    rag_engine.vector_store.embedding_cache.clear()
+    chunks, elapsed = await run_baseline(documents, settings.ingest_workers)
+    print(f"{'baseline':<14} {chunks:8d} {elapsed:9.2f} {chunks / elapsed:10.1f}")
+    
+    for workers in args.workers:
+        documents = make_documents(f"w{workers}", args.documents, args.doc_kb)
+        rag_engine.vector_store.embedding_cache.clear()
+        chunks, elapsed = await run_pipeline(documents, workers, args.batch_size)
+        print(f"{f'pipeline x{workers}':<14} {chunks:8d} {elapsed:9.2f} {chunks / max(elapsed, 1e-9):10.1f}")
+    
+    await rag_engine.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="بنچمارک خط لوله افزودن")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--doc-kb", type=float, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_encode_batch_size)
+    asyncio.run(main(parser.parse_args()))
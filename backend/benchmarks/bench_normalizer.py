@@ -0,0 +1,205 @@
+"""
+بنچمارک مسیر سریع نرمال‌سازی فارسی در برابر Normalizer پیش‌فرض hazm
+
+نمونه اجرا:
+    python -m benchmarks.bench_normalizer --queries 5000 --sizes 1 4 --workers 4 --output results/normalizer.json
+
+- مرجع همان پیاده‌سازی قبلی است: فشرده‌سازی فاصله‌ها، hazm.Normalizer().normalize و strip
+- پرسش‌های کوتاه: مرجع، مسیر سریع بدون حافظه و مسیر سریع با LRU (پرسش‌های تکراری)
+- پاراگراف‌ها و اسناد بزرگ (make_document): مرجع، مسیر سریع و نرمال‌سازی چند-process
+  (batchهای normalize_batch_chars نویسه‌ای)
+- یکسان بودن خروجی روی همه ورودی‌ها و یک مجموعه تصادفی (fuzz) بررسی می‌شود؛ در صورت
+  تفاوت، برنامه با کد ۱ خارج می‌شود
+"""
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List
+
+from api.config import settings
+from benchmarks.bench_chunker import make_document, SAMPLE_SENTENCES
+from benchmarks.bench_text import make_queries, timed_runs
+from benchmarks.report import BenchReport, latency_stats
+from core import text_processing
+from core.text_processing import (
+    PersianNormalizer, WHITESPACE_PATTERN, PARAGRAPH_PATTERN, normalize_document, normalize_paragraphs,
+    paragraph_batches, get_normalizer
+)
+
+
+# ورودی‌های مرزی برای fuzz (نویسه‌های عربی، ارقام، نیم‌فاصله، علائم، اعراب و ...)
+FUZZ_TOKENS = list(
+    "يكىۀةأإؤئ٠١٢٣٤٥٦٧٨٩0123456789%٪\"“”.…:!،؛؟«»()[]{}‌‌َِّٰﷲ﷼ﻻـ\r\n "
+) + [
+    "...", "می ", "نمی", "ها", " ی ", "تر", "سلاممم", "۱۰.۵", "\"نقل\"", "ه ", " ای",
+    "https://x.y/z", "hello, world", "کتاب ها", "زمین لرزه", "می روم", "نمی دانم"
+]
+
+
+def make_reference() -> Callable[[str], str]:
+    """normalize_text پیش از مسیر سریع"""
+    from hazm import Normalizer
+    normalizer = Normalizer()
+    
+    def normalize(text: str) -> str:
+        return normalizer.normalize(WHITESPACE_PATTERN.sub(' ', text)).strip()
+    
+    return normalize
+
+
+def reference_document(normalize: Callable[[str], str], text: str) -> str:
+    paragraphs = (normalize(paragraph) for paragraph in PARAGRAPH_PATTERN.split(text))
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+
+
+def make_fuzz(count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    words = " ".join(SAMPLE_SENTENCES).split()
+    texts = []
+    for _ in range(count):
+        parts = [
+            rng.choice(words) if rng.random() < 0.6 else rng.choice(FUZZ_TOKENS)
+            for _ in range(rng.randint(1, 25))
+        ]
+        texts.append((" " if rng.random() < 0.7 else "").join(parts))
+    return texts
+
+
+def measure(function: Callable[[str], str], texts: List[str]) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for text in texts:
+        began = time.perf_counter()
+        function(text)
+        latencies.append(time.perf_counter() - began)
+    return latency_stats(latencies, time.perf_counter() - started)
+
+
+def speedup(reference: dict, fast: dict) -> float:
+    return round(reference["mean_ms"] / fast["mean_ms"], 2) if fast["mean_ms"] else 0.0
+
+
+def run(report: BenchReport, queries: int, distinct: int, sizes: List[float], repeats: int, workers: int, fuzz: int) -> int:
+    """خروجی: تعداد ورودی‌هایی که خروجی آن‌ها با مرجع متفاوت است"""
+    reference = make_reference()
+    fast = PersianNormalizer(fast=True)
+    
+    def fast_normalize(text: str) -> str:
+        return fast.normalize(WHITESPACE_PATTERN.sub(' ', text)).strip()
+    
+    mismatches = 0
+    
+    def check(texts: List[str], label: str):
+        nonlocal mismatches
+        different = [text for text in texts if reference(text) != fast_normalize(text)]
+        if different:
+            print(f"❌ {label}: {len(different)} خروجی متفاوت، نمونه: {different[0]!r}")
+        mismatches += len(different)
+    
+    # پرسش‌های کوتاه (distinct پرسش یکتا با تکرار)
+    pool = make_queries(distinct)
+    rng = random.Random(0)
+    samples = [rng.choice(pool) for _ in range(queries)]
+    check(pool, "queries")
+    
+    # ساخت Normalizer سراسری پیش از اندازه‌گیری
+    get_normalizer()
+    text_processing._normalize_cached.cache_clear()
+    base = measure(reference, samples)
+    report.add("normalizer/query/hazm", base)
+    stats = measure(fast_normalize, samples)
+    stats["speedup"] = speedup(base, stats)
+    report.add("normalizer/query/fast", stats)
+    stats = measure(text_processing.normalize_text, samples)
+    stats["speedup"] = speedup(base, stats)
+    stats.update({f"cache_{key}": value for key, value in text_processing.normalize_cache_stats().items()})
+    report.add("normalizer/query/fast_lru", stats)
+    
+    # پاراگراف‌ها
+    paragraphs = [paragraph for paragraph in PARAGRAPH_PATTERN.split(make_document(0.25)) if paragraph.strip()]
+    check(paragraphs, "paragraphs")
+    base = measure(reference, paragraphs)
+    report.add("normalizer/paragraph/hazm", base)
+    stats = measure(fast_normalize, paragraphs)
+    stats["speedup"] = speedup(base, stats)
+    report.add("normalizer/paragraph/fast", stats)
+    
+    if fuzz:
+        check(make_fuzz(fuzz), "fuzz")
+    
+    # اسناد بزرگ
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=get_normalizer) if workers > 0 else None
+    try:
+        for size in sizes:
+            text = make_document(size)
+            expected = reference_document(reference, text)
+            
+            durations = timed_runs(lambda: reference_document(reference, text), repeats)
+            base = latency_stats(durations)
+            base["mb_s"] = round(size / (sum(durations) / len(durations)), 3)
+            report.add(f"normalizer/document/hazm/{size:g}MB", base)
+            
+            if normalize_document(text) != expected:
+                print(f"❌ document {size:g}MB: خروجی متفاوت")
+                mismatches += 1
+            durations = timed_runs(lambda: normalize_document(text), repeats)
+            stats = latency_stats(durations)
+            stats["mb_s"] = round(size / (sum(durations) / len(durations)), 3)
+            stats["speedup"] = speedup(base, stats)
+            report.add(f"normalizer/document/fast/{size:g}MB", stats)
+            
+            if executor is None:
+                continue
+            
+            def parallel() -> str:
+                batches = executor.map(normalize_paragraphs, paragraph_batches(text, settings.normalize_batch_chars))
+                return "\n\n".join(paragraph for batch in batches for paragraph in batch)
+            
+            # گرم کردن processها (بارگذاری hazm) پیش از اندازه‌گیری
+            if parallel() != expected:
+                print(f"❌ document {size:g}MB (processes): خروجی متفاوت")
+                mismatches += 1
+            durations = timed_runs(parallel, repeats)
+            stats = latency_stats(durations)
+            stats["mb_s"] = round(size / (sum(durations) / len(durations)), 3)
+            stats["speedup"] = speedup(base, stats)
+            report.add(f"normalizer/document/fast_p{workers}/{size:g}MB", stats)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    report.add("normalizer/equivalence", {"mismatches": mismatches, "fuzz": fuzz})
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک مسیر سریع نرمال‌سازی فارسی")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--distinct", type=int, default=500, help="تعداد پرسش‌های یکتا")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="تعداد processهای نرمال‌سازی اسناد (0: غیرفعال)")
+    parser.add_argument("--fuzz", type=int, default=5000, help="تعداد ورودی‌های تصادفی برای بررسی یکسانی خروجی")
+    parser.add_argument("--output", help="مسیر ذخیره گزارش JSON")
+    args = parser.parse_args()
+    
+    report = BenchReport("normalizer", {
+        "queries": args.queries,
+        "distinct": args.distinct,
+        "sizes_mb": args.sizes,
+        "repeats": args.repeats,
+        "workers": args.workers,
+        "fuzz": args.fuzz,
+        "normalize_cache_size": settings.normalize_cache_size,
+        "normalize_batch_chars": settings.normalize_batch_chars
+    })
+    mismatches = run(report, args.queries, args.distinct, args.sizes, args.repeats, args.workers, args.fuzz)
+    report.save(args.output)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+بنچمارک recall در برابر تأخیر برای quantization و پارامترهای HNSW در Qdrant
+
+نمونه اجرا (سرور Qdrant لازم است؛ در حالت local جست‌وجو brute-force است و
+quantization/HNSW اثری ندارد):
+    python -m benchmarks.bench_qdrant_quantization --url http://localhost:6333 \\
+        --points 200000 --dim 768 --quantization none scalar binary --ef 64 128 256 --oversampling 1 2 4
+
+داده مصنوعی: بردارهای نرمال‌شده خوشه‌ای (شبیه Embedding جملات). پاسخ دقیق با
+numpy محاسبه می‌شود و برای هر ترکیب recall@k، تأخیر p50/p95 و حافظه تخمینی
+بردارها گزارش می‌شود.
+"""
+import argparse
+import time
+import uuid
+from typing import List
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Batch, Distance, VectorParams, HnswConfigDiff, CollectionStatus
+
+from db.qdrant_options import build_quantization_config, build_search_params
+
+
+def make_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """بردارهای نرمال‌شده حول چند مرکز تصادفی"""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, top_k: int, block: int = 20000) -> np.ndarray:
+    """شناسه (اندیس) k نزدیک‌ترین بردار هر پرسش با ضرب داخلی کامل"""
+    best_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), top_k), dtype=np.int64)
+    for start in range(0, len(data), block):
+        scores = queries @ data[start:start + block].T
+        ids = np.arange(start, start + scores.shape[1])[None, :].repeat(len(queries), axis=0)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        order = np.argsort(-scores, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(scores, order, axis=1)
+        best_ids = np.take_along_axis(ids, order, axis=1)
+    return best_ids
+
+
+def vector_memory_mb(count: int, dim: int, quantization: str) -> float:
+    bytes_per_vector = {"none": dim * 4, "scalar": dim, "binary": dim / 8}[quantization]
+    return count * bytes_per_vector / 1024 / 1024
+
+
+def wait_until_indexed(client: QdrantClient, collection: str, timeout: float = 1800):
+    """انتظار برای پایان ساخت ایندکس و quantization"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = client.get_collection(collection)
+        if info.status == CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+    raise TimeoutError(f"ایندکس کالکشن {collection} در زمان مقرر ساخته نشد")
+
+
+def build_collection(
+    client: QdrantClient,
+    data: np.ndarray,
+    quantization: str,
+    m: int,
+    ef_construct: int,
+    batch_size: int = 1024
+) -> str:
+    collection = f"bench_{quantization}_{uuid.uuid4().hex[:8]}"
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=VectorParams(size=data.shape[1], distance=Distance.COSINE),
+        hnsw_config=HnswConfigDiff(m=m, ef_construct=ef_construct),
+        quantization_config=build_quantization_config(quantization)
+    )
+    for start in range(0, len(data), batch_size):
+        end = min(start + batch_size, len(data))
+        client.upsert(
+            collection_name=collection,
+            points=Batch(ids=list(range(start, end)), vectors=data[start:end].tolist()),
+            wait=False
+        )
+    wait_until_indexed(client, collection)
+    return collection
+
+
+def run_queries(
+    client: QdrantClient,
+    collection: str,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    top_k: int,
+    ef: int,
+    quantized: bool,
+    oversampling: float,
+    rescore: bool
+):
+    params = build_search_params(ef, quantized, oversampling, rescore)
+    latencies: List[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = client.search(
+            collection_name=collection,
+            query_vector=query.tolist(),
+            limit=top_k,
+            search_params=params
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len({point.id for point in results} & set(expected.tolist()))
+    return hits / truth.size, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک quantization و HNSW در Qdrant")
+    parser.add_argument("--url", default=None, help="آدرس سرور Qdrant (بدون آن: حالت memory)")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--points", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--quantization", nargs="+", default=["none", "scalar", "binary"])
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construct", type=int, default=100)
+    parser.add_argument("--ef", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--no-rescore", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    if args.url:
+        client = QdrantClient(url=args.url, api_key=args.api_key, timeout=120)
+    else:
+        print("⚠️ بدون --url در حالت memory اجرا می‌شود؛ quantization و HNSW شبیه‌سازی نمی‌شوند")
+        client = QdrantClient(":memory:")
+    
+    rng = np.random.default_rng(args.seed)
+    data = make_vectors(args.points, args.dim, args.clusters, rng)
+    queries = make_vectors(args.queries, args.dim, args.clusters, np.random.default_rng(args.seed + 1))
+    truth = exact_top_k(data, queries, args.top_k)
+    
+    print(f"📊 {args.points:,} بردار {args.dim} بعدی، {args.queries} پرسش، recall@{args.top_k}، m={args.m}, ef_construct={args.ef_construct}")
+    print(f"{'quantization':<13} {'mem MB':>8} {'ef':>5} {'overs.':>7} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    
+    for quantization in args.quantization:
+        started = time.perf_counter()
+        collection = build_collection(client, data, quantization, args.m, args.ef_construct)
+        print(f"  ⏱️ ساخت کالکشن {quantization}: {time.perf_counter() - started:.1f}s")
+        try:
+            quantized = quantization != "none"
+            for ef in args.ef:
+                for oversampling in (args.oversampling if quantized else [1.0]):
+                    recall, p50, p95 = run_queries(
+                        client, collection, queries, truth, args.top_k,
+                        ef, quantized, oversampling, not args.no_rescore
+                    )
+                    print(
+                        f"{quantization:<13} {vector_memory_mb(args.points, args.dim, quantization):8.1f} "
+                        f"{ef:5d} {oversampling:7.1f} {recall:8.3f} {p50:8.2f} {p95:8.2f}"
+                    )
+        finally:
+            client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
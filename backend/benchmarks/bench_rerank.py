@@ -0,0 +1,130 @@
+"""
+بنچمارک مرحله rerank: تأخیر هر مرحله، کیفیت بازیابی و توکن‌های پرامپت
+
+نمونه اجرا:
+    python -m benchmarks.bench_rerank --candidates 10 20 40 --noise-docs 200
+    python -m benchmarks.bench_rerank --llm   # زمان پاسخ مدل زبانی (نیازمند OPENAI_*)
+
+متن‌های مجموعه ارزیابی فارسی (bench_embedding_backends) به همراه اسناد مصنوعی
+(نویز) در Qdrant حالت memory افزوده می‌شوند. برای هر پرسش بازیابی بدون rerank
+(top_k تکه) با over-fetch و rerank (rerank_top_k تکه) مقایسه می‌شود.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+# پیش از بارگذاری تنظیمات
+os.environ["QDRANT_MODE"] = "memory"
+os.environ.setdefault("VECTOR_DB_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite3")
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+os.environ["RERANK_ENABLED"] = "true"
+
+import numpy as np  # noqa: E402
+
+from benchmarks.bench_chunker import make_document  # noqa: E402
+from benchmarks.bench_embedding_backends import EVAL_SET  # noqa: E402
+from api.config import settings  # noqa: E402
+from db.models import init_db  # noqa: E402
+from core.rag_engine import rag_engine  # noqa: E402
+
+
+def gold_url(index: int) -> str:
+    return f"https://bench.local/eval/{index}"
+
+
+def rank_of(results: List[Dict], url: str) -> int:
+    """رتبه (از ۱) اولین تکه سند درست؛ 0 اگر نباشد"""
+    for position, result in enumerate(results, start=1):
+        if result["metadata"].get("url") == url:
+            return position
+    return 0
+
+
+def row(label: str, values: Dict[str, List[float]], hits: List[int]) -> str:
+    ranks = np.asarray(hits)
+    recall = float((ranks > 0).mean())
+    mrr = float(np.where(ranks > 0, 1.0 / np.maximum(ranks, 1), 0.0).mean())
+    cells = " ".join(f"{np.percentile(values[key], 50):8.1f}" for key in ("embed", "search", "rerank", "llm"))
+    return f"{label:<22} {cells} {np.mean(values['tokens']):8.0f} {recall:7.2f} {mrr:6.3f}"
+
+
+async def evaluate(candidates: int, top_k: int, threshold: float, use_llm: bool):
+    baseline = {key: [] for key in ("embed", "search", "rerank", "llm", "tokens")}
+    reranked = {key: [] for key in ("embed", "search", "rerank", "llm", "tokens")}
+    baseline_hits: List[int] = []
+    reranked_hits: List[int] = []
+    fallbacks = 0
+    
+    for index, (query, _) in enumerate(EVAL_SET):
+        normalized = rag_engine.normalize_text(query)
+        rag_engine.vector_store.embedding_cache.clear()
+        
+        started = time.perf_counter()
+        embedding = await rag_engine.vector_store.embed_query(normalized)
+        embed_ms = (time.perf_counter() - started) * 1000
+        
+        # بدون rerank: top_k نتیجه
+        started = time.perf_counter()
+        plain = await rag_engine._search(normalized, embedding, top_k, threshold)
+        plain_search_ms = (time.perf_counter() - started) * 1000
+        
+        # با rerank: over-fetch و انتخاب rerank_top_k
+        started = time.perf_counter()
+        pool = await rag_engine._search(normalized, embedding, max(top_k, candidates), threshold)
+        pool_search_ms = (time.perf_counter() - started) * 1000
+        best, info = await rag_engine._rerank(normalized, pool, top_k)
+        fallbacks += info["fallback"]
+        
+        for values, hits, results, search_ms, rerank_ms in (
+            (baseline, baseline_hits, plain, plain_search_ms, 0.0),
+            (reranked, reranked_hits, best, pool_search_ms, info["elapsed_ms"])
+        ):
+            built = rag_engine.context_builder.build(results)
+            llm_ms = 0.0
+            if use_llm and results:
+                started = time.perf_counter()
+                await rag_engine.openai_client.generate_rag_response(normalized, built["context"], built["sources"])
+                llm_ms = (time.perf_counter() - started) * 1000
+            values["embed"].append(embed_ms)
+            values["search"].append(search_ms)
+            values["rerank"].append(rerank_ms)
+            values["llm"].append(llm_ms)
+            values["tokens"].append(built["tokens"])
+            hits.append(rank_of(results, gold_url(index)))
+    
+    print(row(f"vector top{top_k}", baseline, baseline_hits))
+    final_k = min(top_k, settings.rerank_top_k) if settings.rerank_top_k else top_k
+    print(row(f"rerank {candidates}->{final_k}", reranked, reranked_hits) + (f"  ({fallbacks} fallback)" if fallbacks else ""))
+
+
+async def main(args):
+    init_db()
+    await rag_engine.initialize()
+    
+    for index, (_, passage) in enumerate(EVAL_SET):
+        await rag_engine.ingest_document(gold_url(index), f"متن {index}", passage)
+    for index in range(args.noise_docs):
+        await rag_engine.ingest_document(f"https://bench.local/noise/{index}", "", make_document(2 / 1024, seed=index))
+    
+    print(
+        f"📊 {len(EVAL_SET)} پرسش، {args.noise_docs} سند نویز، embedding: {settings.embedding_model}، "
+        f"rerank: {settings.rerank_model} (بودجه {settings.rerank_time_budget_ms:g}ms)"
+    )
+    print(f"{'mode':<22} {'embed':>8} {'search':>8} {'rerank':>8} {'llm':>8} {'tokens':>8} {'recall':>7} {'MRR':>6}  (میانه ms)")
+    for candidates in args.candidates:
+        await evaluate(candidates, args.top_k, args.score_threshold, args.llm)
+    
+    await rag_engine.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="بنچمارک rerank")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[settings.rerank_candidates])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--noise-docs", type=int, default=100)
+    parser.add_argument("--score-threshold", type=float, default=0.5)
+    parser.add_argument("--llm", action="store_true", help="اندازه‌گیری زمان پاسخ مدل زبانی")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,191 @@
+"""
+بنچمارک زمان راه‌اندازی سرور
+
+نمونه اجرا:
+    python -m benchmarks.bench_startup --runs 3
+
+هر اندازه‌گیری در یک process تازه انجام می‌شود (Qdrant در حالت memory):
+
+- import: زمان import ماژول main (بدون بارگذاری مدل)
+- سرور: زمان تا پاسخ /api/health (پذیرش درخواست) و /api/ready (بارگذاری مدل و ایندکس)
+  با راه‌اندازی در پس‌زمینه و بدون آن، و حافظه (RSS) process سرور
+- shared: همان سرور با backend openai متصل به embedding_server.py (وزن‌های مدل فقط در
+  سرور Embedding؛ حافظه هر worker uvicorn)
+- اولین پرسش: تأخیر اولین embed_query پس از آماده‌سازی با warmup و بدون آن
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+FIRST_QUERY_SCRIPT = """
+import asyncio, json, time
+from core.rag_engine import rag_engine
+
+async def main():
+    await rag_engine.initialize()
+    started = time.perf_counter()
+    await rag_engine.vector_store.embed_query("نخستین پرسش کاربر درباره تاریخ ایران")
+    first = time.perf_counter() - started
+    await rag_engine.close()
+    print(json.dumps({"first_query_ms": first * 1000}))
+
+asyncio.run(main())
+"""
+
+IMPORT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import main
+print(json.dumps({"import_s": time.perf_counter() - started}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def base_env(**overrides: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "QDRANT_MODE": "memory",
+        "VECTOR_DB_URL": f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite3",
+        "PYTHONWARNINGS": "ignore"
+    })
+    env.update(overrides)
+    return env
+
+
+def run_script(script: str, env: Dict[str, str]) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def rss_mb(pid: int) -> float:
+    """حافظه مقیم process (لینوکس)"""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def wait_for(url: str, started: float, timeout: float, process: subprocess.Popen) -> Optional[float]:
+    """زمان (از started) تا اولین پاسخ 200"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process سرور با کد {process.returncode} خارج شد")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def start_server(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def measure_server(env: Dict[str, str], timeout: float) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    process = start_server(["-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"], env)
+    try:
+        health = wait_for(f"http://127.0.0.1:{port}/api/health", started, timeout, process)
+        ready = wait_for(f"http://127.0.0.1:{port}/api/ready", started, timeout, process)
+        return {"health_s": health, "ready_s": ready, "rss_mb": rss_mb(process.pid)}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(values: List[float]) -> str:
+    values = [value for value in values if value is not None]
+    if not values:
+        return "-"
+    return f"{np.median(values):.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک زمان راه‌اندازی")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--no-shared", action="store_true", help="بدون اندازه‌گیری حالت سرور Embedding مشترک")
+    args = parser.parse_args()
+    
+    print(f"📊 میانه {args.runs} اجرا، مدل {os.environ.get('EMBEDDING_MODEL', 'پیش‌فرض تنظیمات')}")
+    
+    imports = [run_script(IMPORT_SCRIPT, base_env())["import_s"] for _ in range(args.runs)]
+    print(f"{'import main':<40} {summarize(imports):>8} s")
+    
+    modes = [("startup (foreground)", "false"), ("startup (background)", "true")]
+    for label, background in modes:
+        results = [
+            measure_server(base_env(STARTUP_BACKGROUND_INIT=background), args.timeout)
+            for _ in range(args.runs)
+        ]
+        print(
+            f"{label:<40} health {summarize([r['health_s'] for r in results]):>6} s   "
+            f"ready {summarize([r['ready_s'] for r in results]):>6} s   "
+            f"RSS {summarize([r['rss_mb'] for r in results]):>7} MB"
+        )
+    
+    if not args.no_shared:
+        port = free_port()
+        server = start_server(
+            ["embedding_server.py"],
+            base_env(EMBEDDING_SERVER_PORT=str(port), HOST="127.0.0.1")
+        )
+        try:
+            started = time.perf_counter()
+            loaded = wait_for(f"http://127.0.0.1:{port}/health", started, args.timeout, server)
+            httpx.post(f"http://127.0.0.1:{port}/v1/embeddings", json={"input": ["x"]}, timeout=60).raise_for_status()
+            print(f"{'embedding_server.py':<40} {'':>8}   ready {loaded or 0:6.2f} s   RSS {rss_mb(server.pid):7.0f} MB")
+            shared_env = base_env(
+                STARTUP_BACKGROUND_INIT="true",
+                EMBEDDING_MODEL="openai:local",
+                EMBEDDING_BASE_URL=f"http://127.0.0.1:{port}/v1",
+                EMBEDDING_API_KEY="local"
+            )
+            results = [measure_server(shared_env, args.timeout) for _ in range(args.runs)]
+            print(
+                f"{'startup (shared embedding server)':<40} health {summarize([r['health_s'] for r in results]):>6} s   "
+                f"ready {summarize([r['ready_s'] for r in results]):>6} s   "
+                f"RSS {summarize([r['rss_mb'] for r in results]):>7} MB"
+            )
+        finally:
+            server.terminate()
+            server.wait()
+    
+    for label, warmup in [("first query (no warmup)", "false"), ("first query (warmup)", "true")]:
+        values = [run_script(FIRST_QUERY_SCRIPT, base_env(EMBEDDING_WARMUP=warmup))["first_query_ms"] for _ in range(args.runs)]
+        print(f"{label:<40} {summarize(values):>8} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+بنچمارک پردازش متن فارسی: normalize_text، normalize_document و chunk_text
+
+نمونه اجرا:
+    python -m benchmarks.bench_text --sizes 1 4 --repeats 5 --output results/text.json
+
+- normalize_text روی پرسش‌های کوتاه: تأخیر هر فراخوانی (p50/p95/p99)
+- normalize_document و chunk_text روی اسناد بزرگ مصنوعی (make_document): تأخیر
+  هر اجرا و throughput بر حسب مگابایت در ثانیه
+"""
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from api.config import settings
+from benchmarks.bench_chunker import make_document, SAMPLE_SENTENCES
+from benchmarks.report import BenchReport, latency_stats
+from core.rag_engine import rag_engine
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    """پرسش‌های کوتاه (چند کلمه اول جمله‌های نمونه با فاصله‌ها و حروف عربی)"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(SAMPLE_SENTENCES).split()[:rng.randint(2, 8)]
+        query = "  ".join(words).replace("ی", "ي", rng.randint(0, 1)).replace("ک", "ك", rng.randint(0, 1))
+        queries.append(query + rng.choice(["", "؟", " ۱۴۰۲"]))
+    return queries
+
+
+def timed_runs(function: Callable[[], object], repeats: int) -> List[float]:
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def run(report: BenchReport, sizes: List[float], repeats: int, queries: int):
+    # بارگذاری hazm پیش از اندازه‌گیری
+    rag_engine.normalize_text("گرم کردن")
+    
+    samples = make_queries(queries)
+    latencies = []
+    started = time.perf_counter()
+    for query in samples:
+        began = time.perf_counter()
+        rag_engine.normalize_text(query)
+        latencies.append(time.perf_counter() - began)
+    report.add("text/normalize_query", latency_stats(latencies, time.perf_counter() - started))
+    
+    for size in sizes:
+        text = make_document(size)
+        normalized = rag_engine.normalize_document(text)
+        
+        durations = timed_runs(lambda: rag_engine.normalize_document(text), repeats)
+        stats = latency_stats(durations)
+        stats["mb_s"] = round(size / (sum(durations) / len(durations)), 3)
+        report.add(f"text/normalize_document/{size:g}MB", stats)
+        
+        chunks = 0
+        
+        def chunk():
+            nonlocal chunks
+            chunks = sum(1 for _ in rag_engine.chunk_text(normalized))
+        
+        durations = timed_runs(chunk, repeats)
+        stats = latency_stats(durations)
+        stats["mb_s"] = round(size / (sum(durations) / len(durations)), 3)
+        stats["chunks"] = chunks
+        report.add(f"text/chunk_text/{size:g}MB", stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک نرمال‌سازی و تقسیم متن")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--output", help="مسیر ذخیره گزارش JSON")
+    args = parser.parse_args()
+    
+    report = BenchReport("text", {
+        "sizes_mb": args.sizes,
+        "repeats": args.repeats,
+        "queries": args.queries,
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap
+    })
+    run(report, args.sizes, args.repeats, args.queries)
+    report.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+بنچمارک VectorStore: add_documents و search روی بردارهای مصنوعی
+
+نمونه اجرا:
+    python -m benchmarks.bench_vector_store --sizes 10000 100000 --output results/vectors.json
+    # مجموعه‌های بزرگ (تا یک میلیون) با سرور Qdrant:
+    QDRANT_MODE=remote QDRANT_URL=http://localhost:6333 \\
+        python -m benchmarks.bench_vector_store --sizes 10000 100000 1000000
+
+بردارها خوشه‌ای و نرمال‌شده‌اند (مانند bench_qdrant_quantization) و در batchهای
+ثابت با Embedding از پیش محاسبه‌شده به add_documents داده می‌شوند؛ بنابراین فقط مسیر
+upsert و جست‌وجوی Qdrant (با تنظیمات QDRANT_* جاری) اندازه‌گیری می‌شود. برای هر
+اندازه کالکشن جداگانه‌ای ساخته و در پایان حذف می‌شود.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from typing import List
+
+os.environ.setdefault("QDRANT_MODE", "memory")
+os.environ["EMBEDDING_WARMUP"] = "false"
+
+import numpy as np  # noqa: E402
+
+from api.config import settings  # noqa: E402
+from benchmarks.mock_openai import hash_embeddings  # noqa: E402
+from benchmarks.report import BenchReport, latency_stats  # noqa: E402
+from db.embedding_backends import EmbeddingBackend  # noqa: E402
+from db.vector_store import VectorStore  # noqa: E402
+
+
+class SyntheticBackend(EmbeddingBackend):
+    """backend سبک برای بنچمارک (Embedding اسناد از بیرون داده می‌شود)"""
+    
+    name = "synthetic"
+    
+    def __init__(self, dimension: int):
+        super().__init__("synthetic")
+        self.dimension = dimension
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        return hash_embeddings(texts, self.dimension)
+
+
+def cluster_batch(centers: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """بردارهای نرمال‌شده حول مراکز ثابت (تولید دسته‌ای برای محدود ماندن حافظه)"""
+    labels = rng.integers(0, len(centers), size=count)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((count, centers.shape[1])).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+async def measure_size(
+    report: BenchReport,
+    size: int,
+    dim: int,
+    batch_size: int,
+    queries: int,
+    concurrency: int,
+    top_k: int
+):
+    rng = np.random.default_rng(size)
+    centers = rng.standard_normal((64, dim)).astype(np.float32)
+    
+    store = VectorStore()
+    store.collection_name = f"bench_vectors_{size}_{uuid.uuid4().hex[:8]}"
+    store.embedding_backend = SyntheticBackend(dim)
+    await store.initialize()
+    
+    try:
+        latencies = []
+        started = time.perf_counter()
+        for start in range(0, size, batch_size):
+            count = min(batch_size, size - start)
+            texts = [f"سند مصنوعی شماره {start + i}" for i in range(count)]
+            metadatas = [{"url": f"https://bench.local/vectors/{(start + i) // 20}"} for i in range(count)]
+            vectors = cluster_batch(centers, count, rng)
+            began = time.perf_counter()
+            await store.add_documents(texts, metadatas, embeddings=vectors)
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - started
+        stats = latency_stats(latencies)
+        stats["vectors_per_s"] = round(size / elapsed, 1)
+        report.add(f"vectors/add_documents/{size}", stats)
+        
+        probes = cluster_batch(centers, queries, rng)
+        
+        # جست‌وجوی ترتیبی: تأخیر هر پرسش
+        latencies = []
+        started = time.perf_counter()
+        for probe in probes:
+            began = time.perf_counter()
+            await store.search("", top_k=top_k, score_threshold=0.0, query_embedding=probe)
+            latencies.append(time.perf_counter() - began)
+        report.add(f"vectors/search/{size}", latency_stats(latencies, time.perf_counter() - started))
+        
+        # جست‌وجوی همزمان: throughput
+        latencies = []
+        pending = iter(probes)
+        
+        async def worker():
+            for probe in pending:
+                began = time.perf_counter()
+                await store.search("", top_k=top_k, score_threshold=0.0, query_embedding=probe)
+                latencies.append(time.perf_counter() - began)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        report.add(f"vectors/search_c{concurrency}/{size}", latency_stats(latencies, time.perf_counter() - started))
+    finally:
+        await store.delete_collection()
+        await store.close()
+
+
+async def run(report: BenchReport, sizes: List[int], dim: int, batch_size: int, queries: int, concurrency: int, top_k: int):
+    for size in sizes:
+        await measure_size(report, size, dim, batch_size, queries, concurrency, top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک add_documents و search در VectorStore")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=5000, help="تعداد اسناد هر فراخوانی add_documents")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="مسیر ذخیره گزارش JSON")
+    args = parser.parse_args()
+    
+    report = BenchReport("vectors", {
+        "sizes": args.sizes,
+        "dim": args.dim,
+        "batch_size": args.batch_size,
+        "queries": args.queries,
+        "concurrency": args.concurrency,
+        "qdrant_mode": settings.qdrant_mode,
+        "qdrant_quantization": settings.qdrant_quantization,
+        "qdrant_search_ef": settings.qdrant_search_ef
+    })
+    asyncio.run(run(report, args.sizes, args.dim, args.batch_size, args.queries, args.concurrency, args.top_k))
+    report.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
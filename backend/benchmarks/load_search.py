@@ -0,0 +1,241 @@
+"""
+تست بار همزمان برای /api/search و /api/ingest-url
+
+نمونه اجرا روی سرور در حال اجرا:
+    python -m benchmarks.load_search --url http://localhost:8000 --concurrency 100 --requests 1000
+
+با --spawn، سرورهای شبیه‌ساز OpenAI (mock_openai) و Firecrawl (mock_firecrawl) با تأخیر
+تنظیم‌شده و یک backend (uvicorn main:app، Qdrant حالت memory، بدون کش معنایی) متصل به آن‌ها
+اجرا می‌شوند؛ نتیجه به API و شبکه بیرونی وابسته نیست و بین commitها قابل مقایسه است:
+
+    python -m benchmarks.load_search --spawn --concurrency 32 --requests 500 --ingest-ratio 0.1 \\
+        --llm-latency-ms 300 --token-interval-ms 10 --firecrawl-latency-ms 200 \\
+        --embedding-model openai:mock --output results/load.json
+
+با --embedding-model openai:mock، Embeddingها هم از mock_openai گرفته می‌شوند (بدون
+بارگذاری مدل محلی). با --stream از /api/search/stream استفاده و زمان تا اولین توکن
+هم گزارش می‌شود. زمان مراحل سمت سرور (include_timings) نیز خلاصه می‌شود.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.bench_startup import base_env, free_port, start_server, wait_for
+from benchmarks.report import BenchReport, latency_stats
+
+
+DEFAULT_QUERIES = [
+    "هوش مصنوعی چیست؟",
+    "تاریخچه ایران",
+    "یادگیری ماشین چگونه کار می‌کند؟",
+    "پایتخت ایران کجاست؟",
+]
+
+
+@contextmanager
+def spawn_stack(args: argparse.Namespace) -> Iterator[str]:
+    """اجرای سرورهای شبیه‌ساز و backend؛ خروجی: آدرس backend"""
+    openai_port, firecrawl_port, backend_port = free_port(), free_port(), free_port()
+    processes = []
+    try:
+        processes.append(start_server([
+            "-m", "benchmarks.mock_openai", "--port", str(openai_port),
+            "--latency-ms", str(args.llm_latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--token-interval-ms", str(args.token_interval_ms),
+            "--completion-tokens", str(args.completion_tokens),
+            "--embedding-latency-ms", str(args.embedding_latency_ms),
+            "--error-rate", str(args.error_rate)
+        ], base_env()))
+        processes.append(start_server([
+            "-m", "benchmarks.mock_firecrawl", "--port", str(firecrawl_port),
+            "--latency-ms", str(args.firecrawl_latency_ms),
+            "--paragraphs", str(args.paragraphs),
+            "--error-rate", str(args.error_rate)
+        ], base_env()))
+        
+        overrides = {
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+            "OPENAI_API_KEY": "mock",
+            "FIRECRAWL_BASE_URL": f"http://127.0.0.1:{firecrawl_port}/v1",
+            "FIRECRAWL_API_KEY": "mock",
+            "SEMANTIC_CACHE_ENABLED": "false",
+            "STARTUP_BACKGROUND_INIT": "true"
+        }
+        if args.embedding_model:
+            overrides["EMBEDDING_MODEL"] = args.embedding_model
+            if args.embedding_model.startswith("openai:"):
+                overrides["EMBEDDING_BASE_URL"] = overrides["OPENAI_BASE_URL"]
+                overrides["EMBEDDING_API_KEY"] = "mock"
+        backend = start_server(
+            ["-m", "uvicorn", "main:app", "--port", str(backend_port), "--log-level", "warning"],
+            base_env(**overrides)
+        )
+        processes.append(backend)
+        
+        started = time.perf_counter()
+        for port, path in ((openai_port, "/docs"), (firecrawl_port, "/docs")):
+            if wait_for(f"http://127.0.0.1:{port}{path}", started, 60, processes[0]) is None:
+                raise RuntimeError("سرور شبیه‌ساز آماده نشد")
+        url = f"http://127.0.0.1:{backend_port}"
+        ready = wait_for(f"{url}/api/ready", started, args.timeout, backend)
+        if ready is None:
+            raise RuntimeError("backend در زمان مقرر آماده نشد")
+        print(f"🚀 سرورها آماده شدند ({ready:.1f}s): backend {url}")
+        yield url
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+async def seed_documents(client: httpx.AsyncClient, count: int):
+    """افزودن چند صفحه پیش از شروع بار تا جست‌وجو نتیجه (و فراخوانی مدل زبانی) داشته باشد"""
+    for i in range(count):
+        response = await client.post("/api/ingest-url", json={"url": f"https://bench.local/seed/{i}"})
+        response.raise_for_status()
+
+
+async def search_once(client: httpx.AsyncClient, payload: Dict, stream: bool) -> Dict:
+    """یک درخواست جست‌وجو؛ خروجی: زمان‌های مراحل سمت سرور و زمان تا اولین توکن"""
+    if not stream:
+        response = await client.post("/api/search", json=payload)
+        response.raise_for_status()
+        return {"timings": response.json().get("timings") or {}}
+    
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    timings: Dict[str, float] = {}
+    event = None
+    async with client.stream("POST", "/api/search/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+                if event == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif event == "error":
+                    raise httpx.HTTPError("stream error event")
+            elif line.startswith("data:") and event == "done":
+                timings = json.loads(line.split(":", 1)[1]).get("timings") or {}
+    return {"timings": timings, "first_token": first_token}
+
+
+async def run(
+    report: BenchReport,
+    url: str,
+    concurrency: int,
+    total_requests: int,
+    top_k: int,
+    ingest_ratio: float = 0.0,
+    stream: bool = False,
+    seed_urls: int = 0
+):
+    """ارسال درخواست‌های همزمان (ترکیب جست‌وجو و افزودن URL) و ثبت گزارش"""
+    latencies: Dict[str, List[float]] = {"search": [], "ingest_url": []}
+    errors = {"search": 0, "ingest_url": 0}
+    first_tokens: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    rng = random.Random(0)
+    operations = ["ingest_url" if rng.random() < ingest_ratio else "search" for _ in range(total_requests)]
+    counter = iter(range(total_requests))
+    
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+        await seed_documents(client, seed_urls)
+        
+        async def worker():
+            for i in counter:
+                operation = operations[i]
+                started = time.perf_counter()
+                try:
+                    if operation == "search":
+                        payload = {
+                            "query": DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)],
+                            "use_web_search": False,
+                            "top_k": top_k,
+                            "include_timings": True
+                        }
+                        result = await search_once(client, payload, stream)
+                        for stage, value in result["timings"].items():
+                            stages.setdefault(stage, []).append(value / 1000)
+                        if result.get("first_token") is not None:
+                            first_tokens.append(result["first_token"])
+                    else:
+                        response = await client.post("/api/ingest-url", json={"url": f"https://bench.local/load/{i}"})
+                        response.raise_for_status()
+                except httpx.HTTPError:
+                    errors[operation] += 1
+                    continue
+                latencies[operation].append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    for operation, values in latencies.items():
+        if values or errors[operation]:
+            report.add(f"load/{operation}", latency_stats(values, elapsed, errors[operation]))
+    if first_tokens:
+        report.add("load/search_first_token", latency_stats(first_tokens))
+    for stage in sorted(stages):
+        report.add(f"load/stage/{stage}", latency_stats(stages[stage]))
+    report.add("load/total", {
+        "requests": total_requests,
+        "errors": sum(errors.values()),
+        "elapsed_s": round(elapsed, 2),
+        "throughput": round(total_requests / elapsed, 2)
+    })
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """تنظیمات سرورهای شبیه‌ساز در حالت --spawn"""
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--token-interval-ms", type=float, default=10.0)
+    parser.add_argument("--completion-tokens", type=int, default=40)
+    parser.add_argument("--embedding-latency-ms", type=float, default=5.0)
+    parser.add_argument("--firecrawl-latency-ms", type=float, default=200.0)
+    parser.add_argument("--paragraphs", type=int, default=20, help="اندازه صفحات mock_firecrawl")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--embedding-model", help="مثلاً openai:mock (پیش‌فرض: EMBEDDING_MODEL جاری)")
+    parser.add_argument("--timeout", type=float, default=600, help="حداکثر انتظار برای آماده شدن backend")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تست بار همزمان /api/search و /api/ingest-url")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--spawn", action="store_true", help="اجرای backend و سرورهای شبیه‌ساز")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--ingest-ratio", type=float, default=0.0, help="سهم درخواست‌های /api/ingest-url")
+    parser.add_argument("--seed-urls", type=int, default=None, help="تعداد صفحات اولیه (پیش‌فرض: 5 با --spawn)")
+    parser.add_argument("--stream", action="store_true", help="استفاده از /api/search/stream")
+    parser.add_argument("--output", help="مسیر ذخیره گزارش JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    
+    seed_urls = args.seed_urls if args.seed_urls is not None else (5 if args.spawn else 0)
+    params = {
+        key: value for key, value in vars(args).items()
+        if key not in ("url", "output") and (args.spawn or key in ("concurrency", "requests", "top_k", "ingest_ratio", "stream"))
+    }
+    report = BenchReport("load", params)
+    
+    if args.spawn:
+        with spawn_stack(args) as url:
+            asyncio.run(run(report, url, args.concurrency, args.requests, args.top_k, args.ingest_ratio, args.stream, seed_urls))
+    else:
+        asyncio.run(run(report, args.url, args.concurrency, args.requests, args.top_k, args.ingest_ratio, args.stream, seed_urls))
+    report.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+سرور شبیه‌ساز Firecrawl برای تست و بنچمارک محلی
+
+نمونه اجرا:
+    python -m benchmarks.mock_firecrawl --port 3002 --latency-ms 200 --page-interval-ms 300
+
+و در backend:
+    FIRECRAWL_BASE_URL=http://localhost:3002/v1 FIRECRAWL_API_KEY=test python main.py
+
+- POST /v1/scrape: محتوای فارسی ساختگی با تأخیر قابل تنظیم
+- POST /v1/crawl: شروع کراول ساختگی؛ هر page_interval یک صفحه تکمیل می‌شود
+- GET /v1/crawl/{id}: وضعیت کراول با صفحه‌بندی (لینک next)
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+
+PARAGRAPH = (
+    "هوش مصنوعی شاخه‌ای از علوم رایانه است که به ساخت سامانه‌هایی می‌پردازد که "
+    "می‌توانند کارهایی انجام دهند که به هوش انسانی نیاز دارد. "
+    "یادگیری ماشین، پردازش زبان طبیعی و بینایی رایانه از زیرشاخه‌های آن هستند. "
+)
+
+
+class MockConfig:
+    """تنظیمات قابل تغییر سرور شبیه‌ساز"""
+    latency = 0.0
+    page_interval = 0.3
+    page_size = 10
+    paragraphs = 20
+    error_rate = 0.0
+
+
+config = MockConfig()
+app = FastAPI(title="Mock Firecrawl")
+crawls: Dict[str, Dict[str, Any]] = {}
+
+
+def make_page(url: str) -> Dict[str, Any]:
+    """ساخت یک صفحه ساختگی"""
+    return {
+        "markdown": f"# {url}\n\n" + "\n\n".join(PARAGRAPH for _ in range(config.paragraphs)),
+        "html": "",
+        "metadata": {"title": f"صفحه {url}", "sourceURL": url}
+    }
+
+
+async def inject_failure():
+    """اعمال تأخیر و خطای ساختگی (429) برای تست retry"""
+    if config.latency:
+        await asyncio.sleep(config.latency)
+    if random.random() < config.error_rate:
+        raise HTTPException(status_code=429, detail="rate limited")
+
+
+@app.post("/v1/scrape")
+async def scrape(payload: Dict[str, Any]):
+    await inject_failure()
+    page = make_page(payload["url"])
+    return {"success": True, "data": page}
+
+
+@app.post("/v1/crawl")
+async def start_crawl(payload: Dict[str, Any]):
+    await inject_failure()
+    crawl_id = uuid.uuid4().hex
+    crawls[crawl_id] = {
+        "url": payload["url"].rstrip("/"),
+        "limit": payload.get("limit", 10),
+        "started_at": time.monotonic()
+    }
+    return {"success": True, "id": crawl_id, "url": f"/v1/crawl/{crawl_id}"}
+
+
+@app.get("/v1/crawl/{crawl_id}")
+async def crawl_status(crawl_id: str, request: Request, skip: int = 0):
+    await inject_failure()
+    crawl = crawls.get(crawl_id)
+    if crawl is None:
+        raise HTTPException(status_code=404, detail="crawl not found")
+    
+    elapsed = time.monotonic() - crawl["started_at"]
+    done = min(crawl["limit"], int(elapsed / config.page_interval) if config.page_interval else crawl["limit"])
+    status = "completed" if done >= crawl["limit"] else "scraping"
+    
+    end = min(done, skip + config.page_size)
+    data = [make_page(f"{crawl['url']}/page-{i}") for i in range(skip, end)]
+    next_url: Optional[str] = None
+    if end < done:
+        next_url = str(request.url.replace_query_params(skip=end))
+    
+    return {
+        "status": status,
+        "total": crawl["limit"],
+        "completed": done,
+        "data": data,
+        "next": next_url
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="سرور شبیه‌ساز Firecrawl")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3002)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--page-interval-ms", type=float, default=300.0)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    
+    config.latency = args.latency_ms / 1000
+    config.page_interval = args.page_interval_ms / 1000
+    config.page_size = args.page_size
+    config.paragraphs = args.paragraphs
+    config.error_rate = args.error_rate
+    
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+سرور شبیه‌ساز API سازگار با OpenAI (chat completions و embeddings) برای بنچمارک محلی
+
+نمونه اجرا:
+    python -m benchmarks.mock_openai --port 8010 --latency-ms 300 --token-interval-ms 20
+
+و در backend:
+    OPENAI_BASE_URL=http://localhost:8010/v1 OPENAI_API_KEY=test python main.py
+    # Embedding هم از همین سرور (بدون بارگذاری مدل محلی):
+    EMBEDDING_MODEL=openai:mock EMBEDDING_BASE_URL=http://localhost:8010/v1 python main.py
+
+- POST /v1/chat/completions: پاسخ فارسی ساختگی (عادی یا stream) با usage؛ تأخیر تا
+  اولین توکن latency و فاصله توکن‌ها token_interval است
+- POST /v1/embeddings: بردارهای قطعی bag-of-words (متن‌های دارای کلمات مشترک
+  شباهت کسینوسی مثبت دارند) با تأخیر embedding_latency
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+
+ANSWER_WORDS = (
+    "بر اساس منابع ارائه‌شده، هوش مصنوعی شاخه‌ای از علوم رایانه است که به ساخت "
+    "سامانه‌های هوشمند می‌پردازد و یادگیری ماشین یکی از زیرشاخه‌های مهم آن است."
+).split()
+
+
+class MockConfig:
+    """تنظیمات قابل تغییر سرور شبیه‌ساز"""
+    latency = 0.0
+    jitter = 0.0
+    token_interval = 0.0
+    completion_tokens = 40
+    embedding_latency = 0.0
+    embedding_dim = 384
+    error_rate = 0.0
+
+
+config = MockConfig()
+app = FastAPI(title="Mock OpenAI")
+
+
+def hash_embeddings(texts: List[str], dim: int) -> np.ndarray:
+    """
+    بردار قطعی هر متن: مجموع بردارهای تصادفی (با seed از hash کلمه) کلمات، نرمال‌شده
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    cache: Dict[str, np.ndarray] = {}
+    for row, text in enumerate(texts):
+        for word in text.split():
+            vector = cache.get(word)
+            if vector is None:
+                seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+                vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+                cache[word] = vector
+            vectors[row] += vector
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def count_tokens(messages: List[Dict[str, Any]]) -> int:
+    """تخمین تعداد توکن پرامپت (کلمات)"""
+    return sum(len(str(message.get("content", "")).split()) for message in messages)
+
+
+async def inject_failure(latency: float):
+    """اعمال تأخیر (با jitter) و خطای ساختگی (429/503) برای تست retry"""
+    delay = latency + (random.uniform(0, config.jitter) if config.jitter else 0.0)
+    if delay:
+        await asyncio.sleep(delay)
+    if random.random() < config.error_rate:
+        raise HTTPException(status_code=random.choice((429, 503)), detail="mock failure")
+
+
+def completion_words() -> List[str]:
+    return [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(config.completion_tokens)]
+
+
+def chunk_payload(model: str, delta: Dict[str, Any], finish_reason=None, usage=None) -> str:
+    payload = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: Dict[str, Any]):
+    await inject_failure(config.latency)
+    model = payload.get("model", "mock")
+    words = completion_words()
+    usage = {
+        "prompt_tokens": count_tokens(payload.get("messages", [])),
+        "completion_tokens": len(words),
+        "total_tokens": count_tokens(payload.get("messages", [])) + len(words)
+    }
+    
+    if not payload.get("stream"):
+        if config.token_interval:
+            await asyncio.sleep(config.token_interval * len(words))
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+    
+    include_usage = (payload.get("stream_options") or {}).get("include_usage", False)
+    
+    async def event_stream():
+        yield chunk_payload(model, {"role": "assistant", "content": ""})
+        for index, word in enumerate(words):
+            if index and config.token_interval:
+                await asyncio.sleep(config.token_interval)
+            yield chunk_payload(model, {"content": word if index == 0 else f" {word}"})
+        yield chunk_payload(model, {}, finish_reason="stop")
+        if include_usage:
+            yield chunk_payload(model, {}, usage=usage)
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(payload: Dict[str, Any]):
+    await inject_failure(config.embedding_latency)
+    texts = payload["input"]
+    if isinstance(texts, str):
+        texts = [texts]
+    vectors = hash_embeddings(texts, config.embedding_dim)
+    
+    if payload.get("encoding_format") == "base64":
+        data = [base64.b64encode(vector.tobytes()).decode() for vector in vectors]
+    else:
+        data = vectors.tolist()
+    
+    return {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": index, "embedding": embedding}
+            for index, embedding in enumerate(data)
+        ],
+        "model": payload.get("model", "mock"),
+        "usage": {"prompt_tokens": sum(len(text.split()) for text in texts), "total_tokens": sum(len(text.split()) for text in texts)}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="سرور شبیه‌ساز OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="تأخیر تا اولین توکن")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="تأخیر تصادفی اضافه (یکنواخت)")
+    parser.add_argument("--token-interval-ms", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=40)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-dim", type=int, default=384)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    
+    config.latency = args.latency_ms / 1000
+    config.jitter = args.jitter_ms / 1000
+    config.token_interval = args.token_interval_ms / 1000
+    config.completion_tokens = args.completion_tokens
+    config.embedding_latency = args.embedding_latency_ms / 1000
+    config.embedding_dim = args.embedding_dim
+    config.error_rate = args.error_rate
+    
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
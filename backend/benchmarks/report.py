@@ -0,0 +1,162 @@
+"""
+گزارش مشترک بنچمارک‌ها: صدک‌های تأخیر، throughput و مقایسه بین commitها
+
+هر بنچمارک مجموعه‌سنجه‌ها را با نام case در BenchReport ثبت می‌کند. با --output
+گزارش به صورت JSON (همراه با commit جاری git و مشخصات ماشین) ذخیره می‌شود و دو
+گزارش را می‌توان مقایسه کرد:
+
+    python -m benchmarks.suite --output results/before.json
+    git checkout <commit دیگر>
+    python -m benchmarks.suite --output results/after.json
+    python -m benchmarks.report results/before.json results/after.json --threshold 10
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# سنجه‌هایی که مقدار بیشتر در آن‌ها بهتر است (بقیه: کمتر بهتر)
+HIGHER_IS_BETTER = ("throughput", "per_s", "mb_s", "recall")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if len(values) else 0.0
+
+
+def latency_stats(latencies: List[float], elapsed: Optional[float] = None, errors: int = 0) -> Dict[str, float]:
+    """
+    خلاصه تأخیرها (ثانیه) به میلی‌ثانیه
+    
+    با elapsed (زمان کل اجرا) throughput بر حسب عملیات در ثانیه هم محاسبه می‌شود.
+    """
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    stats = {
+        "count": len(values),
+        "errors": errors,
+        "mean_ms": round(float(values.mean()), 3) if len(values) else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3)
+    }
+    if elapsed:
+        stats["throughput"] = round(len(values) / elapsed, 2)
+    return stats
+
+
+def git_revision() -> Dict[str, Any]:
+    """commit جاری و وجود تغییرات commit‌نشده"""
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    
+    try:
+        return {
+            "commit": git("rev-parse", "--short", "HEAD"),
+            "subject": git("log", "-1", "--format=%s"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))
+        }
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "subject": None, "dirty": None}
+
+
+class BenchReport:
+    """مجموعه نتایج یک اجرای بنچمارک"""
+    
+    def __init__(self, name: str, params: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.params = dict(params or {})
+        self.cases: Dict[str, Dict[str, float]] = {}
+    
+    def add(self, case: str, metrics: Dict[str, float]):
+        self.cases.setdefault(case, {}).update(metrics)
+        print(format_case(case, self.cases[case]))
+    
+    def merge(self, other: "BenchReport"):
+        self.params[other.name] = other.params
+        self.cases.update(other.cases)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "machine": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count()
+            },
+            "params": self.params,
+            "cases": self.cases
+        }
+    
+    def save(self, path: Optional[str]):
+        if not path:
+            return
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 گزارش در {target} ذخیره شد")
+
+
+def format_case(case: str, metrics: Dict[str, float]) -> str:
+    cells = "  ".join(f"{key}={value:g}" if isinstance(value, (int, float)) else f"{key}={value}" for key, value in metrics.items())
+    return f"{case:<36} {cells}"
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    """
+    چاپ تغییر سنجه‌های مشترک دو گزارش
+    
+    خروجی: تعداد بدترشدن‌های بیشتر از threshold درصد (برای استفاده در CI).
+    """
+    print(f"base: {base['git'].get('commit')} {base['git'].get('subject') or ''}")
+    print(f"new:  {new['git'].get('commit')} {new['git'].get('subject') or ''}")
+    print(f"{'case':<36} {'metric':<12} {'base':>12} {'new':>12} {'change':>9}")
+    
+    regressions = 0
+    for case, metrics in base["cases"].items():
+        if case not in new["cases"]:
+            continue
+        for metric, old_value in metrics.items():
+            new_value = new["cases"][case].get(metric)
+            if metric in ("count", "errors") or not isinstance(old_value, (int, float)) or not isinstance(new_value, (int, float)):
+                continue
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            worse = -change if any(marker in metric for marker in HIGHER_IS_BETTER) else change
+            flag = ""
+            if worse > threshold:
+                regressions += 1
+                flag = "  ⚠️"
+            elif worse < -threshold:
+                flag = "  ✅"
+            print(f"{case:<36} {metric:<12} {old_value:>12g} {new_value:>12g} {change:>+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="مقایسه دو گزارش بنچمارک")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="درصد تغییر قابل توجه")
+    args = parser.parse_args()
+    
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    regressions = compare(base, new, args.threshold)
+    print(f"\n{regressions} سنجه بیش از {args.threshold:g}% بدتر شده است")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
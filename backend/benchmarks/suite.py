@@ -0,0 +1,81 @@
+"""
+اجرای مجموعه بنچمارک‌ها با یک گزارش مشترک (برای مقایسه بین commitها)
+
+نمونه اجرا:
+    python -m benchmarks.suite --output results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --quick --only text vectors
+    python -m benchmarks.report results/<قبلی>.json results/<جدید>.json
+
+- text: normalize_text / normalize_document / chunk_text (bench_text)
+- vectors: add_documents / search در VectorStore (bench_vector_store)
+- load: بار همزمان /api/search و /api/ingest-url با سرورهای شبیه‌ساز (load_search --spawn)
+
+تنظیمات هر بخش ثابت و در گزارش ثبت می‌شود تا نتایج اجرای commitهای مختلف روی یک
+ماشین قابل مقایسه باشند.
+"""
+import argparse
+import asyncio
+import os
+
+# پیش از بارگذاری تنظیمات (bench_text تنظیمات را زودتر از bench_vector_store import می‌کند)
+os.environ.setdefault("QDRANT_MODE", "memory")
+os.environ["EMBEDDING_WARMUP"] = "false"
+
+from benchmarks import bench_text, bench_vector_store, load_search  # noqa: E402
+from benchmarks.report import BenchReport  # noqa: E402
+
+
+SECTIONS = ("text", "vectors", "load")
+
+PROFILES = {
+    "full": {
+        "text": {"sizes": [1, 4], "repeats": 5, "queries": 2000},
+        "vectors": {"sizes": [10000, 100000], "dim": 384, "batch_size": 5000, "queries": 200, "concurrency": 16, "top_k": 5},
+        "load": {"concurrency": 32, "total_requests": 1000, "ingest_ratio": 0.05, "top_k": 5}
+    },
+    "quick": {
+        "text": {"sizes": [0.5], "repeats": 3, "queries": 500},
+        "vectors": {"sizes": [10000], "dim": 384, "batch_size": 5000, "queries": 100, "concurrency": 8, "top_k": 5},
+        "load": {"concurrency": 16, "total_requests": 200, "ingest_ratio": 0.05, "top_k": 5}
+    }
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="مجموعه بنچمارک‌ها")
+    parser.add_argument("--quick", action="store_true", help="اندازه‌های کوچک‌تر (بررسی سریع)")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--output", help="مسیر ذخیره گزارش JSON")
+    load_search.add_mock_arguments(parser)
+    parser.set_defaults(embedding_model="openai:mock")
+    args = parser.parse_args()
+    
+    profile_name = "quick" if args.quick else "full"
+    profile = PROFILES[profile_name]
+    report = BenchReport("suite", {"profile": profile_name})
+    
+    if "text" in args.only:
+        print("📊 text")
+        section = BenchReport("text", profile["text"])
+        bench_text.run(section, **profile["text"])
+        report.merge(section)
+    
+    if "vectors" in args.only:
+        print("📊 vectors")
+        section = BenchReport("vectors", profile["vectors"])
+        asyncio.run(bench_vector_store.run(section, **profile["vectors"]))
+        report.merge(section)
+    
+    if "load" in args.only:
+        print("📊 load")
+        mocks = {key: value for key, value in vars(args).items() if key not in ("quick", "only", "output")}
+        section = BenchReport("load", {**profile["load"], **mocks})
+        with load_search.spawn_stack(args) as url:
+            asyncio.run(load_search.run(section, url, stream=False, seed_urls=5, **profile["load"]))
+        report.merge(section)
+    
+    report.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# وجود این فایل پوشه backend را به sys.path اضافه می‌کند تا pytest ماژول‌های core، db و api را پیدا کند
@@ -0,0 +1,89 @@
+"""
+تقسیم متن به تکه‌های هم‌پوشان با رعایت مرز جمله و پاراگراف
+"""
+from typing import Iterator, List, Tuple
+import re
+
+
+# کلمه: هر دنباله بدون فاصله (نیم‌فاصله جزو کلمه است)
+WORD_PATTERN = re.compile(r'\S+')
+
+# پایان جمله فارسی/لاتین (پس از حذف گیومه و پرانتز بسته)
+SENTENCE_END_CHARS = '.!?؟…'
+TRAILING_CLOSERS = '»"\')]}›'
+
+
+def _is_sentence_end(text: str, word_end: int, next_start: int) -> bool:
+    """آیا کلمه‌ای که در word_end تمام می‌شود پایان جمله یا خط است"""
+    index = word_end - 1
+    while index > 0 and text[index] in TRAILING_CLOSERS:
+        index -= 1
+    return text[index] in SENTENCE_END_CHARS or text.find('\n', word_end, next_start) >= 0
+
+
+def _find_cut(text: str, window: List[Tuple[int, int]], chunk_size: int, min_words: int) -> int:
+    """
+    تعداد کلمات تکه جاری: آخرین مرز پاراگراف، سپس آخرین مرز جمله در نیمه دوم پنجره
+    
+    window شامل chunk_size + 1 کلمه است (کلمه آخر متعلق به تکه بعدی است).
+    """
+    low = window[min_words - 1][1]
+    high = window[chunk_size][0]
+    
+    paragraph = text.rfind('\n\n', low, high)
+    if paragraph >= 0:
+        for count in range(chunk_size, min_words - 1, -1):
+            if window[count - 1][1] <= paragraph:
+                return count
+    
+    for count in range(chunk_size, min_words - 1, -1):
+        if _is_sentence_end(text, window[count - 1][1], window[count][0]):
+            return count
+    
+    return chunk_size
+
+
+def iter_chunk_spans(text: str, chunk_size: int = 500, overlap: int = 50) -> Iterator[Tuple[int, int]]:
+    """
+    تولید بازه‌های (start, end) تکه‌ها روی متن اصلی به صورت جریانی
+    
+    اندازه تکه و هم‌پوشانی بر حسب کلمه است. هر تکه حداکثر chunk_size کلمه دارد و
+    در صورت امکان در آخرین مرز پاراگراف و سپس جمله در نیمه دوم پنجره بسته می‌شود.
+    تکه بعدی overlap کلمه قبل از پایان تکه قبلی شروع می‌شود و همیشه پس از پایان
+    آن تمام می‌شود (تکه‌ای که فقط بخشی از تکه قبلی باشد تولید نمی‌شود). فقط موقعیت
+    کلمات پنجره جاری در حافظه نگه داشته می‌شود.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size باید مثبت باشد")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("chunk_overlap باید بین صفر و chunk_size باشد")
+    
+    min_words = max(1, chunk_size // 2)
+    window: List[Tuple[int, int]] = []
+    emitted_end = 0
+    # تعداد کلمات ابتدای پنجره که در تکه قبلی آمده‌اند (هم‌پوشانی)
+    carried = 0
+    
+    for match in WORD_PATTERN.finditer(text):
+        window.append(match.span())
+        if len(window) <= chunk_size:
+            continue
+        
+        # مرز تکه باید پس از کلمات هم‌پوشان باشد تا پایان تکه‌ها اکیداً صعودی بماند
+        cut = _find_cut(text, window, chunk_size, max(min_words, carried + 1))
+        emitted_end = window[cut - 1][1]
+        yield window[0][0], emitted_end
+        
+        # هم‌پوشانی حداکثر نیمی از تکه است تا پیشروی تضمین شود
+        dropped = max(1, cut - overlap, cut // 2)
+        del window[:dropped]
+        carried = cut - dropped
+    
+    if window and window[-1][1] > emitted_end:
+        yield window[0][0], window[-1][1]
+
+
+def iter_chunks(text: str, chunk_size: int = 500, overlap: int = 50) -> Iterator[str]:
+    """تولید متن تکه‌ها به صورت جریانی (هر تکه یک برش از متن اصلی است)"""
+    for start, end in iter_chunk_spans(text, chunk_size, overlap):
+        yield text[start:end]
@@ -0,0 +1,201 @@
+"""
+ساخت context پرامپت RAG با سقف توکن
+"""
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import math
+import re
+from api.config import settings
+
+
+# مرز جمله‌ها (فارسی و لاتین) برای کوتاه‌کردن بدون شکستن جمله
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?؟؛\n])\s+')
+
+# حداقل هم‌پوشانی (کاراکتر) برای حذف متن تکراری بین دو تکه مجاور
+MIN_OVERLAP_CHARS = 20
+
+# حداقل بودجه باقی‌مانده برای افزودن بخشی از یک بلوک
+MIN_PARTIAL_TOKENS = 32
+
+
+def load_token_counter(model: str) -> Tuple[Callable[[str], int], str]:
+    """
+    شمارنده توکن برای مدل (tiktoken در صورت نصب بودن)
+    
+    اگر tiktoken یا فایل encoding در دسترس نباشد، تخمین محافظه‌کارانه
+    (هر دو کاراکتر یک توکن؛ نزدیک به رفتار cl100k برای متن فارسی) استفاده می‌شود.
+    """
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text, disallowed_special=()))), encoding.name
+    except Exception as e:
+        print(f"⚠️ tiktoken در دسترس نیست، شمارش توکن تخمینی است: {e}")
+        return (lambda text: math.ceil(len(text) / 2)), "estimate"
+
+
+class ContextBuilder:
+    """
+    بسته‌بندی نتایج جست‌وجو در context با بودجه توکن
+    
+    - تکه‌های تکراری حذف می‌شوند
+    - تکه‌های مجاور یک URL (بر اساس chunk_index) با حذف هم‌پوشانی ادغام می‌شوند
+    - بلوک‌ها به ترتیب امتیاز تا پر شدن بودجه افزوده می‌شوند؛ آخرین بلوک در مرز جمله کوتاه می‌شود
+    """
+    
+    def __init__(self, max_tokens: int, model: Optional[str] = None):
+        self.max_tokens = max_tokens
+        self.model = model or settings.openai_model
+        self._count_tokens: Optional[Callable[[str], int]] = None
+        self.tokenizer_name = ""
+    
+    def count_tokens(self, text: str) -> int:
+        """تعداد توکن‌های متن (بارگذاری تنبل tokenizer)"""
+        if self._count_tokens is None:
+            self._count_tokens, self.tokenizer_name = load_token_counter(self.model)
+        return self._count_tokens(text)
+    
+    @staticmethod
+    def _overlap(left: str, right: str) -> int:
+        """طول بلندترین پسوند left که پیشوند right است"""
+        start = max(0, len(left) - len(right))
+        while right:
+            index = left.find(right[0], start)
+            if index < 0:
+                return 0
+            if right.startswith(left[index:]):
+                return len(left) - index
+            start = index + 1
+        return 0
+    
+    def _merge(self, left: str, right: str) -> str:
+        """الحاق دو تکه مجاور بدون تکرار پنجره هم‌پوشانی"""
+        overlap = self._overlap(left, right)
+        if overlap >= MIN_OVERLAP_CHARS:
+            return left + right[overlap:]
+        return f"{left} {right}"
+    
+    def merge_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        تبدیل نتایج جست‌وجو به بلوک‌های بدون تکرار
+        
+        امتیاز هر بلوک بیشترین امتیاز تکه‌های آن است؛ score همه نتایج باید هم‌مقیاس باشد
+        (RRF در جست‌وجوی ترکیبی، شباهت کسینوسی یا امتیاز rerank).
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        seen_texts = set()
+        
+        for result in results:
+            text = result.get("text", "").strip()
+            if not text or text in seen_texts:
+                continue
+            seen_texts.add(text)
+            
+            metadata = result.get("metadata", {})
+            source = metadata.get("url", "") or metadata.get("title", "")
+            groups.setdefault(source, []).append(result)
+        
+        blocks = []
+        for source, items in groups.items():
+            items.sort(key=lambda item: item.get("metadata", {}).get("chunk_index", -1))
+            current: Optional[Dict[str, Any]] = None
+            
+            for item in items:
+                index = item.get("metadata", {}).get("chunk_index")
+                text = item["text"].strip()
+                
+                if (
+                    current is not None
+                    and index is not None
+                    and current["last_index"] is not None
+                    and index == current["last_index"] + 1
+                ):
+                    current["text"] = self._merge(current["text"], text)
+                    current["last_index"] = index
+                    current["score"] = max(current["score"], item.get("score", 0.0))
+                    continue
+                
+                if current is not None and text in current["text"]:
+                    continue
+                
+                current = {
+                    "text": text,
+                    "source": source,
+                    "metadata": item.get("metadata", {}),
+                    "score": item.get("score", 0.0),
+                    "last_index": index
+                }
+                blocks.append(current)
+        
+        blocks.sort(key=lambda block: block["score"], reverse=True)
+        return blocks
+    
+    def _truncate(self, text: str, budget: int) -> str:
+        """
+        کوتاه‌کردن متن در مرز جمله تا حداکثر budget توکن
+        
+        اگر حتی جمله اول جا نشود، متن در مرز کلمه کوتاه می‌شود.
+        """
+        kept = []
+        used = 0
+        for sentence in SENTENCE_END_PATTERN.split(text):
+            tokens = self.count_tokens(sentence) + 1
+            if used + tokens > budget:
+                if not kept:
+                    return self._truncate_words(sentence, budget)
+                break
+            kept.append(sentence)
+            used += tokens
+        return " ".join(kept)
+    
+    def _truncate_words(self, text: str, budget: int) -> str:
+        """کوتاه‌کردن متن در مرز کلمه تا حداکثر budget توکن"""
+        kept = []
+        used = 0
+        for word in text.split():
+            tokens = self.count_tokens(word) + 1
+            if used + tokens > budget:
+                break
+            kept.append(word)
+            used += tokens
+        return " ".join(kept)
+    
+    def build(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        ساخت context از نتایج جست‌وجو
+        
+        خروجی: context، منابع بلوک‌های استفاده‌شده و تعداد توکن‌ها
+        """
+        blocks = self.merge_results(results)
+        parts: List[str] = []
+        sources: List[str] = []
+        used = 0
+        
+        for block in blocks:
+            header = f"متن {len(parts) + 1}:\n"
+            remaining = self.max_tokens - used - self.count_tokens(header)
+            if remaining < MIN_PARTIAL_TOKENS:
+                break
+            
+            text = block["text"]
+            if self.count_tokens(text) > remaining:
+                text = self._truncate(text, remaining)
+                if not text:
+                    continue
+            
+            part = header + text
+            parts.append(part)
+            used += self.count_tokens(part) + 1
+            
+            source = block["source"] or "منبع ناشناس"
+            if source not in sources:
+                sources.append(source)
+        
+        return {
+            "context": "\n\n".join(parts),
+            "sources": sources,
+            "tokens": used,
+            "blocks": len(parts)
+        }
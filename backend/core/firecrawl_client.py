@@ -1,30 +1,156 @@
 """
 کلاینت Firecrawl برای کراول صفحات وب فارسی
 """
-import requests
-from typing import Dict, List, Optional, Any
+import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+import httpx
+from typing import Dict, List, Optional, Any, AsyncIterator, Tuple
 from api.config import settings
 
 
+# کدهای وضعیتی که خطای گذرا محسوب می‌شوند و تکرار می‌شوند
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class _HostSlot:
+    """semaphore یک سایت مقصد و تعداد taskهای در انتظار یا در حال استفاده از آن"""
+    
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
 class FirecrawlClient:
     """کلاینت Firecrawl برای استخراج محتوای وب"""
     
     def __init__(self):
         self.api_key = settings.firecrawl_api_key
-        self.base_url = "https://api.firecrawl.dev/v1"
+        self.base_url = settings.firecrawl_base_url.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # سقف درخواست‌های همزمان به API و به هر سایت مقصد
+        self._api_slots = asyncio.Semaphore(settings.firecrawl_max_concurrency)
+        self._host_slots: Dict[str, _HostSlot] = {}
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        کلاینت HTTP غیرهمگام مشترک (ساخت تنبل)
+        
+        اتصال‌ها با keep-alive دوباره استفاده می‌شوند و در صورت نصب بودن
+        بسته h2 از HTTP/2 استفاده می‌شود.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                http2=settings.firecrawl_http2 and importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=settings.firecrawl_max_connections,
+                    max_keepalive_connections=settings.firecrawl_max_connections,
+                    keepalive_expiry=30
+                ),
+                timeout=httpx.Timeout(settings.firecrawl_timeout, connect=10)
+            )
+        return self._client
+    
+    async def close(self):
+        """بستن اتصال‌های HTTP"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _backoff(self, attempt: int) -> float:
+        """تأخیر backoff نمایی با jitter کامل"""
+        ceiling = min(settings.firecrawl_retry_max_delay, settings.firecrawl_retry_base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        """خواندن هدر Retry-After (ثانیه یا تاریخ HTTP)"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    
+    async def _request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+        """
+        ارسال درخواست به Firecrawl با تکرار روی 429/5xx و خطاهای شبکه
+        
+        Retry-After در صورت وجود رعایت می‌شود؛ در غیر این صورت backoff نمایی با jitter.
+        درخواست‌های غیر idempotent (مثل شروع کراول) فقط وقتی تکرار می‌شوند که قطعاً
+        پذیرفته نشده‌اند: خطای اتصال، یا 429 همراه با Retry-After. 5xx یا timeout خواندن
+        ممکن است پس از پذیرش رخ دهد و تکرار آن کراول تکراری (و هزینه دوباره) می‌سازد.
+        """
+        client = self._get_client()
+        attempt = 0
+        
+        while True:
+            try:
+                async with self._api_slots:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not retryable or attempt >= settings.firecrawl_max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                reason = str(e) or type(e).__name__
+            else:
+                retryable = response.status_code in RETRY_STATUS_CODES and (
+                    idempotent or (response.status_code == 429 and "Retry-After" in response.headers)
+                )
+                if not retryable or attempt >= settings.firecrawl_max_retries:
+                    return response
+                retry_after = self._retry_after(response)
+                delay = self._backoff(attempt) if retry_after is None else min(retry_after, settings.firecrawl_retry_max_delay)
+                reason = f"HTTP {response.status_code}"
+            
+            attempt += 1
+            print(f"🔁 تلاش مجدد Firecrawl ({attempt}/{settings.firecrawl_max_retries}) پس از {delay:.2f} ثانیه: {reason}")
+            await asyncio.sleep(delay)
     
-    def scrape_url(self, url: str) -> Optional[Dict[str, Any]]:
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        """
+        محدودیت درخواست‌های همزمان به یک سایت مقصد
+        
+        ورودی هر سایت پس از پایان آخرین درخواست آن حذف می‌شود تا در کراول‌ها و
+        افزودن‌های حجیم تعداد ورودی‌ها فقط به سایت‌های فعال محدود بماند.
+        """
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = _HostSlot(settings.firecrawl_per_host_concurrency)
+        slot.users += 1
+        try:
+            async with slot.semaphore:
+                yield
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                del self._host_slots[host]
+    
+    async def scrape_url(self, url: str) -> Optional[Dict[str, Any]]:
         """استخراج محتوای یک URL"""
         
         if not self.api_key:
             print("Firecrawl API key not configured")
             return None
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "url": url,
             "formats": ["markdown", "html"],
@@ -32,12 +158,8 @@ class FirecrawlClient:
         }
         
         try:
-            response = requests.post(
-                f"{self.base_url}/scrape",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            async with self._host_slot(url):
+                response = await self._request("POST", "/scrape", json=payload)
             
             if response.status_code == 200:
                 data = response.json()
@@ -56,23 +178,13 @@ class FirecrawlClient:
             print(f"خطا در اتصال به Firecrawl: {e}")
             return None
     
-    def crawl_website(
+    async def _start_crawl(
         self,
         url: str,
-        max_pages: int = 10,
-        include_paths: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
-        """کراول چندین صفحه از یک وب‌سایت"""
-        
-        if not self.api_key:
-            print("Firecrawl API key not configured")
-            return []
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
+        max_pages: int,
+        include_paths: Optional[List[str]]
+    ) -> Optional[str]:
+        """شروع کراول و بازگرداندن شناسه آن"""
         payload = {
             "url": url,
             "limit": max_pages,
@@ -85,57 +197,156 @@ class FirecrawlClient:
         if include_paths:
             payload["includePaths"] = include_paths
         
+        response = await self._request("POST", "/crawl", idempotent=False, json=payload)
+        
+        if response.status_code != 200:
+            print(f"خطا در شروع کراول: {response.status_code} - {response.text}")
+            return None
+        
+        return response.json().get("id")
+    
+    async def _fetch_crawl_status(
+        self,
+        crawl_id: str,
+        skip: int = 0
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        دریافت وضعیت کراول و صفحات تکمیل‌شده پس از skip صفحه اول
+        
+        نتایج بزرگ صفحه‌بندی می‌شوند؛ لینک‌های next تا انتها دنبال می‌شوند.
+        """
+        status = "scraping"
+        pages: List[Dict[str, Any]] = []
+        next_url: Optional[str] = f"/crawl/{crawl_id}"
+        if skip:
+            next_url += f"?skip={skip}"
+        
+        while next_url:
+            response = await self._request("GET", next_url, timeout=60)
+            response.raise_for_status()
+            
+            body = response.json()
+            status = body.get("status", status)
+            pages.extend(body.get("data") or [])
+            next_url = body.get("next")
+        
+        return status, pages
+    
+    async def crawl_website_iter(
+        self,
+        url: str,
+        max_pages: int = 10,
+        include_paths: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        کراول چندین صفحه از یک وب‌سایت و بازگرداندن هر صفحه به محض تکمیل
+        
+        وضعیت کراول با backoff نمایی poll می‌شود (با رسیدن صفحه جدید فاصله
+        دوباره کوتاه می‌شود) تا کراول تمام شود یا firecrawl_crawl_timeout بگذرد.
+        """
+        
+        if not self.api_key:
+            print("Firecrawl API key not configured")
+            return
+        
         try:
-            # شروع کراول
-            response = requests.post(
-                f"{self.base_url}/crawl",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            crawl_id = await self._start_crawl(url, max_pages, include_paths)
+        except Exception as e:
+            print(f"خطا در کراول: {e}")
+            return
+        
+        if not crawl_id:
+            return
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.firecrawl_crawl_timeout
+        interval = settings.firecrawl_poll_interval
+        seen = set()
+        received = 0
+        
+        while True:
+            try:
+                # صفحات قبلاً دریافت‌شده دوباره دانلود نمی‌شوند
+                status, pages = await self._fetch_crawl_status(crawl_id, skip=received)
+            except Exception as e:
+                # خطای موقت در poll باعث توقف کراول نمی‌شود
+                print(f"خطا در دریافت وضعیت کراول {crawl_id}: {e}")
+                status, pages = "scraping", []
             
-            if response.status_code == 200:
-                data = response.json()
-                crawl_id = data.get("id")
-                
-                # دریافت نتایج کراول
-                status_response = requests.get(
-                    f"{self.base_url}/crawl/{crawl_id}",
-                    headers=headers,
-                    timeout=60
-                )
-                
-                if status_response.status_code == 200:
-                    results = status_response.json()
-                    return results.get("data", [])
+            new_pages = 0
+            for index, page in enumerate(pages, start=received):
+                metadata = page.get("metadata") or {}
+                key = metadata.get("sourceURL") or metadata.get("url") or f"#{index}"
+                if key in seen:
+                    continue
+                seen.add(key)
+                new_pages += 1
+                yield page
+            received += len(pages)
             
-            return []
+            if status == "completed":
+                return
+            if status in ("failed", "cancelled"):
+                print(f"کراول {crawl_id} با وضعیت {status} پایان یافت")
+                return
+            if loop.time() >= deadline:
+                print(f"مهلت کراول {crawl_id} به پایان رسید ({len(seen)} صفحه دریافت شد)")
+                return
             
-        except Exception as e:
-            print(f"خطا در کراول: {e}")
-            return []
+            if new_pages:
+                interval = settings.firecrawl_poll_interval
+            else:
+                interval = min(interval * 2, settings.firecrawl_poll_max_interval)
+            await asyncio.sleep(min(interval, max(0.0, deadline - loop.time())))
     
-    def search_web(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
-        """جست‌وجو در وب و استخراج نتایج"""
+    async def crawl_website(
+        self,
+        url: str,
+        max_pages: int = 10,
+        include_paths: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """کراول چندین صفحه از یک وب‌سایت (منتظر پایان کراول می‌ماند)"""
+        return [
+            page async for page in self.crawl_website_iter(url, max_pages, include_paths)
+        ]
+    
+    def search_candidates(self, query: str, max_results: int = 5) -> List[str]:
+        """URLهای نامزد جست‌وجوی وب برای یک پرسش"""
         
         # برای MVP، از Google Search API یا سایر منابع استفاده می‌کنیم
         # این یک پیاده‌سازی ساده است
         
         # در نسخه واقعی، می‌توان از سرویس‌هایی مانند SerpAPI استفاده کرد
-        search_results = []
-        
         # برای الان، از یک لیست URL های پیش‌فرض استفاده می‌کنیم
         default_persian_sites = [
             f"https://fa.wikipedia.org/wiki/{query}",
             f"https://www.google.com/search?q={query}+site:ir",
         ]
+        return default_persian_sites[:max_results]
+    
+    async def search_web(
+        self,
+        query: str,
+        max_results: int = 5,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        جست‌وجو در وب و استخراج نتایج
+        
+        URLهای نامزد همزمان scrape می‌شوند؛ با timeout (ثانیه) صفحاتی که تا آن زمان
+        دریافت نشده‌اند لغو و نادیده گرفته می‌شوند. ترتیب نتایج همان ترتیب نامزدهاست.
+        """
+        tasks = [asyncio.create_task(self.scrape_url(url)) for url in self.search_candidates(query, max_results)]
+        if not tasks:
+            return []
         
-        for url in default_persian_sites[:max_results]:
-            result = self.scrape_url(url)
-            if result:
-                search_results.append(result)
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"⏱️ {len(pending)} صفحه وب تا پایان مهلت {timeout} ثانیه دریافت نشد")
         
-        return search_results
+        return [task.result() for task in tasks if task in done and task.result()]
 
 
 # نمونه سراسری
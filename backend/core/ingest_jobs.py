@@ -0,0 +1,395 @@
+"""
+صف کارهای پس‌زمینه برای افزودن URLها و کراول وب‌سایت‌ها
+"""
+from typing import Dict, Any, List, Optional, Set
+from collections import OrderedDict
+import asyncio
+import time
+import uuid
+import httpx
+from openai import APIConnectionError
+from qdrant_client.http.exceptions import ResponseHandlingException
+from api.config import settings
+from core.rag_engine import rag_engine, RAGEngine
+from core.ingest_pipeline import ingest_pipeline, IngestPipeline
+from core.firecrawl_client import RETRY_STATUS_CODES
+
+
+class TransientIngestError(Exception):
+    """خطای گذرای دریافت صفحه (مثلاً Firecrawl پس از پایان تلاش‌هایش محتوایی برنگرداند)"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    خطاهایی که تکرار آن‌ها ممکن است موفق شود
+    
+    خطاهای شبکه (httpx)، 429/5xx از Firecrawl، دریافت ناموفق صفحه و خطای اتصال به
+    Qdrant یا سرویس Embedding. بقیه خطاها (ValueError، خطای schema و باگ‌ها) قطعی‌اند.
+    """
+    if isinstance(error, (TransientIngestError, httpx.TransportError, ResponseHandlingException, APIConnectionError)):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in RETRY_STATUS_CODES
+
+
+class IngestJob:
+    """وضعیت و پیشرفت یک کار افزودن"""
+    
+    def __init__(self, kind: str, urls: Optional[List[str]] = None, crawl: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind  # urls | crawl | documents
+        self.crawl = crawl
+        self.status = "queued"  # queued | crawling | running | completed | completed_with_errors | failed
+        self.error: Optional[str] = None
+        
+        self.items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        for url in urls or []:
+            self.add_item(url)
+        
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.chunks = 0
+        
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    def add_item(self, url: str) -> bool:
+        """افزودن یک URL به کار (URLهای تکراری نادیده گرفته می‌شوند)"""
+        if url in self.items:
+            return False
+        self.items[url] = {"status": "queued", "attempts": 0, "chunks": 0, "error": None}
+        return True
+    
+    @property
+    def is_finished(self) -> bool:
+        return self.finished_at is not None
+    
+    def mark_started(self):
+        if self.started_at is None:
+            self.started_at = time.time()
+    
+    def finish_if_done(self):
+        """پایان کار در صورت پردازش همه URLها"""
+        if self.is_finished or self.status in ("queued", "crawling") or self.pending:
+            return
+        self.finished_at = time.time()
+        if self.failed and not self.completed:
+            self.status = "failed"
+        elif self.failed:
+            self.status = "completed_with_errors"
+        else:
+            self.status = "completed"
+    
+    def to_dict(self, include_items: bool = True) -> Dict[str, Any]:
+        """خلاصه وضعیت کار با معیارهای throughput"""
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "total": len(self.items),
+            "completed": self.completed,
+            "failed": self.failed,
+            "pending": self.pending,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(elapsed, 2),
+            "pages_per_minute": round(self.completed / elapsed * 60, 2) if elapsed else 0.0,
+            "chunks_per_second": round(self.chunks / elapsed, 2) if elapsed else 0.0,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.crawl:
+            data["crawl"] = self.crawl
+        if include_items:
+            data["items"] = [{"url": url, **item} for url, item in self.items.items()]
+        return data
+
+
+class IngestJobManager:
+    """
+    مدیریت صف کارهای افزودن با مجموعه‌ای از workerهای همزمان
+    
+    هر URL یک واحد کار در صف است؛ workerها محتوا را دریافت (یا از نتیجه کراول
+    استفاده) می‌کنند و سپس تقسیم، Embedding و ذخیره انجام می‌شود. خطاهای گذرا
+    (is_transient) با backoff نمایی تا ingest_max_retries بار تکرار می‌شوند و بقیه
+    خطاها در همان تلاش اول URL را ناموفق می‌کنند.
+    """
+    
+    def __init__(
+        self,
+        engine: RAGEngine,
+        pipeline: IngestPipeline,
+        workers: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 2.0,
+        history_size: int = 100
+    ):
+        self.engine = engine
+        self.pipeline = pipeline
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.history_size = history_size
+        
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: "Optional[asyncio.Queue]" = None
+        self._tasks: List[asyncio.Task] = []
+        self._background_tasks: Set[asyncio.Task] = set()
+        
+        self.started_at: Optional[float] = None
+        self.pages_completed = 0
+        self.pages_failed = 0
+        self.chunks_added = 0
+        self.retries = 0
+    
+    async def start(self):
+        """راه‌اندازی workerها (در startup برنامه)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self.started_at = time.time()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self):
+        """توقف workerها (در shutdown برنامه)"""
+        tasks = [*self._tasks, *self._background_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._background_tasks.clear()
+        self.pipeline.close()
+    
+    def _register(self, job: IngestJob):
+        """ثبت کار و حذف قدیمی‌ترین کارهای پایان‌یافته"""
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history_size:
+            oldest = next((key for key, item in self.jobs.items() if item.is_finished), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest]
+    
+    def _enqueue(self, job: IngestJob, url: str, page: Optional[Dict[str, Any]] = None):
+        job.pending += 1
+        self._queue.put_nowait((job, url, page))
+    
+    def submit_urls(self, urls: List[str]) -> IngestJob:
+        """ثبت کار افزودن یک یا چند URL"""
+        job = IngestJob(kind="urls", urls=urls)
+        self._register(job)
+        for url in job.items:
+            self._enqueue(job, url)
+        
+        # کار بدون URL (مثلاً refresh بدون سند قابل به‌روزرسانی) هیچ‌گاه به worker نمی‌رسد
+        if not job.items:
+            job.status = "running"
+            job.mark_started()
+        job.finish_if_done()
+        return job
+    
+    def submit_crawl(
+        self,
+        url: str,
+        max_pages: int = 10,
+        include_paths: Optional[List[str]] = None
+    ) -> IngestJob:
+        """ثبت کار کراول یک وب‌سایت"""
+        job = IngestJob(
+            kind="crawl",
+            crawl={"url": url, "max_pages": max_pages, "include_paths": include_paths}
+        )
+        self._register(job)
+        self._spawn(self._run_crawl(job))
+        return job
+    
+    def submit_documents(self, documents: List[Dict[str, Any]]) -> IngestJob:
+        """
+        ثبت کار افزودن دسته‌ای اسناد از طریق خط لوله چند-process
+        
+        هر سند شامل url و در صورت وجود title و content است (بدون content، صفحه دریافت می‌شود).
+        """
+        unique: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        for document in documents:
+            unique.setdefault(document["url"], document)
+        
+        job = IngestJob(kind="documents", urls=list(unique))
+        self._register(job)
+        job.pending = len(unique)
+        self._spawn(self._run_pipeline(job, list(unique.values())))
+        return job
+    
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+    
+    def list(self) -> List[IngestJob]:
+        return list(reversed(self.jobs.values()))
+    
+    async def _run_crawl(self, job: IngestJob):
+        """
+        اجرای کراول و قرار دادن هر صفحه در صف به محض دریافت
+        
+        تقسیم و Embedding صفحات پیش از پایان کراول آغاز می‌شود.
+        """
+        job.status = "crawling"
+        job.mark_started()
+        
+        try:
+            async for page in self.engine.firecrawl_client.crawl_website_iter(
+                job.crawl["url"],
+                max_pages=job.crawl["max_pages"],
+                include_paths=job.crawl["include_paths"]
+            ):
+                metadata = page.get("metadata") or {}
+                url = metadata.get("sourceURL") or metadata.get("url") or job.crawl["url"]
+                if job.add_item(url):
+                    self._enqueue(job, url, {
+                        "title": metadata.get("title", ""),
+                        "content": page.get("markdown", "")
+                    })
+        except Exception as e:
+            job.error = str(e)
+        
+        if not job.items:
+            job.status = "failed"
+            job.error = job.error or "کراول هیچ صفحه‌ای برنگرداند"
+            job.finished_at = time.time()
+            return
+        
+        job.status = "running"
+        job.finish_if_done()
+    
+    async def _run_pipeline(self, job: IngestJob, documents: List[Dict[str, Any]]):
+        """اجرای خط لوله برای اسناد یک کار و ثبت نتیجه هر سند"""
+        job.status = "running"
+        job.mark_started()
+        for item in job.items.values():
+            item["status"] = "running"
+            item["attempts"] = 1
+        
+        async def source():
+            for document in documents:
+                yield document
+        
+        def on_result(url: str, result: Dict[str, Any]):
+            job.pending -= 1
+            self._record_result(job, job.items[url], result)
+        
+        try:
+            stats = await self.pipeline.run(source(), on_result=on_result)
+            job.error = stats["error"]
+        except Exception as e:
+            job.error = str(e)
+        
+        # اسنادی که به دلیل خطا پردازش نشده‌اند
+        for item in job.items.values():
+            if item["status"] == "running":
+                self._mark_failed(job, item, job.error or "پردازش نشد")
+        job.pending = 0
+        job.finish_if_done()
+    
+    def _record_result(self, job: IngestJob, item: Dict[str, Any], result: Dict[str, Any]):
+        """ثبت نتیجه ingest_document برای یک URL"""
+        if not result["success"]:
+            self._mark_failed(job, item, result["message"])
+            return
+        
+        item["status"] = "completed"
+        item["chunks"] = result["chunks_count"]
+        item["error"] = None
+        job.completed += 1
+        # throughput فقط تکه‌های Embedding‌شده را می‌شمارد (نه صفحات بدون تغییر یا تکه‌های استفاده‌شده مجدد)
+        job.chunks += result.get("added", 0)
+        self.pages_completed += 1
+        self.chunks_added += result.get("added", 0)
+    
+    async def _worker(self):
+        """worker پردازش واحدهای کار از صف"""
+        while True:
+            job, url, page = await self._queue.get()
+            try:
+                await self._process(job, url, page)
+            finally:
+                job.pending -= 1
+                job.finish_if_done()
+                self._queue.task_done()
+    
+    async def _process(self, job: IngestJob, url: str, page: Optional[Dict[str, Any]]):
+        """دریافت و افزودن یک URL با تکرار در صورت خطای گذرا"""
+        item = job.items[url]
+        item["status"] = "running"
+        if job.status == "queued":
+            job.status = "running"
+        job.mark_started()
+        
+        while True:
+            item["attempts"] += 1
+            try:
+                if page is None:
+                    page = await self.engine.firecrawl_client.scrape_url(url)
+                    if not page:
+                        raise TransientIngestError("خطا در دریافت محتوای URL")
+                
+                result = await self.engine.ingest_document(
+                    url=url,
+                    title=page.get("title", ""),
+                    content=page.get("content", "")
+                )
+                
+                # محتوای خالی خطای گذرا نیست و تکرار نمی‌شود
+                self._record_result(job, item, result)
+                return
+            
+            except Exception as e:
+                item["error"] = str(e)
+                if not is_transient(e) or item["attempts"] > self.max_retries:
+                    self._mark_failed(job, item, str(e))
+                    return
+                
+                self.retries += 1
+                delay = self.retry_backoff * (2 ** (item["attempts"] - 1))
+                print(f"🔁 تلاش مجدد برای {url} پس از {delay:.1f} ثانیه: {e}")
+                await asyncio.sleep(delay)
+    
+    def _mark_failed(self, job: IngestJob, item: Dict[str, Any], error: str):
+        item["status"] = "failed"
+        item["error"] = error
+        job.failed += 1
+        self.pages_failed += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        """معیارهای کلی throughput از زمان راه‌اندازی"""
+        uptime = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "active_jobs": sum(1 for job in self.jobs.values() if not job.is_finished),
+            "pages_completed": self.pages_completed,
+            "pages_failed": self.pages_failed,
+            "chunks_added": self.chunks_added,
+            "retries": self.retries,
+            "uptime_seconds": round(uptime, 2),
+            "pages_per_minute": round(self.pages_completed / uptime * 60, 2) if uptime else 0.0,
+            "chunks_per_second": round(self.chunks_added / uptime, 2) if uptime else 0.0
+        }
+
+
+# نمونه سراسری
+ingest_job_manager = IngestJobManager(
+    rag_engine,
+    ingest_pipeline,
+    workers=settings.ingest_workers,
+    max_retries=settings.ingest_max_retries,
+    retry_backoff=settings.ingest_retry_backoff,
+    history_size=settings.ingest_jobs_history
+)
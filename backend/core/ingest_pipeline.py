@@ -0,0 +1,318 @@
+"""
+خط لوله افزودن دسته‌ای اسناد با پردازش چند-process
+
+مراحل: دریافت ← نرمال‌سازی/تقسیم در ProcessPool ← Embedding دسته‌ای ← upsert دسته‌ای
+بین مراحل صف‌های محدود قرار دارد تا مرحله کندتر مراحل قبلی را متوقف کند (backpressure).
+"""
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Set
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import os
+import time
+from api.config import settings
+from core.rag_engine import rag_engine, RAGEngine
+from core.text_processing import prepare_document, get_normalizer
+from db.document_store import SOURCE_FIRECRAWL, SOURCE_SUPPLIED
+
+
+# پایان جریان در صف‌ها
+_DONE = object()
+
+
+class _PendingDocument:
+    """سندی که تکه‌های جدید آن در انتظار Embedding و ذخیره هستند"""
+    
+    def __init__(self, url: str, title: str, content_hash: str, plan: Dict[str, Any], source: str):
+        self.url = url
+        self.title = title
+        self.content_hash = content_hash
+        self.plan = plan
+        self.source = source
+        self.remaining = len(plan["new_texts"])
+        self.done = False
+
+
+class IngestPipeline:
+    """
+    افزودن حجیم اسناد با استفاده از همه هسته‌ها
+    
+    نرمال‌سازی hazm و تقسیم (CPU-bound) در processهای جداگانه اجرا می‌شوند؛
+    تکه‌های جدید اسناد مختلف در batchهای ingest_encode_batch_size تایی Embedding
+    و ذخیره می‌شوند. منطق افزودن افزایشی (hash محتوا و تکه‌ها) همان RAGEngine است.
+    """
+    
+    def __init__(
+        self,
+        engine: RAGEngine,
+        process_workers: int = 0,
+        encode_batch_size: int = 128,
+        queue_size: int = 64
+    ):
+        self.engine = engine
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self.encode_batch_size = encode_batch_size
+        self.queue_size = queue_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """ProcessPool مشترک (ساخت تنبل؛ hazm در هر process یک‌بار بارگذاری می‌شود)"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                initializer=get_normalizer
+            )
+        return self._pool
+    
+    def close(self):
+        """بستن processها"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    async def run(
+        self,
+        documents: AsyncIterator[Dict[str, Any]],
+        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        افزودن جریانی از اسناد
+        
+        هر سند دیکشنری با کلیدهای url، title و content است؛ اگر content نباشد
+        محتوا با Firecrawl دریافت می‌شود. نتیجه هر سند (مشابه ingest_document)
+        به on_result داده می‌شود و خلاصه throughput برگردانده می‌شود.
+        """
+        stats: Dict[str, Any] = {"documents": 0, "unchanged": 0, "failed": 0, "chunks": 0, "embedded": 0, "error": None}
+        started = time.perf_counter()
+        
+        def report(url: str, result: Dict[str, Any]):
+            stats["documents"] += 1
+            if not result["success"]:
+                stats["failed"] += 1
+            elif result.get("unchanged"):
+                stats["unchanged"] += 1
+            else:
+                stats["chunks"] += result["chunks_count"]
+                stats["embedded"] += result["added"]
+            if on_result is not None:
+                on_result(url, result)
+        
+        # صف‌های محدود بین مراحل
+        documents_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        chunks_queue: asyncio.Queue = asyncio.Queue(maxsize=self.encode_batch_size * 2)
+        batches_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        
+        # اسنادی که قفل URL آن‌ها به مرحله upsert سپرده شده است
+        pending_documents: Set[_PendingDocument] = set()
+        
+        preparers = self.process_workers * 2
+        tasks = [
+            asyncio.create_task(self._produce(documents, documents_queue, preparers, stats)),
+            asyncio.create_task(self._prepare_all(documents_queue, chunks_queue, preparers, pending_documents, report)),
+            asyncio.create_task(self._encode(chunks_queue, batches_queue)),
+            asyncio.create_task(self._store(batches_queue, pending_documents, report))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # با خطا یا لغو، قفل اسنادی که به پایان نرسیده‌اند آزاد می‌شود
+            for pending in pending_documents:
+                if not pending.done:
+                    pending.done = True
+                    self.engine.unlock_url(pending.url)
+        
+        elapsed = time.perf_counter() - started
+        stats["elapsed_seconds"] = round(elapsed, 2)
+        stats["chunks_per_second"] = round(stats["embedded"] / elapsed, 2) if elapsed else 0.0
+        return stats
+    
+    async def _produce(
+        self,
+        documents: AsyncIterator[Dict[str, Any]],
+        queue: asyncio.Queue,
+        consumers: int,
+        stats: Dict[str, Any]
+    ):
+        """مرحله ۱: خواندن اسناد از منبع (با توقف در صورت پر بودن صف)"""
+        try:
+            async for document in documents:
+                await queue.put(document)
+        except Exception as e:
+            # خطای منبع فقط خواندن را متوقف می‌کند؛ اسناد دریافت‌شده کامل پردازش می‌شوند
+            print(f"خطا در خواندن اسناد: {e}")
+            stats["error"] = str(e)
+        finally:
+            for _ in range(consumers):
+                await queue.put(_DONE)
+    
+    async def _prepare_all(
+        self,
+        documents_queue: asyncio.Queue,
+        chunks_queue: asyncio.Queue,
+        workers: int,
+        pending_documents: Set[_PendingDocument],
+        report: Callable[[str, Dict[str, Any]], None]
+    ):
+        try:
+            await asyncio.gather(*[
+                self._prepare(documents_queue, chunks_queue, pending_documents, report) for _ in range(workers)
+            ])
+        finally:
+            await chunks_queue.put(_DONE)
+    
+    async def _prepare(
+        self,
+        documents_queue: asyncio.Queue,
+        chunks_queue: asyncio.Queue,
+        pending_documents: Set[_PendingDocument],
+        report: Callable[[str, Dict[str, Any]], None]
+    ):
+        """مرحله ۲: دریافت محتوا، مقایسه hash و تقسیم در ProcessPool"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            document = await documents_queue.get()
+            if document is _DONE:
+                return
+            
+            url = document["url"]
+            await self.engine.lock_url(url)
+            locked = True
+            try:
+                title = document.get("title") or ""
+                content = document.get("content")
+                source = SOURCE_SUPPLIED
+                if content is None:
+                    page = await self.engine.firecrawl_client.scrape_url(url)
+                    if not page:
+                        report(url, {"success": False, "message": "خطا در دریافت محتوای URL", "url": url})
+                        continue
+                    title = title or page.get("title", "")
+                    content = page.get("content", "")
+                    source = SOURCE_FIRECRAWL
+                
+                content_hash = self.engine.hash_text(content)
+                previous, unchanged = await self.engine.check_unchanged(url, title, content_hash)
+                if unchanged is not None:
+                    report(url, unchanged)
+                    continue
+                
+                chunks = await loop.run_in_executor(
+                    self._get_pool(),
+                    prepare_document,
+                    content,
+                    settings.chunk_size,
+                    settings.chunk_overlap
+                )
+                if not chunks:
+                    report(url, self.engine.empty_result(url))
+                    continue
+                
+                plan = await self.engine.plan_chunks(url, title, chunks, previous)
+                pending = _PendingDocument(url, title, content_hash, plan, source)
+                
+                if not pending.remaining:
+                    report(url, await self.engine.finish_ingest(url, title, content_hash, plan, source))
+                    continue
+                
+                # قفل URL تا ذخیره آخرین تکه در مرحله upsert نگه داشته می‌شود
+                locked = False
+                pending_documents.add(pending)
+                for index in range(pending.remaining):
+                    await chunks_queue.put((pending, index))
+            except Exception as e:
+                report(url, {"success": False, "message": str(e), "url": url})
+            finally:
+                if locked:
+                    self.engine.unlock_url(url)
+    
+    async def _encode(self, chunks_queue: asyncio.Queue, batches_queue: asyncio.Queue):
+        """مرحله ۳: Embedding دسته‌ای تکه‌های اسناد مختلف"""
+        finished = False
+        try:
+            while not finished:
+                item = await chunks_queue.get()
+                if item is _DONE:
+                    break
+                
+                # batch تا پر شدن یا خالی شدن صف جمع می‌شود
+                batch = [item]
+                while len(batch) < self.encode_batch_size and not chunks_queue.empty():
+                    item = chunks_queue.get_nowait()
+                    if item is _DONE:
+                        finished = True
+                        break
+                    batch.append(item)
+                
+                batch = [(pending, index) for pending, index in batch if not pending.done]
+                if not batch:
+                    continue
+                
+                texts = [pending.plan["new_texts"][index] for pending, index in batch]
+                try:
+                    embeddings = await self.engine.vector_store.embed_documents(texts)
+                except Exception as e:
+                    embeddings = e
+                await batches_queue.put((batch, embeddings))
+        finally:
+            await batches_queue.put(_DONE)
+    
+    async def _store(
+        self,
+        batches_queue: asyncio.Queue,
+        pending_documents: Set[_PendingDocument],
+        report: Callable[[str, Dict[str, Any]], None]
+    ):
+        """مرحله ۴: upsert دسته‌ای و نهایی کردن اسنادی که همه تکه‌هایشان ذخیره شده‌اند"""
+        while True:
+            item = await batches_queue.get()
+            if item is _DONE:
+                return
+            
+            batch, embeddings = item
+            try:
+                if isinstance(embeddings, Exception):
+                    raise embeddings
+                await self.engine.store_embedded(
+                    [pending.plan["new_texts"][index] for pending, index in batch],
+                    [pending.plan["new_metadatas"][index] for pending, index in batch],
+                    embeddings,
+                    [pending.plan["new_ids"][index] for pending, index in batch]
+                )
+            except Exception as e:
+                # تکه‌های ذخیره‌شده سند ناقص در افزودن بعدی (عدم تطابق تعداد) پاک می‌شوند
+                for pending in {id(pending): pending for pending, _ in batch}.values():
+                    if not pending.done:
+                        pending.done = True
+                        pending_documents.discard(pending)
+                        self.engine.unlock_url(pending.url)
+                        report(pending.url, {"success": False, "message": str(e), "url": pending.url})
+                continue
+            
+            for pending, _ in batch:
+                pending.remaining -= 1
+                if pending.remaining or pending.done:
+                    continue
+                pending.done = True
+                pending_documents.discard(pending)
+                try:
+                    result = await self.engine.finish_ingest(
+                        pending.url, pending.title, pending.content_hash, pending.plan, pending.source
+                    )
+                except Exception as e:
+                    result = {"success": False, "message": str(e), "url": pending.url}
+                finally:
+                    self.engine.unlock_url(pending.url)
+                report(pending.url, result)
+
+
+# نمونه سراسری
+ingest_pipeline = IngestPipeline(
+    rag_engine,
+    process_workers=settings.ingest_process_workers,
+    encode_batch_size=settings.ingest_encode_batch_size,
+    queue_size=settings.ingest_queue_size
+)
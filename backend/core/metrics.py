@@ -0,0 +1,90 @@
+"""
+زمان‌سنجی مراحل پردازش پرسش و معیارهای Prometheus
+
+هر مرحله (normalize، embed، vector_search، web_fallback، rerank، context_build،
+llm_first_token، llm_total) با span اندازه‌گیری و در هیستوگرام search_stage_seconds
+ثبت می‌شود. زمان‌ها و توکن‌های هر درخواست در RequestMetrics جاری (contextvar)
+جمع می‌شوند تا در صورت درخواست در پاسخ برگردانده شوند.
+"""
+from typing import Dict, Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from prometheus_client import Counter, Histogram
+
+
+STAGE_SECONDS = Histogram(
+    "search_stage_seconds",
+    "مدت هر مرحله پردازش پرسش",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "توکن‌های مصرف‌شده مدل زبانی (گزارش‌شده در پاسخ OpenAI)",
+    ["kind"]
+)
+
+LLM_EVENTS = Counter(
+    "llm_requests",
+    "رویدادهای درخواست‌های مدل زبانی (retry، hedge، hedge_win، timeout، failure)",
+    ["event"]
+)
+
+
+class RequestMetrics:
+    """زمان مراحل (میلی‌ثانیه) و توکن‌های یک درخواست"""
+    
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+    
+    def add_time(self, stage: str, seconds: float):
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds * 1000, 2)
+    
+    def add_tokens(self, kind: str, count: int):
+        self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def start_request() -> RequestMetrics:
+    """شروع جمع‌آوری معیارهای درخواست جاری (taskهای فرزند همان شیء را می‌بینند)"""
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def observe(stage: str, seconds: float):
+    """ثبت مدت یک مرحله در هیستوگرام و درخواست جاری"""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_time(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """زمان‌سنجی یک مرحله"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int):
+    """ثبت مصرف توکن یک فراخوانی مدل زبانی"""
+    LLM_TOKENS.labels(kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(kind="completion").inc(completion_tokens)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_tokens("prompt_tokens", prompt_tokens)
+        metrics.add_tokens("completion_tokens", completion_tokens)
+
+
+def record_llm_event(event: str):
+    """شمارش رویدادهای کلاینت مدل زبانی"""
+    LLM_EVENTS.labels(event=event).inc()
@@ -1,69 +1,420 @@
 """
 کلاینت OpenAI با پشتیبانی از تنظیمات سفارشی
+
+همه درخواست‌ها از یک pool اتصال مشترک، با سقف همزمانی (llm_max_concurrency)، تکرار
+روی 429/5xx و خطاهای شبکه، مهلت کلی هر درخواست (llm_timeout) و در صورت تنظیم
+llm_hedge_base_url با hedging به Base URL دوم ارسال می‌شوند. خطاها پس از پایان
+تلاش‌ها یا مهلت به صورت LLMError بالا می‌روند (API با کد 503 پاسخ می‌دهد)؛ رد درخواست
+توسط سرویس (4xx غیرقابل تکرار، مثل کلید نامعتبر) LLMClientError است (API با کد 502).
 """
-from openai import OpenAI
-from typing import List, Dict, Any
+from openai import AsyncOpenAI, APIConnectionError, APIError, APIStatusError, APITimeoutError
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Set, Tuple, TypeVar
+import asyncio
+import random
+import time
+import httpx
 from api.config import settings
+from core.metrics import span, observe, record_tokens, record_llm_event
+
+
+# کدهای وضعیتی که خطای گذرا محسوب می‌شوند و تکرار می‌شوند
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class LLMError(Exception):
+    """خطای مدل زبانی پس از پایان تلاش‌ها یا مهلت درخواست"""
+
+
+class LLMClientError(LLMError):
+    """رد درخواست توسط سرویس مدل زبانی با خطای 4xx غیرقابل تکرار (کلید، مدل یا پارامتر نامعتبر)"""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _usage_counts(usage: Any) -> Tuple[int, int]:
+    """توکن‌های prompt و completion از usage پاسخ (شیء یا dict در chunkهای stream)"""
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+
+def _describe(error: BaseException) -> str:
+    if isinstance(error, APIStatusError):
+        return f"HTTP {error.status_code}: {error.message}"
+    return str(error) or type(error).__name__
+
+
+class _Endpoints:
+    """کلاینت‌های یک پیکربندی (اصلی و hedge) و تعداد درخواست‌های در حال اجرا با آن‌ها"""
+    
+    def __init__(self, primary: AsyncOpenAI, hedge: Optional[AsyncOpenAI]):
+        self.primary = primary
+        self.hedge = hedge
+        self.active = 0
+        self.retired = False
+    
+    async def close(self):
+        for client in (self.primary, self.hedge):
+            if client is not None:
+                await client.close()
 
 
 class OpenAIClient:
     """کلاینت OpenAI با قابلیت تنظیم API Key و Base URL"""
     
     def __init__(self):
-        self.client = None
-        self._initialize_client()
-    
-    def _initialize_client(self):
-        """مقداردهی اولیه کلاینت OpenAI"""
-        self.client = OpenAI(
-            api_key=settings.openai_api_key,
-            base_url=settings.openai_base_url
+        # کلاینت اصلی و کلاینت hedge؛ با تغییر تنظیمات هر دو یک‌جا جایگزین می‌شوند و
+        # درخواست‌های در حال اجرا (از جمله streamها) تا پایان با کلاینت‌های قبلی ادامه می‌دهند
+        self._endpoints = self._build_endpoints(settings.openai_api_key, settings.openai_base_url)
+        self._retired: Set[_Endpoints] = set()
+        self._closing: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(settings.llm_max_concurrency)
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        return self._endpoints.primary
+    
+    @staticmethod
+    def _build_client(api_key: str, base_url: str) -> AsyncOpenAI:
+        """کلاینت با pool اتصال keep-alive؛ تکرار خودکار SDK غیرفعال است (تکرار در _call)"""
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=httpx.Timeout(settings.llm_timeout, connect=10),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_connections,
+                    keepalive_expiry=30
+                )
+            )
         )
     
+    def _build_endpoints(self, api_key: str, base_url: str) -> _Endpoints:
+        hedge = None
+        if settings.llm_hedge_base_url and settings.llm_hedge_after_ms > 0:
+            hedge = self._build_client(settings.llm_hedge_api_key or api_key, settings.llm_hedge_base_url)
+        return _Endpoints(self._build_client(api_key, base_url), hedge)
+    
     def update_config(self, api_key: str, base_url: str):
-        """به‌روزرسانی پیکربندی OpenAI"""
+        """
+        به‌روزرسانی پیکربندی OpenAI
+        
+        کلاینت‌های جدید در یک انتساب جایگزین می‌شوند؛ کلاینت‌های قبلی پس از پایان آخرین
+        درخواست در حال اجرا با آن‌ها (از جمله streamهای طولانی) بسته می‌شوند.
+        """
         settings.openai_api_key = api_key
         settings.openai_base_url = base_url
-        self._initialize_client()
+        previous = self._endpoints
+        self._endpoints = self._build_endpoints(api_key, base_url)
+        
+        previous.retired = True
+        if previous.active:
+            self._retired.add(previous)
+        else:
+            self._schedule_close(previous)
     
-    def get_embedding(self, text: str, model: str = "text-embedding-ada-002") -> List[float]:
-        """دریافت embedding برای متن"""
+    def _schedule_close(self, endpoints: _Endpoints):
+        self._retired.discard(endpoints)
+        task = asyncio.get_running_loop().create_task(endpoints.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    @contextmanager
+    def _lease(self) -> Iterator[_Endpoints]:
+        """
+        ثابت نگه داشتن پیکربندی در طول یک درخواست
+        
+        کلاینت‌های بازنشسته (پس از update_config) با پایان آخرین lease بسته می‌شوند.
+        """
+        endpoints = self._endpoints
+        endpoints.active += 1
         try:
-            response = self.client.embeddings.create(
-                model=model,
-                input=text
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"خطا در دریافت embedding: {e}")
-            return []
+            yield endpoints
+        finally:
+            endpoints.active -= 1
+            if endpoints.retired and not endpoints.active:
+                self._schedule_close(endpoints)
+    
+    async def close(self):
+        """بستن اتصال‌های HTTP کلاینت (از جمله کلاینت‌های بازنشسته)"""
+        for endpoints in [self._endpoints, *self._retired]:
+            await endpoints.close()
+        self._retired.clear()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+    
+    @staticmethod
+    def _retryable(error: BaseException) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRY_STATUS_CODES
+        return isinstance(error, (APIConnectionError, APITimeoutError, httpx.TransportError))
+    
+    @staticmethod
+    def _failure(error: BaseException, label: str) -> LLMError:
+        """
+        خطای نهایی: LLMClientError برای رد درخواست (4xx غیرقابل تکرار)، در غیر این صورت LLMError
+        
+        4xxهای قابل تکرار (408/409/429) پس از پایان تلاش‌ها یا مهلت خطای موقت هستند (503).
+        """
+        record_llm_event("failure")
+        message = f"خطا در {label}: {_describe(error)}"
+        if (
+            isinstance(error, APIStatusError)
+            and 400 <= error.status_code < 500
+            and not OpenAIClient._retryable(error)
+        ):
+            return LLMClientError(message, error.status_code)
+        return LLMError(message)
+    
+    @staticmethod
+    def _retry_delay(error: BaseException, attempt: int) -> float:
+        """Retry-After (ثانیه) در صورت وجود؛ در غیر این صورت backoff نمایی با jitter کامل"""
+        if isinstance(error, APIStatusError):
+            try:
+                return min(max(0.0, float(error.response.headers.get("Retry-After", ""))), settings.llm_retry_max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * (2 ** attempt)))
+    
+    @asynccontextmanager
+    async def _slot(self, deadline: float):
+        """گرفتن ظرفیت همزمانی تا پیش از پایان مهلت درخواست"""
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self._slots.acquire()
+        except TimeoutError as e:
+            record_llm_event("timeout")
+            raise LLMError(f"مدل زبانی در مهلت {settings.llm_timeout:g} ثانیه ظرفیت آزاد نداشت") from e
+        try:
+            yield
+        finally:
+            self._slots.release()
+    
+    async def _hedged(
+        self,
+        request: Callable[[AsyncOpenAI], Awaitable[T]],
+        primary: AsyncOpenAI,
+        hedge: AsyncOpenAI,
+        discard: Optional[Callable[[T], Awaitable[None]]]
+    ) -> T:
+        """
+        ارسال به Base URL اصلی و پس از llm_hedge_after_ms به Base URL دوم؛ اولین پاسخ موفق
+        
+        درخواست دوم فقط با ظرفیت آزاد ارسال می‌شود تا hedging در زمان اشباع بار را دو
+        برابر نکند. درخواست بازنده لغو و نتیجه آن (مثلاً stream باز) با discard آزاد می‌شود.
+        """
+        async def send_hedge() -> T:
+            async with self._slots:
+                return await request(hedge)
+        
+        hedge_task = None
+        pending = {asyncio.ensure_future(request(primary))}
+        started = set(pending)
+        winner = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=settings.llm_hedge_after_ms / 1000)
+            if not done and not self._slots.locked():
+                hedge_task = asyncio.ensure_future(send_hedge())
+                pending.add(hedge_task)
+                started.add(hedge_task)
+                record_llm_event("hedge")
+            
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is hedge_task:
+                            record_llm_event("hedge_win")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in started:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+    
+    async def _call(
+        self,
+        request: Callable[[AsyncOpenAI], Awaitable[T]],
+        label: str,
+        deadline: float,
+        endpoints: _Endpoints,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None
+    ) -> T:
+        """
+        اجرای request با تکرار روی خطاهای گذرا و hedging تا پیش از deadline
+        
+        request با کلاینت هر Base URL پیکربندی endpoints (از _lease) فراخوانی می‌شود.
+        پس از پایان تلاش‌ها یا مهلت LLMError و با رد درخواست LLMClientError رخ می‌دهد.
+        """
+        primary, hedge = endpoints.primary, endpoints.hedge
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        try:
+            async with asyncio.timeout_at(deadline):
+                while True:
+                    try:
+                        if hedge is None:
+                            return await request(primary)
+                        return await self._hedged(request, primary, hedge, discard)
+                    except (APIError, httpx.HTTPError) as e:
+                        if not self._retryable(e) or attempt >= settings.llm_max_retries:
+                            raise self._failure(e, label) from e
+                        delay = self._retry_delay(e, attempt)
+                        if loop.time() + delay >= deadline:
+                            raise self._failure(e, label) from e
+                        attempt += 1
+                        record_llm_event("retry")
+                        print(f"🔁 تلاش مجدد {label} ({attempt}/{settings.llm_max_retries}) پس از {delay:.2f} ثانیه: {_describe(e)}")
+                        await asyncio.sleep(delay)
+        except TimeoutError as e:
+            record_llm_event("timeout")
+            raise LLMError(f"{label} در مهلت {settings.llm_timeout:g} ثانیه پاسخ نداد") from e
+    
+    def _deadline(self) -> float:
+        return asyncio.get_running_loop().time() + settings.llm_timeout
+    
+    async def get_embedding(self, text: str, model: str = "text-embedding-ada-002") -> List[float]:
+        """دریافت embedding برای متن"""
+        deadline = self._deadline()
+        with self._lease() as endpoints:
+            async with self._slot(deadline):
+                response = await self._call(
+                    lambda client: client.embeddings.create(model=model, input=text),
+                    "دریافت embedding",
+                    deadline,
+                    endpoints
+                )
+        return response.data[0].embedding
     
-    def chat_completion(
+    async def chat_completion(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 2000
     ) -> str:
-        """ارسال درخواست chat completion"""
+        """ارسال درخواست chat completion (خطا: LLMError یا LLMClientError)"""
+        deadline = self._deadline()
+        with span("llm_total"), self._lease() as endpoints:
+            async with self._slot(deadline):
+                response = await self._call(
+                    lambda client: client.chat.completions.create(
+                        model=settings.openai_model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    ),
+                    "chat completion",
+                    deadline,
+                    endpoints
+                )
+        if response.usage is not None:
+            record_tokens(*_usage_counts(response.usage))
+        return response.choices[0].message.content
+    
+    @staticmethod
+    async def _open_stream(client: AsyncOpenAI, **kwargs) -> Tuple[Any, AsyncIterator[Any], List[Any]]:
+        """
+        باز کردن stream و خواندن تا اولین تکه دارای متن
+        
+        تکرار و hedging فقط تا این لحظه ممکن است (پس از ارسال اولین توکن به کاربر،
+        درخواست قابل تکرار نیست). خروجی: stream، iterator آن و تکه‌های خوانده‌شده.
+        """
+        stream = await client.chat.completions.create(stream=True, **kwargs)
+        iterator = stream.__aiter__()
+        chunks = []
         try:
-            response = self.client.chat.completions.create(
-                model=settings.openai_model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"خطا در chat completion: {e}")
-            return f"متأسفانه خطایی رخ داد: {str(e)}"
+            while True:
+                chunk = await anext(iterator)
+                chunks.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return stream, iterator, chunks
+        except StopAsyncIteration:
+            return stream, iterator, chunks
+        except BaseException:
+            await stream.close()
+            raise
     
-    def generate_rag_response(
+    @staticmethod
+    async def _close_stream(opened: Tuple[Any, AsyncIterator[Any], List[Any]]):
+        await opened[0].close()
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000
+    ) -> AsyncIterator[str]:
+        """
+        ارسال درخواست chat completion به صورت stream و بازگرداندن تکه‌های پاسخ
+        
+        llm_timeout تا اولین توکن و llm_stream_idle_timeout بین تکه‌ها اعمال می‌شود؛
+        خطا: LLMError یا LLMClientError. کلاینت تا پایان stream بسته نمی‌شود.
+        """
+        started = time.perf_counter()
+        deadline = self._deadline()
+        try:
+            with self._lease() as endpoints:
+                async with self._slot(deadline):
+                    stream, iterator, chunks = await self._call(
+                        lambda client: self._open_stream(
+                            client,
+                            model=settings.openai_model,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            # آخرین chunk شامل usage است (در سرویس‌های پشتیبانی‌کننده)
+                            extra_body={"stream_options": {"include_usage": True}} if settings.openai_stream_usage else None
+                        ),
+                        "chat completion (stream)",
+                        deadline,
+                        endpoints,
+                        discard=self._close_stream
+                    )
+                    if chunks and chunks[-1].choices and chunks[-1].choices[0].delta.content:
+                        observe("llm_first_token", time.perf_counter() - started)
+                    try:
+                        while True:
+                            for chunk in chunks:
+                                usage = getattr(chunk, "usage", None)
+                                if usage:
+                                    record_tokens(*_usage_counts(usage))
+                                if chunk.choices and chunk.choices[0].delta.content:
+                                    yield chunk.choices[0].delta.content
+                            try:
+                                chunks = [await asyncio.wait_for(anext(iterator), settings.llm_stream_idle_timeout)]
+                            except StopAsyncIteration:
+                                break
+                            except TimeoutError as e:
+                                record_llm_event("timeout")
+                                raise LLMError(f"پاسخ stream مدل زبانی {settings.llm_stream_idle_timeout:g} ثانیه متوقف ماند") from e
+                            except (APIError, httpx.HTTPError) as e:
+                                raise self._failure(e, "chat completion (stream)") from e
+                    finally:
+                        await stream.close()
+        finally:
+            observe("llm_total", time.perf_counter() - started)
+    
+    def build_rag_messages(
         self,
         query: str,
         context: str,
         sources: List[str]
-    ) -> Dict[str, Any]:
-        """تولید پاسخ RAG با پرامپت فارسی"""
+    ) -> List[Dict[str, str]]:
+        """ساخت پیام‌های پرامپت RAG فارسی"""
         
         # پرامپت RAG فارسی
         system_prompt = """شما یک دستیار هوشمند فارسی‌زبان هستید که وظیفه دارید به سؤالات کاربران بر اساس اطلاعات موجود پاسخ دهید.
@@ -90,18 +441,38 @@ class OpenAIClient:
 
 لطفاً به سؤال پاسخ دهید."""
 
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
-        
-        answer = self.chat_completion(messages, temperature=0.3)
+    
+    async def generate_rag_response(
+        self,
+        query: str,
+        context: str,
+        sources: List[str]
+    ) -> Dict[str, Any]:
+        """تولید پاسخ RAG با پرامپت فارسی"""
+        messages = self.build_rag_messages(query, context, sources)
+        answer = await self.chat_completion(messages, temperature=0.3)
         
         return {
             "answer": answer,
             "sources": sources,
             "query": query
         }
+    
+    
+    async def stream_rag_response(
+        self,
+        query: str,
+        context: str,
+        sources: List[str]
+    ) -> AsyncIterator[str]:
+        """تولید پاسخ RAG به صورت stream"""
+        messages = self.build_rag_messages(query, context, sources)
+        async for delta in self.stream_chat_completion(messages, temperature=0.3):
+            yield delta
 
 
 # نمونه سراسری
@@ -1,43 +1,492 @@
 """
 موتور RAG برای پردازش جست‌وجو و تولید پاسخ
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Iterator, Tuple, Set
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import hashlib
 import re
-from hazm import Normalizer, word_tokenize
+import numpy as np
 from db.vector_store import vector_store
+from db.document_store import document_store, SOURCE_FIRECRAWL
+from db.search_history import search_history
 from core.openai_client import openai_client
 from core.firecrawl_client import firecrawl_client
+from core.semantic_cache import SemanticCache
+from core.context_builder import ContextBuilder
+from core.reranker import CrossEncoderReranker
+from core.metrics import span
+from core.chunker import iter_chunks
+from core.text_processing import (
+    normalize_text, normalize_document, prepare_document, word_tokenize, get_stopwords, get_normalizer,
+    normalize_paragraphs, paragraph_batches
+)
+from api.config import settings
+
+
+# توکن‌هایی که حداقل یک حرف یا رقم دارند (حذف علائم نگارشی)
+WORD_PATTERN = re.compile(r'\w')
+
+NO_RESULTS_ANSWER = "متأسفانه اطلاعاتی برای پاسخ به این سؤال یافت نشد. لطفاً سؤال دیگری بپرسید یا ابتدا URLهای مرتبط را اضافه کنید."
 
 
 class RAGEngine:
     """موتور RAG برای پردازش سوالات فارسی"""
     
     def __init__(self):
-        self.normalizer = Normalizer()
         self.vector_store = vector_store
         self.openai_client = openai_client
         self.firecrawl_client = firecrawl_client
+        self.document_store = document_store
+        self._url_locks: Dict[str, List[Any]] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.cache = SemanticCache(
+            max_entries=settings.semantic_cache_max_entries,
+            ttl_seconds=settings.semantic_cache_ttl_seconds,
+            similarity_threshold=settings.semantic_cache_similarity_threshold
+        ) if settings.semantic_cache_enabled else None
+        
+        # بسته‌بندی نتایج در context با سقف توکن
+        self.context_builder = ContextBuilder(max_tokens=settings.context_max_tokens)
+        
+        # مرتب‌سازی مجدد نامزدها با Cross-Encoder (اختیاری)
+        self.reranker = CrossEncoderReranker(
+            settings.rerank_model,
+            batch_size=settings.rerank_batch_size,
+            time_budget_ms=settings.rerank_time_budget_ms,
+            max_length=settings.rerank_max_length
+        ) if settings.rerank_enabled else None
+        
+        # processهای نرمال‌سازی اسناد بزرگ (ساخت تنبل؛ غیرفعال با normalize_process_workers=0)
+        self._normalize_pool: Optional[ProcessPoolExecutor] = None
+        
+        # وضعیت آماده‌سازی (برای /api/ready)
+        self.ready = False
+        self.startup_error: Optional[str] = None
     
     def normalize_text(self, text: str) -> str:
         """نرمال‌سازی متن فارسی"""
-        # حذف کاراکترهای اضافی
-        text = re.sub(r'\s+', ' ', text)
-        text = self.normalizer.normalize(text)
-        return text.strip()
+        return normalize_text(text)
+    
+    def normalize_document(self, text: str) -> str:
+        """نرمال‌سازی یک سند با حفظ مرز پاراگراف‌ها (برای تقسیم‌بندی)"""
+        return normalize_document(text)
+    
+    def chunk_text(
+        self,
+        text: str,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> Iterator[str]:
+        """تقسیم جریانی متن به تکه‌های هم‌پوشان (پیش‌فرض: settings.chunk_size و chunk_overlap)"""
+        return iter_chunks(
+            text,
+            chunk_size=chunk_size or settings.chunk_size,
+            overlap=settings.chunk_overlap if overlap is None else overlap
+        )
+    
+    @property
+    def hybrid_enabled(self) -> bool:
+        """جست‌وجوی ترکیبی فعال است و کالکشن بردار واژگانی BM25 دارد"""
+        return settings.hybrid_search_enabled and self.vector_store.lexical_enabled
+    
+    def tokenize(self, text: str) -> List[str]:
+        """توکنایز متن نرمال‌شده برای ایندکس BM25 (بدون علائم نگارشی و کلمات ایست)"""
+        stopwords = get_stopwords()
+        return [
+            token.lower() for token in word_tokenize(text)
+            if WORD_PATTERN.search(token) and token not in stopwords
+        ]
+    
+    def tokenize_many(self, texts: List[str]) -> List[List[str]]:
+        return [self.tokenize(text) for text in texts]
+    
+    def prepare_chunks(self, content: str) -> List[str]:
+        """نرمال‌سازی و تقسیم یک سند (CPU-bound؛ خارج از event loop اجرا شود)"""
+        return prepare_document(content, settings.chunk_size, settings.chunk_overlap)
+    
+    def _get_normalize_pool(self) -> ProcessPoolExecutor:
+        if self._normalize_pool is None:
+            self._normalize_pool = ProcessPoolExecutor(
+                max_workers=settings.normalize_process_workers,
+                initializer=get_normalizer
+            )
+        return self._normalize_pool
+    
+    async def prepare_chunks_async(self, content: str) -> List[str]:
+        """
+        نرمال‌سازی و تقسیم یک سند خارج از event loop
+        
+        اسناد بزرگ‌تر از normalize_parallel_min_chars (در صورت تنظیم normalize_process_workers)
+        در batchهای پاراگرافی بین processها نرمال و سپس در thread تقسیم می‌شوند؛
+        خروجی با prepare_chunks یکسان است.
+        """
+        if settings.normalize_process_workers <= 0 or len(content) < settings.normalize_parallel_min_chars:
+            return await asyncio.to_thread(self.prepare_chunks, content)
+        
+        loop = asyncio.get_running_loop()
+        pool = self._get_normalize_pool()
+        normalized = await asyncio.gather(*[
+            loop.run_in_executor(pool, normalize_paragraphs, batch)
+            for batch in paragraph_batches(content, settings.normalize_batch_chars)
+        ])
+        text = "\n\n".join(paragraph for batch in normalized for paragraph in batch)
+        return await asyncio.to_thread(lambda: list(self.chunk_text(text)))
+    
+    async def initialize(self):
+        """
+        آماده‌سازی وابستگی‌ها در startup
+        
+        بارگذاری مدل Embedding، اتصال Qdrant و ابزارهای hazm تا این لحظه به تعویق
+        می‌افتند تا import ماژول‌ها (و راه‌اندازی مجدد با --reload) سریع باشد.
+        """
+        try:
+            await asyncio.to_thread(self._load_text_tools)
+            await self.vector_store.initialize()
+            if self.reranker is not None:
+                await self.reranker.initialize()
+        except Exception as e:
+            self.startup_error = str(e)
+            raise
+        self.ready = True
+        self.startup_error = None
+        
+        if self.hybrid_enabled:
+            self._spawn(self._backfill_lexical_index())
+    
+    @staticmethod
+    def _load_text_tools():
+        """بارگذاری hazm (Normalizer، توکنایزر و کلمات ایست) پیش از اولین درخواست"""
+        get_normalizer()
+        get_stopwords()
+        word_tokenize("آماده")
+    
+    async def _backfill_lexical_index(self):
+        """
+        افزودن بردار واژگانی به تکه‌هایی که بدون آن ذخیره شده‌اند (مثلاً با hybrid_search_enabled=false)
+        
+        ایندکس BM25 در خود Qdrant است و با راه‌اندازی مجدد ساخته نمی‌شود؛ این کار فقط تکه‌های
+        جاافتاده را در پس‌زمینه (پس از آماده شدن سرویس) تکمیل می‌کند و قابل ادامه است.
+        """
+        try:
+            missing = await self.vector_store.count_missing_lexical()
+            if not missing:
+                return
+            print(f"🔤 افزودن بردار واژگانی به {missing} تکه...")
+            
+            done = 0
+            async for batch in self.vector_store.iter_missing_lexical():
+                token_lists = await asyncio.to_thread(self.tokenize_many, [point["text"] for point in batch])
+                await self.vector_store.set_lexical([point["id"] for point in batch], token_lists)
+                done += len(batch)
+            print(f"✅ بردار واژگانی {done} تکه ذخیره شد")
+        except Exception as e:
+            print(f"⚠️ خطا در تکمیل ایندکس واژگانی: {e}")
+    
+    async def close(self):
+        """آزادسازی اتصال‌ها در shutdown"""
+        # فرصت محدود برای پایان ذخیره صفحات وب در پس‌زمینه
+        if self._background_tasks:
+            _, pending = await asyncio.wait(self._background_tasks, timeout=settings.web_search_timeout)
+            for task in pending:
+                task.cancel()
+        await self.firecrawl_client.close()
+        await self.openai_client.close()
+        await self.vector_store.close()
+        if self.reranker is not None:
+            self.reranker.close()
+        if self._normalize_pool is not None:
+            self._normalize_pool.shutdown(wait=False, cancel_futures=True)
+            self._normalize_pool = None
+    
+    async def _lookup_cache(
+        self,
+        normalized_query: str,
+        use_web_search: bool,
+        top_k: int
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        جست‌وجو در کش معنایی
+        
+        ابتدا تطابق دقیق (بدون embedding) و سپس تطابق معنایی بررسی می‌شود.
+        embedding محاسبه‌شده برگردانده می‌شود تا در بازیابی دوباره محاسبه نشود.
+        """
+        if self.cache is None:
+            return None, None
+        
+        cached = self.cache.get_exact(normalized_query, top_k, use_web_search)
+        if cached is not None:
+            return cached, None
+        
+        with span("embed"):
+            query_embedding = await self.vector_store.embed_query(normalized_query)
+        cached = self.cache.get_similar(query_embedding, top_k, use_web_search)
+        return cached, query_embedding
+    
+    def _store_in_cache(
+        self,
+        normalized_query: str,
+        query_embedding: np.ndarray,
+        use_web_search: bool,
+        top_k: int,
+        response: Dict[str, Any]
+    ):
+        """ذخیره پاسخ در کش معنایی (خطاهای مدل زبانی به صورت LLMError بالا می‌روند و به اینجا نمی‌رسند)"""
+        if self.cache is None:
+            return
+        self.cache.set(normalized_query, query_embedding, top_k, use_web_search, response)
+    
+    @staticmethod
+    def _record_history(normalized_query: str, answer: str, sources: List[str], search_type: str):
+        """ثبت جست‌وجو در تاریخچه (ذخیره دسته‌ای در پس‌زمینه؛ درخواست منتظر دیتابیس نمی‌ماند)"""
+        search_history.record(normalized_query, answer, sources, search_type)
+    
+    async def _add_documents(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        افزودن اسناد به Vector Store و باطل کردن پاسخ‌های کش‌شده مرتبط
+        
+        Embedding و ذخیره در پنجره‌های ingest_encode_batch_size تایی انجام می‌شود تا
+        حافظه برای صفحات بسیار بزرگ ثابت بماند.
+        """
+        if ids is None:
+            ids = [self.vector_store.generate_id(text) for text in texts]
+        
+        window = max(1, settings.ingest_encode_batch_size)
+        for start in range(0, len(texts), window):
+            end = start + window
+            embeddings = await self.vector_store.embed_documents(texts[start:end])
+            await self.store_embedded(texts[start:end], metadatas[start:end], embeddings, ids[start:end])
+        return ids
+    
+    async def store_embedded(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """ذخیره تکه‌های Embedding‌شده (همراه با بردار واژگانی BM25) در Vector Store"""
+        token_lists = await asyncio.to_thread(self.tokenize_many, texts) if self.hybrid_enabled else None
+        ids = await self.vector_store.add_documents(
+            texts, metadatas, embeddings=embeddings, ids=ids, token_lists=token_lists
+        )
+        
+        if self.cache is not None:
+            urls = [metadata['url'] for metadata in metadatas if metadata.get('url')]
+            invalidated = self.cache.invalidate(urls, embeddings)
+            if invalidated:
+                print(f"♻️ {invalidated} پاسخ کش‌شده باطل شد")
+        
+        return ids
+    
+    async def _search(
+        self,
+        normalized_query: str,
+        query_embedding: np.ndarray,
+        top_k: int,
+        score_threshold: float
+    ) -> List[Dict[str, Any]]:
+        """
+        جست‌وجوی ترکیبی: نتایج معنایی و BM25 با Reciprocal Rank Fusion ادغام می‌شوند
+        
+        امتیاز هر تکه: مجموع 1 / (k + رتبه) در هر فهرست. امتیازهای اصلی در
+        vector_score و lexical_score نگه داشته می‌شوند.
+        """
+        if not self.hybrid_enabled:
+            return await self.vector_store.search(
+                query=normalized_query,
+                top_k=top_k,
+                score_threshold=score_threshold,
+                query_embedding=query_embedding
+            )
+        
+        candidates = max(top_k, settings.hybrid_candidates)
+        dense_results = await self.vector_store.search(
+            query=normalized_query,
+            top_k=candidates,
+            score_threshold=score_threshold,
+            query_embedding=query_embedding
+        )
+        lexical_results = await self.vector_store.lexical_search(self.tokenize(normalized_query), candidates)
+        
+        fused: Dict[str, Dict[str, Any]] = {}
+        for rank, result in enumerate(dense_results):
+            fused[result["id"]] = {
+                **result,
+                "vector_score": result["score"],
+                "lexical_score": None,
+                "score": 1 / (settings.hybrid_rrf_k + rank + 1)
+            }
+        
+        for rank, result in enumerate(lexical_results):
+            entry = fused.setdefault(result["id"], {**result, "vector_score": None, "score": 0.0})
+            entry["lexical_score"] = result["score"]
+            entry["score"] += 1 / (settings.hybrid_rrf_k + rank + 1)
+        
+        ranked = sorted(fused.values(), key=lambda item: item["score"], reverse=True)[:top_k]
+        return [item for item in ranked if item["text"]]
+    
+    async def retrieve(
+        self,
+        normalized_query: str,
+        use_web_search: bool = False,
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """
+        مرحله بازیابی: جست‌وجوی معنایی و در صورت نیاز جست‌وجوی وب
+        
+        خروجی شامل نتایج جست‌وجو، context، منابع و embedding پرسش است.
+        """
+        
+        # 2. جست‌وجوی ترکیبی (معنایی + واژگانی)
+        if query_embedding is None:
+            with span("embed"):
+                query_embedding = await self.vector_store.embed_query(normalized_query)
+        
+        # با rerank نامزدهای بیشتری بازیابی و سپس بهترین‌ها انتخاب می‌شوند
+        candidates = max(top_k, settings.rerank_candidates) if self.reranker is not None else top_k
+        with span("vector_search"):
+            search_results = await self._search(normalized_query, query_embedding, candidates, 0.5)
+        
+        print(f"📚 تعداد نتایج یافت‌شده: {len(search_results)}")
+        
+        search_type = "hybrid" if self.hybrid_enabled else "semantic"
+        
+        # 3. اگر نتیجه معنایی کافی (امتیاز حداقل 0.5) نبود و جست‌وجوی وب فعال باشد؛
+        # نتایج صرفاً واژگانی حد امتیاز ندارند و در این تصمیم شمرده نمی‌شوند
+        dense_hits = sum(1 for result in search_results if result.get("vector_score", result["score"]) is not None)
+        if dense_hits < 2 and use_web_search:
+            print("🌐 جست‌وجو در وب...")
+            with span("web_fallback"):
+                web_results = await self.search_web(normalized_query)
+                fresh_results = await self._score_web_pages(query_embedding, web_results, 0.3) if web_results else []
+            
+            if web_results:
+                search_type = "web"
+                # تکه‌های صفحات جدید مستقیماً در حافظه امتیازدهی شده‌اند (بدون جست‌وجوی مجدد در Qdrant)
+                search_results = self._merge_web_results(search_results, fresh_results)[:candidates]
+                
+                # افزودن صفحات به Vector Store پس از پاسخ (Embedding تکه‌ها از کش خوانده می‌شود)
+                for page in web_results:
+                    self._spawn(self._persist_web_page(page))
+        
+        search_results, rerank_info = await self._rerank(normalized_query, search_results, top_k)
+        
+        # آماده‌سازی context و منابع (ادغام تکه‌های هم‌پوشان در بودجه توکن)
+        with span("context_build"):
+            built = self.context_builder.build(search_results)
+        print(f"🧩 context: {built['blocks']} بلوک، {built['tokens']} توکن")
+        
+        return {
+            "search_results": search_results,
+            "context": built["context"],
+            "sources": built["sources"],
+            "context_tokens": built["tokens"],
+            "query_embedding": query_embedding,
+            "rerank": rerank_info,
+            "search_type": search_type
+        }
     
-    def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-        """تقسیم متن به تکه‌های کوچکتر"""
-        words = word_tokenize(text)
-        chunks = []
+    async def _score_web_pages(
+        self,
+        query_embedding: np.ndarray,
+        pages: List[Dict[str, Any]],
+        score_threshold: float
+    ) -> List[Dict[str, Any]]:
+        """تقسیم صفحات وب مانند افزودن URL، Embedding همه تکه‌ها در یک batch و امتیاز کسینوسی"""
+        chunk_lists = await asyncio.gather(*[
+            asyncio.to_thread(prepare_document, page.get("content") or "", settings.chunk_size, settings.chunk_overlap)
+            for page in pages
+        ])
+        
+        texts, metadatas, ids = [], [], []
+        for page, chunks in zip(pages, chunk_lists):
+            for i, chunk in enumerate(chunks):
+                texts.append(chunk)
+                metadatas.append({'url': page['url'], 'title': page.get('title', ''), 'chunk_index': i})
+                ids.append(self._chunk_point_id(page['url'], self.hash_text(chunk)))
+        if not texts:
+            return []
         
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk:
-                chunks.append(chunk)
+        embeddings = await self.vector_store.embed_documents(texts)
+        query = query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12)
+        scores = (embeddings @ query) / np.maximum(np.linalg.norm(embeddings, axis=1), 1e-12)
         
-        return chunks
+        return [
+            {"id": point_id, "text": text, "score": float(score), "metadata": metadata}
+            for point_id, text, metadata, score in zip(ids, texts, metadatas, scores)
+            if score >= score_threshold
+        ]
     
-    def process_query(
+    def _merge_web_results(
+        self,
+        search_results: List[Dict[str, Any]],
+        web_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        ادغام تکه‌های صفحات وب با نتایج جست‌وجو بر اساس یک مقیاس امتیاز
+        
+        در جست‌وجوی ترکیبی score نتایج امتیاز RRF است؛ تکه‌های وب نیز به ترتیب شباهت
+        کسینوسی رتبه‌بندی و با همان فرمول امتیاز می‌گیرند (شباهت در vector_score می‌ماند).
+        بدون جست‌وجوی ترکیبی score هر دو فهرست شباهت کسینوسی است.
+        """
+        known_ids = {result["id"] for result in search_results}
+        fresh_results = sorted(
+            (result for result in web_results if result["id"] not in known_ids),
+            key=lambda result: result["score"],
+            reverse=True
+        )
+        
+        if self.hybrid_enabled:
+            fresh_results = [
+                {
+                    **result,
+                    "vector_score": result["score"],
+                    "lexical_score": None,
+                    "score": 1 / (settings.hybrid_rrf_k + rank + 1)
+                }
+                for rank, result in enumerate(fresh_results)
+            ]
+        
+        return sorted(search_results + fresh_results, key=lambda result: result["score"], reverse=True)
+    
+    async def _persist_web_page(self, page: Dict[str, Any]):
+        """افزودن صفحه وب دریافت‌شده به Vector Store در پس‌زمینه"""
+        try:
+            await self.ingest_document(page['url'], page.get('title', ''), page.get('content') or '')
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره صفحه وب {page['url']}: {e}")
+    
+    def _spawn(self, coroutine):
+        """اجرای کار پس‌زمینه با نگه‌داری ارجاع تا پایان آن"""
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _rerank(
+        self,
+        normalized_query: str,
+        results: List[Dict[str, Any]],
+        top_k: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """انتخاب تکه‌های ارسالی به مدل زبانی (با Cross-Encoder در صورت فعال بودن)"""
+        if self.reranker is None:
+            return results[:top_k], None
+        
+        # reranker اجازه می‌دهد تکه‌های کمتری (rerank_top_k) به پرامپت برسد
+        final_k = min(top_k, settings.rerank_top_k) if settings.rerank_top_k else top_k
+        with span("rerank"):
+            reranked, info = await self.reranker.rerank(normalized_query, results, final_k)
+        print(f"🎯 rerank: {info['candidates']} نامزد ← {len(reranked)} تکه در {info['elapsed_ms']}ms")
+        return reranked, info
+    
+    async def process_query(
         self,
         query: str,
         use_web_search: bool = False,
@@ -47,87 +496,135 @@ class RAGEngine:
         پردازش پرسش و تولید پاسخ
         
         Pipeline:
-        1. نرمال‌سازی پرسش
+        1. نرمال‌سازی پرسش و بررسی کش معنایی
         2. جست‌وجوی معنایی در Vector Store
         3. در صورت نیاز، جست‌وجو در وب
         4. تولید پاسخ با RAG
         """
         
         # 1. نرمال‌سازی پرسش
-        normalized_query = self.normalize_text(query)
+        with span("normalize"):
+            normalized_query = self.normalize_text(query)
         print(f"🔍 پردازش پرسش: {normalized_query}")
         
-        # 2. جست‌وجوی معنایی
-        search_results = self.vector_store.search(
-            query=normalized_query,
-            top_k=top_k,
-            score_threshold=0.5
-        )
-        
-        print(f"📚 تعداد نتایج یافت‌شده: {len(search_results)}")
+        cached, query_embedding = await self._lookup_cache(normalized_query, use_web_search, top_k)
+        if cached is not None:
+            print("⚡ پاسخ از کش")
+            self._record_history(normalized_query, cached["answer"], cached["sources"], "cache")
+            return {**cached, "query": normalized_query}
         
-        # 3. اگر نتیجه کافی نبود و جست‌وجوی وب فعال باشد
-        if len(search_results) < 2 and use_web_search:
-            print("🌐 جست‌وجو در وب...")
-            web_results = self.search_web(normalized_query)
-            
-            # افزودن نتایج وب به Vector Store
-            if web_results:
-                texts = [r['content'] for r in web_results]
-                metadatas = [{'url': r['url'], 'title': r['title']} for r in web_results]
-                self.vector_store.add_documents(texts, metadatas)
-                
-                # جست‌وجوی مجدد
-                search_results = self.vector_store.search(
-                    query=normalized_query,
-                    top_k=top_k,
-                    score_threshold=0.3
-                )
+        retrieval = await self.retrieve(normalized_query, use_web_search, top_k, query_embedding)
+        search_results = retrieval["search_results"]
         
         # 4. تولید پاسخ
         if not search_results:
+            self._record_history(normalized_query, NO_RESULTS_ANSWER, [], retrieval["search_type"])
             return {
-                "answer": "متأسفانه اطلاعاتی برای پاسخ به این سؤال یافت نشد. لطفاً سؤال دیگری بپرسید یا ابتدا URLهای مرتبط را اضافه کنید.",
+                "answer": NO_RESULTS_ANSWER,
                 "sources": [],
-                "query": query,
+                "query": normalized_query,
                 "search_results": []
             }
         
-        # آماده‌سازی context و منابع
-        context = "\n\n".join([
-            f"متن {i+1}:\n{result['text'][:1000]}"
-            for i, result in enumerate(search_results)
-        ])
-        
-        sources = []
-        for result in search_results:
-            metadata = result.get('metadata', {})
-            source = metadata.get('url', '') or metadata.get('title', 'منبع ناشناس')
-            if source and source not in sources:
-                sources.append(source)
-        
         # تولید پاسخ با OpenAI
-        rag_response = self.openai_client.generate_rag_response(
+        rag_response = await self.openai_client.generate_rag_response(
             query=normalized_query,
-            context=context,
-            sources=sources
+            context=retrieval["context"],
+            sources=retrieval["sources"]
         )
         
-        return {
+        response = {
             **rag_response,
             "search_results": search_results[:3]  # فقط 3 نتیجه برتر
         }
+        self._store_in_cache(
+            normalized_query, retrieval["query_embedding"], use_web_search, top_k, response
+        )
+        self._record_history(normalized_query, response["answer"], response["sources"], retrieval["search_type"])
+        return response
+    
+    async def stream_query(
+        self,
+        query: str,
+        use_web_search: bool = False,
+        top_k: int = 5
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        پردازش پرسش به صورت stream
+        
+        رویدادها به ترتیب:
+        - sources: منابع و نتایج جست‌وجو (بلافاصله پس از بازیابی)
+        - token: تکه‌های پاسخ به محض دریافت از مدل
+        - done: پاسخ کامل
+        """
+        with span("normalize"):
+            normalized_query = self.normalize_text(query)
+        print(f"🔍 پردازش پرسش: {normalized_query}")
+        
+        cached, query_embedding = await self._lookup_cache(normalized_query, use_web_search, top_k)
+        if cached is not None:
+            print("⚡ پاسخ از کش")
+            yield "sources", {
+                "query": normalized_query,
+                "sources": cached["sources"],
+                "search_results": cached["search_results"]
+            }
+            yield "token", {"text": cached["answer"]}
+            self._record_history(normalized_query, cached["answer"], cached["sources"], "cache")
+            yield "done", {"answer": cached["answer"]}
+            return
+        
+        retrieval = await self.retrieve(normalized_query, use_web_search, top_k, query_embedding)
+        search_results = retrieval["search_results"]
+        
+        if not search_results:
+            yield "sources", {"query": normalized_query, "sources": [], "search_results": []}
+            yield "token", {"text": NO_RESULTS_ANSWER}
+            self._record_history(normalized_query, NO_RESULTS_ANSWER, [], retrieval["search_type"])
+            yield "done", {"answer": NO_RESULTS_ANSWER}
+            return
+        
+        yield "sources", {
+            "query": normalized_query,
+            "sources": retrieval["sources"],
+            "search_results": search_results[:3]
+        }
+        
+        answer_parts = []
+        async for delta in self.openai_client.stream_rag_response(
+            query=normalized_query,
+            context=retrieval["context"],
+            sources=retrieval["sources"]
+        ):
+            answer_parts.append(delta)
+            yield "token", {"text": delta}
+        
+        answer = "".join(answer_parts)
+        
+        # ذخیره پیش از آخرین رویداد؛ اگر کلاینت پس از دریافت پاسخ قطع شود generator ادامه نمی‌یابد
+        self._store_in_cache(normalized_query, retrieval["query_embedding"], use_web_search, top_k, {
+            "answer": answer,
+            "sources": retrieval["sources"],
+            "query": normalized_query,
+            "search_results": search_results[:3]
+        })
+        self._record_history(normalized_query, answer, retrieval["sources"], retrieval["search_type"])
+        yield "done", {"answer": answer}
     
-    def search_web(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
-        """جست‌وجو در وب با Firecrawl"""
-        return self.firecrawl_client.search_web(query, max_results)
+    async def search_web(self, query: str, max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+        """جست‌وجو در وب با Firecrawl (scrape همزمان با مهلت کلی web_search_timeout)"""
+        return await self.firecrawl_client.search_web(
+            query,
+            max_results or settings.web_search_max_results,
+            timeout=settings.web_search_timeout
+        )
     
-    def ingest_url(self, url: str) -> Dict[str, Any]:
+    async def ingest_url(self, url: str) -> Dict[str, Any]:
         """افزودن URL به پایگاه داده"""
         print(f"📥 در حال دریافت محتوای: {url}")
         
         # استخراج محتوا با Firecrawl
-        scraped_data = self.firecrawl_client.scrape_url(url)
+        scraped_data = await self.firecrawl_client.scrape_url(url)
         
         if not scraped_data:
             return {
@@ -135,28 +632,214 @@ class RAGEngine:
                 "message": "خطا در دریافت محتوای URL"
             }
         
+        return await self.ingest_document(
+            url=url,
+            title=scraped_data.get('title', ''),
+            content=scraped_data.get('content', '')
+        )
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+    
+    @staticmethod
+    def _chunk_point_id(url: str, chunk_hash: str) -> str:
+        """شناسه پایدار نقطه بر اساس URL و hash تکه"""
+        return hashlib.md5(f"{url}\n{chunk_hash}".encode()).hexdigest()
+    
+    async def lock_url(self, url: str):
+        """
+        گرفتن قفل افزودن یک URL (افزودن همزمان یک URL سریالی می‌شود)
+        
+        باید با unlock_url آزاد شود؛ قفل بین taskهای مختلف قابل انتقال است.
+        """
+        # [قفل، تعداد منتظرها]
+        entry = self._url_locks.setdefault(url, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_url_entry(url, entry)
+            raise
+    
+    def unlock_url(self, url: str):
+        entry = self._url_locks[url]
+        entry[0].release()
+        self._release_url_entry(url, entry)
+    
+    def _release_url_entry(self, url: str, entry: List[Any]):
+        entry[1] -= 1
+        if not entry[1]:
+            self._url_locks.pop(url, None)
+    
+    async def ingest_document(
+        self,
+        url: str,
+        title: str,
+        content: str,
+        source: str = SOURCE_FIRECRAWL
+    ) -> Dict[str, Any]:
+        """
+        نرمال‌سازی، تقسیم و افزودن افزایشی محتوای دریافت‌شده یک صفحه
+        
+        source منبع محتوا است (SOURCE_FIRECRAWL یا SOURCE_SUPPLIED)؛ فقط اسناد Firecrawl
+        در /ingest-jobs/refresh دوباره دریافت می‌شوند.
+        
+        - اگر hash محتوا تغییری نکرده باشد، صفحه نادیده گرفته می‌شود
+        - فقط تکه‌های جدید/تغییرکرده Embedding می‌شوند
+        - تکه‌های نسخه قبلی که دیگر وجود ندارند از Vector Store حذف می‌شوند
+        """
+        await self.lock_url(url)
+        try:
+            return await self._ingest_document(url, title, content, source)
+        finally:
+            self.unlock_url(url)
+    
+    async def _ingest_document(self, url: str, title: str, content: str, source: str) -> Dict[str, Any]:
+        content_hash = self.hash_text(content)
+        previous, unchanged = await self.check_unchanged(url, title, content_hash)
+        if unchanged is not None:
+            return unchanged
+        
         # نرمال‌سازی و تقسیم محتوا
-        content = scraped_data.get('content', '')
-        normalized_content = self.normalize_text(content)
-        chunks = self.chunk_text(normalized_content)
+        chunks = await self.prepare_chunks_async(content)
         
         print(f"📝 تعداد تکه‌های ایجادشده: {len(chunks)}")
         
+        if not chunks:
+            return self.empty_result(url)
+        
+        plan = await self.plan_chunks(url, title, chunks, previous)
+        
         # افزودن به Vector Store
-        metadatas = [{
-            'url': url,
-            'title': scraped_data.get('title', ''),
-            'chunk_index': i
-        } for i in range(len(chunks))]
+        if plan["new_texts"]:
+            await self._add_documents(plan["new_texts"], plan["new_metadatas"], ids=plan["new_ids"])
+        
+        return await self.finish_ingest(url, title, content_hash, plan, source)
+    
+    async def check_unchanged(
+        self,
+        url: str,
+        title: str,
+        content_hash: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        خواندن اثر انگشت قبلی URL
+        
+        خروجی: (اثر انگشت قبلی، نتیجه نهایی در صورت بدون تغییر بودن محتوا)
+        """
+        previous = await asyncio.to_thread(self.document_store.get_fingerprint, url)
+        
+        # اگر Vector Store با دیتابیس همگام نباشد (مثلاً حالت memory پس از راه‌اندازی مجدد)
+        # سند از ابتدا افزوده می‌شود
+        if previous is not None and await self.vector_store.count_by_url(url) != len(set(previous["chunks"].values())):
+            previous = None
+        
+        if previous is not None and previous["content_hash"] == content_hash:
+            print(f"⏭️ محتوای {url} تغییری نکرده است")
+            return previous, {
+                "success": True,
+                "message": "✅ محتوای صفحه تغییری نکرده است",
+                "url": url,
+                "title": title,
+                "chunks_count": previous["chunk_count"],
+                "unchanged": True,
+                "added": 0,
+                "removed": 0
+            }
+        
+        return previous, None
+    
+    @staticmethod
+    def empty_result(url: str) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "message": "محتوایی برای افزودن یافت نشد",
+            "url": url
+        }
+    
+    async def plan_chunks(
+        self,
+        url: str,
+        title: str,
+        chunks: List[str],
+        previous: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        مقایسه تکه‌های جدید با نسخه قبلی
+        
+        خروجی شامل تکه‌هایی است که باید Embedding شوند، payloadهای قابل به‌روزرسانی
+        و نقاطی که دیگر وجود ندارند.
+        """
+        if previous is None:
+            # تکه‌های افزوده‌شده پیش از ردیابی hash (در صورت وجود) پاک می‌شوند
+            await self.vector_store.delete_by_url(url)
+            previous_chunks: Dict[str, str] = {}
+        else:
+            previous_chunks = previous["chunks"]
+        
+        records = []
+        new_texts, new_metadatas, new_ids = [], [], []
+        new_id_set = set()
+        moved_payloads: Dict[str, Dict[str, Any]] = {}
+        
+        for i, chunk in enumerate(chunks):
+            chunk_hash = self.hash_text(chunk)
+            point_id = previous_chunks.get(chunk_hash) or self._chunk_point_id(url, chunk_hash)
+            records.append({"index": i, "hash": chunk_hash, "point_id": point_id})
+            
+            metadata = {'url': url, 'title': title, 'chunk_index': i}
+            if chunk_hash in previous_chunks:
+                # بردار تکه بدون تغییر حفظ می‌شود؛ فقط موقعیت/عنوان به‌روز می‌شود
+                moved_payloads[point_id] = metadata
+            elif point_id not in new_id_set:
+                new_texts.append(chunk)
+                new_metadatas.append(metadata)
+                new_ids.append(point_id)
+                new_id_set.add(point_id)
+        
+        current_ids = {record["point_id"] for record in records}
+        
+        return {
+            "records": records,
+            "new_texts": new_texts,
+            "new_metadatas": new_metadatas,
+            "new_ids": new_ids,
+            "moved_payloads": moved_payloads,
+            "orphan_ids": [point_id for point_id in previous_chunks.values() if point_id not in current_ids]
+        }
+    
+    async def finish_ingest(
+        self,
+        url: str,
+        title: str,
+        content_hash: str,
+        plan: Dict[str, Any],
+        source: str = SOURCE_FIRECRAWL
+    ) -> Dict[str, Any]:
+        """اعمال تغییرات payload، حذف تکه‌های قدیمی و ذخیره اثر انگشت سند (پس از افزودن تکه‌های جدید)"""
+        orphan_ids = plan["orphan_ids"]
+        
+        await self.vector_store.update_payloads(plan["moved_payloads"])
+        await self.vector_store.delete_points(orphan_ids)
+        
+        await asyncio.to_thread(self.document_store.save, url, title, content_hash, plan["records"], source)
+        
+        if orphan_ids and self.cache is not None:
+            self.cache.invalidate([url])
         
-        self.vector_store.add_documents(chunks, metadatas)
+        chunks_count = len(plan["records"])
+        print(f"♻️ {url}: {len(plan['new_texts'])} تکه جدید، {len(plan['moved_payloads'])} بدون تغییر، {len(orphan_ids)} حذف‌شده")
         
         return {
             "success": True,
-            "message": f"✅ {len(chunks)} تکه از محتوا با موفقیت اضافه شد",
+            "message": f"✅ {chunks_count} تکه از محتوا با موفقیت اضافه شد",
             "url": url,
-            "title": scraped_data.get('title', ''),
-            "chunks_count": len(chunks)
+            "title": title,
+            "chunks_count": chunks_count,
+            "unchanged": False,
+            "added": len(plan["new_texts"]),
+            "removed": len(orphan_ids)
         }
 
 
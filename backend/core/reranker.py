@@ -0,0 +1,103 @@
+"""
+مرتب‌سازی مجدد نتایج بازیابی با Cross-Encoder چندزبانه
+"""
+from typing import List, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import time
+import numpy as np
+
+
+class CrossEncoderReranker:
+    """
+    امتیازدهی جفت (پرسش، تکه) با Cross-Encoder و انتخاب بهترین تکه‌ها
+    
+    نامزدها در batchهای batch_size تایی امتیازدهی می‌شوند. اگر پیش از پایان همه
+    batchها بودجه زمانی تمام شود، ترتیب اولیه بازیابی (برداری/ترکیبی) حفظ می‌شود.
+    """
+    
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 16,
+        time_budget_ms: float = 300.0,
+        max_length: int = 512
+    ):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.time_budget = time_budget_ms / 1000
+        self.max_length = max_length
+        self.model = None
+        
+        # یک thread: batchهای رهاشده پس از اتمام بودجه، CPU را از جست‌وجوهای بعدی نمی‌گیرند
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        
+        # تعداد rerankهای کامل و بازگشت‌ها به ترتیب اولیه
+        self.reranked = 0
+        self.fallbacks = 0
+    
+    async def initialize(self):
+        """بارگذاری مدل (در startup، خارج از event loop)"""
+        if self.model is None:
+            self.model = await asyncio.to_thread(self._load_model)
+            print(f"✅ مدل rerank بارگذاری شد: {self.model_name}")
+    
+    def _load_model(self):
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(self.model_name, max_length=self.max_length)
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        return np.asarray(
+            self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+            dtype=np.float32
+        ).reshape(-1)
+    
+    async def rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        مرتب‌سازی نتایج بر اساس امتیاز Cross-Encoder
+        
+        خروجی: top_k نتیجه و اطلاعات مرحله (زمان، تعداد نامزدها، استفاده از ترتیب اولیه).
+        امتیاز بازیابی در retrieval_score نگه داشته و score با امتیاز rerank جایگزین می‌شود.
+        """
+        info = {"candidates": len(results), "elapsed_ms": 0.0, "fallback": False}
+        if self.model is None or len(results) <= 1:
+            return results[:top_k], info
+        
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        deadline = started + self.time_budget
+        scores: List[np.ndarray] = []
+        
+        try:
+            for start in range(0, len(results), self.batch_size):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                pairs = [(query, result["text"]) for result in results[start:start + self.batch_size]]
+                future = loop.run_in_executor(self._executor, partial(self._predict, pairs))
+                scores.append(await asyncio.wait_for(future, timeout=remaining))
+        except asyncio.TimeoutError:
+            self.fallbacks += 1
+            info["fallback"] = True
+            info["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            print(f"⏱️ بودجه زمانی rerank تمام شد ({info['elapsed_ms']}ms)؛ ترتیب اولیه حفظ شد")
+            return results[:top_k], info
+        
+        self.reranked += 1
+        flat = np.concatenate(scores)
+        order = np.argsort(-flat, kind="stable")[:top_k]
+        reranked = [
+            {**results[index], "retrieval_score": results[index]["score"], "score": float(flat[index])}
+            for index in order
+        ]
+        info["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return reranked, info
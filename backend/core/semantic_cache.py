@@ -0,0 +1,201 @@
+"""
+کش معنایی پاسخ‌ها برای پرسش‌های تکراری و تقریباً یکسان
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+import copy
+import time
+import numpy as np
+
+
+class SemanticCache:
+    """
+    کش پاسخ‌های RAG با دو سطح جست‌وجو:
+    
+    1. تطابق دقیق روی پرسش نرمال‌شده
+    2. تطابق معنایی (شباهت کسینوسی embedding پرسش بالاتر از آستانه)
+    
+    حذف ورودی‌ها بر اساس LRU و TTL انجام می‌شود. همه متدها در event loop
+    فراخوانی می‌شوند و نیازی به قفل ندارند.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        # ماتریس embeddingها برای جست‌وجوی معنایی (با هر تغییر دوباره ساخته می‌شود)
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._dirty = True
+        
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _make_key(normalized_query: str, top_k: int, use_web_search: bool) -> str:
+        """ساخت کلید کش از پرسش نرمال‌شده و پارامترهای جست‌وجو"""
+        return f"{top_k}:{int(use_web_search)}:{normalized_query}"
+    
+    @staticmethod
+    def _normalize_vector(vector: np.ndarray) -> np.ndarray:
+        """نرمال‌سازی بردار برای محاسبه شباهت کسینوسی با ضرب داخلی"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now >= entry["expires_at"]
+    
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._dirty = True
+    
+    def _purge_expired(self):
+        """حذف ورودی‌های منقضی‌شده"""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry, now)]
+        for key in expired:
+            self._remove(key)
+    
+    def _rebuild_matrix(self):
+        """بازسازی ماتریس embeddingها در صورت تغییر ورودی‌ها"""
+        if not self._dirty:
+            return
+        self._matrix_keys = list(self._entries.keys())
+        if self._matrix_keys:
+            self._matrix = np.vstack([self._entries[key]["embedding"] for key in self._matrix_keys])
+        else:
+            self._matrix = None
+        self._dirty = False
+    
+    def _hit(self, key: str) -> Dict[str, Any]:
+        self._entries.move_to_end(key)
+        return copy.deepcopy(self._entries[key]["response"])
+    
+    def get_exact(
+        self,
+        normalized_query: str,
+        top_k: int,
+        use_web_search: bool
+    ) -> Optional[Dict[str, Any]]:
+        """جست‌وجوی دقیق روی پرسش نرمال‌شده (بدون نیاز به embedding)"""
+        key = self._make_key(normalized_query, top_k, use_web_search)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry, time.monotonic()):
+            self._remove(key)
+            return None
+        self.exact_hits += 1
+        return self._hit(key)
+    
+    def get_similar(
+        self,
+        embedding: np.ndarray,
+        top_k: int,
+        use_web_search: bool
+    ) -> Optional[Dict[str, Any]]:
+        """جست‌وجوی معنایی؛ در صورت عدم یافتن، یک miss ثبت می‌شود"""
+        self._purge_expired()
+        self._rebuild_matrix()
+        
+        if self._matrix is not None:
+            scores = self._matrix @ self._normalize_vector(embedding)
+            for index in np.argsort(-scores):
+                if scores[index] < self.similarity_threshold:
+                    break
+                key = self._matrix_keys[index]
+                entry = self._entries[key]
+                if entry["top_k"] == top_k and entry["use_web_search"] == use_web_search:
+                    self.semantic_hits += 1
+                    return self._hit(key)
+        
+        self.misses += 1
+        return None
+    
+    def set(
+        self,
+        normalized_query: str,
+        embedding: np.ndarray,
+        top_k: int,
+        use_web_search: bool,
+        response: Dict[str, Any]
+    ):
+        """ذخیره پاسخ در کش"""
+        key = self._make_key(normalized_query, top_k, use_web_search)
+        self._entries[key] = {
+            "response": copy.deepcopy(response),
+            "embedding": self._normalize_vector(embedding),
+            "sources": set(response.get("sources", [])),
+            "top_k": top_k,
+            "use_web_search": use_web_search,
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        self._entries.move_to_end(key)
+        self._dirty = True
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(
+        self,
+        urls: List[str],
+        embeddings: Optional[np.ndarray] = None,
+        score_threshold: float = 0.5
+    ) -> int:
+        """
+        حذف پاسخ‌هایی که با افزودن اسناد جدید ممکن است تغییر کنند
+        
+        - پاسخ‌هایی که یکی از URLها جزو منابعشان است
+        - پاسخ‌هایی که حداقل یکی از تکه‌های جدید در نتایج جست‌وجویشان قرار می‌گرفت
+          (شباهت پرسش با تکه بالاتر از score_threshold جست‌وجو)
+        """
+        urls = set(urls)
+        stale = {key for key, entry in self._entries.items() if entry["sources"] & urls}
+        
+        if embeddings is not None and len(embeddings) and self._entries:
+            self._rebuild_matrix()
+            chunks = np.asarray(embeddings, dtype=np.float32)
+            chunks = chunks / np.maximum(np.linalg.norm(chunks, axis=1, keepdims=True), 1e-12)
+            max_scores = (self._matrix @ chunks.T).max(axis=1)
+            stale.update(
+                key for key, score in zip(self._matrix_keys, max_scores)
+                if score >= score_threshold
+            )
+        
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+        return len(stale)
+    
+    def clear(self):
+        """پاک کردن کامل کش"""
+        self._entries.clear()
+        self._dirty = True
+    
+    def stats(self) -> Dict[str, Any]:
+        """آمار کش"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
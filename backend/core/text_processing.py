@@ -0,0 +1,249 @@
+"""
+نرمال‌سازی و تقسیم متن فارسی
+
+توابع این ماژول به مدل Embedding یا اتصال‌ها وابسته نیستند تا در processهای
+جداگانه (ProcessPoolExecutor) نیز با هزینه کم قابل اجرا باشند.
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+from functools import lru_cache
+import re
+from api.config import settings
+from core.chunker import iter_chunks
+
+
+# جداکننده پاراگراف‌ها (یک یا چند خط خالی)
+PARAGRAPH_PATTERN = re.compile(r'\n\s*\n')
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+# پیش‌نیاز الگوهای پرهزینه Normalizer: اگر در متن نباشد، الگو تغییری ایجاد نمی‌کند
+PATTERN_TRIGGERS = {
+    r"([\d+])\.([\d+])": r"\.",
+    r" ?\.\.\.": r"\.\.\.",
+    r" {2,}": "  ",
+    r"\n{3,}": "\n\n\n",
+    r"\u200c{2,}": "\u200c\u200c",
+    r"\u200c{1,} ": "\u200c ",
+    r" \u200c{1,}": " \u200c",
+    r"([^ ]ه) ی ": "ه ی ",
+    r"(^| )(ن?می) ": "می ",
+    # hazm در بخشی از این دو الگو نویسه خط جدید واقعی (نه \n) به کار برده است
+    r"(?<=[^\n\d \.:!،؛؟»\]\)\}«\[\(\{]{2}) (تر(ین?)?|گری?|های?)(?=[ " "\n" r"\.:!،؛؟»\]\)\}«\[\(\{]|$)": " (تر|گر|ها)",
+    r"([^ ]ه) (ا(م|یم|ش|ند|ی|ید|ت))(?=[ \n\.:!،؛؟»\]\)\}]|$)": "ه ا",
+    r"(ه)(ها)": "هها",
+    '" ([^\n"]+) "': '" ',
+    r"([^ «\[\(\{])([«\[\(\{])": r"[«\[\(\{]",
+    r"([آابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی])(\d)": r"\d",
+}
+
+# الگوهای معادل ارزان‌تر: جایگزین این دو الگو رشته خالی است، پس تطابق‌های خالی بی‌اثرند
+EQUIVALENT_PATTERNS = {
+    r"\b\u200c*\B": r"\b\u200c+\B",
+    r"\B\u200c*\b": r"\B\u200c+\b",
+}
+
+
+class PersianNormalizer:
+    """
+    Normalizer پیش‌فرض hazm با مسیر سریع و خروجی یکسان
+    
+    Normalizer.normalize در هر فراخوانی جدول translate حدود ۶۰۰ نویسه‌ای را از نو
+    می‌سازد و الگوهای regex را به صورت رشته به re.sub می‌دهد. در این کلاس:
+    
+    - نگاشت نویسه‌های عربی (ي، ك، ...)، ارقام و ٪ یک‌بار در یک جدول ترکیب می‌شوند
+      (نگاشت ارقام با مرحله persian_style جابه‌جاپذیر است)
+    - همه الگوها یک‌بار کامپایل می‌شوند
+    - مراحل و الگوهایی که نویسه لازمشان در متن نیست (PATTERN_TRIGGERS، گیومه، نویسه‌های
+      خاص و ترکیبی، تکرار بیش از دو حرف، پیشوند «می») اجرا نمی‌شوند
+    
+    اصلاح فاصله‌گذاری (توکنایزر و واژه‌نامه hazm) همیشه اجرا می‌شود. با fast=False
+    همان Normalizer.normalize فراخوانی می‌شود.
+    """
+    
+    def __init__(self, fast: bool = True):
+        from hazm import Normalizer
+        
+        self.hazm = Normalizer()
+        self.fast = fast
+        hazm = self.hazm
+        
+        numbers = {ord(a): b for a, b in zip(hazm.number_translation_src, hazm.number_translation_dst)}
+        characters = {ord(a): b for a, b in zip(hazm.translation_src, hazm.translation_dst)}
+        self._translation = {**numbers, **{key: numbers.get(ord(value), value) for key, value in characters.items()}}
+        self._translation_trigger = self._char_class(
+            chr(key) for key, value in self._translation.items() if chr(key) != value
+        )
+        
+        self._persian_style = self._compile(hazm.persian_style_patterns)
+        self._diacritics = self._compile(hazm.diacritics_patterns)
+        self._extra_space = self._compile(hazm.extra_space_patterns)
+        self._affix_spacing = self._compile(hazm.affix_spacing_patterns)
+        self._punctuation_spacing = self._compile(hazm.punctuation_spacing_patterns)
+        self._replacements = self._compile(hazm.replacements)
+        self._specials = self._compile(hazm.specials_chars_patterns)
+        
+        # نویسه‌های خاص (یک کلاس نویسه) و نویسه‌های ترکیبی مانند ﷲ و ﻻ
+        special_chars = set(hazm.specials_chars_patterns[0][0][1:-1])
+        for pattern, _ in hazm.replacements:
+            special_chars.update(pattern)
+        self._special_trigger = self._char_class(special_chars - set("()|"))
+        self._repeat_trigger = re.compile(hazm.more_than_two_repeat_pattern)
+    
+    @staticmethod
+    def _char_class(chars: Iterable[str]) -> "re.Pattern[str]":
+        return re.compile("[" + "".join(re.escape(char) for char in sorted(set(chars))) + "]")
+    
+    @staticmethod
+    def _compile(patterns):
+        """(الگوی کامپایل‌شده، جایگزین، پیش‌نیاز یا None)"""
+        compiled = []
+        for pattern, replacement in patterns:
+            trigger = PATTERN_TRIGGERS.get(pattern)
+            compiled.append((
+                re.compile(EQUIVALENT_PATTERNS.get(pattern, pattern)),
+                replacement,
+                re.compile(trigger) if trigger else None
+            ))
+        return compiled
+    
+    @staticmethod
+    def _replace(patterns, text: str) -> str:
+        for pattern, replacement, trigger in patterns:
+            if trigger is None or trigger.search(text):
+                text = pattern.sub(replacement, text)
+        return text
+    
+    def _correct_spacing(self, text: str) -> str:
+        """همان Normalizer.correct_spacing با الگوهای کامپایل‌شده"""
+        text = self._replace(self._extra_space, text)
+        lines = []
+        for line in text.split("\n"):
+            lines.append(" ".join(self.hazm.token_spacing(self.hazm.tokenizer.tokenize(line))))
+        text = self._replace(self._affix_spacing, "\n".join(lines))
+        return self._replace(self._punctuation_spacing, text)
+    
+    def normalize(self, text: str) -> str:
+        if not self.fast:
+            return self.hazm.normalize(text)
+        
+        if self._translation_trigger.search(text):
+            text = text.translate(self._translation)
+        if '"' in text or '.' in text:
+            text = self._replace(self._persian_style, text)
+        text = self._replace(self._diacritics, text)
+        text = self._correct_spacing(text)
+        if self._special_trigger.search(text):
+            text = self._replace(self._specials, self._replace(self._replacements, text))
+        if self._repeat_trigger.search(text):
+            text = self.hazm.decrease_repeated_chars(text)
+        if "می" in text:
+            text = self.hazm.seperate_mi(text)
+        return text
+
+
+# ابزارهای hazm هر process (import و ساخت تنبل؛ import خود hazm زمان‌بر است)
+_normalizer: Optional[PersianNormalizer] = None
+_word_tokenize: Optional[Callable[[str], List[str]]] = None
+_stopwords: Optional[Set[str]] = None
+
+
+def get_normalizer() -> PersianNormalizer:
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = PersianNormalizer(fast=settings.normalize_fast_path)
+    return _normalizer
+
+
+def get_stopwords() -> Set[str]:
+    """کلمات ایست فارسی hazm"""
+    global _stopwords
+    if _stopwords is None:
+        from hazm import stopwords_list
+        _stopwords = set(stopwords_list())
+    return _stopwords
+
+
+def word_tokenize(text: str) -> List[str]:
+    """توکنایز کلمات با hazm"""
+    global _word_tokenize
+    if _word_tokenize is None:
+        from hazm import word_tokenize as hazm_word_tokenize
+        _word_tokenize = hazm_word_tokenize
+    return _word_tokenize(text)
+
+
+def _normalize(text: str) -> str:
+    # حذف کاراکترهای اضافی
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    text = get_normalizer().normalize(text)
+    return text.strip()
+
+
+# حافظه LRU برای پرسش‌های کوتاه (پرسش‌های تکراری کاربران)
+_normalize_cached = lru_cache(maxsize=settings.normalize_cache_size)(_normalize)
+
+
+def normalize_text(text: str) -> str:
+    """نرمال‌سازی متن فارسی"""
+    if len(text) <= settings.normalize_cache_max_chars:
+        return _normalize_cached(text)
+    return _normalize(text)
+
+
+def normalize_cache_stats() -> Dict[str, int]:
+    info = _normalize_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "max_entries": info.maxsize or 0}
+
+
+def iter_paragraphs(text: str) -> Iterator[str]:
+    """پاراگراف‌های متن به صورت جریانی (بدون ساخت لیست همه پاراگراف‌ها)"""
+    start = 0
+    for match in PARAGRAPH_PATTERN.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
+def iter_normalized_paragraphs(paragraphs: Iterable[str]) -> Iterator[str]:
+    """
+    نرمال‌سازی جریانی پاراگراف‌ها (پاراگراف‌های خالی حذف می‌شوند)
+    
+    پاراگراف‌های تکراری یک سند (منو، پانویس و ...) فقط یک‌بار نرمال می‌شوند.
+    """
+    seen: Dict[str, str] = {}
+    for paragraph in paragraphs:
+        normalized = seen.get(paragraph)
+        if normalized is None:
+            normalized = seen[paragraph] = _normalize(paragraph)
+        if normalized:
+            yield normalized
+
+
+def normalize_paragraphs(paragraphs: List[str]) -> List[str]:
+    """نرمال‌سازی یک batch پاراگراف (قابل اجرا در ProcessPoolExecutor)"""
+    return list(iter_normalized_paragraphs(paragraphs))
+
+
+def paragraph_batches(text: str, batch_chars: int) -> Iterator[List[str]]:
+    """گروه‌بندی پاراگراف‌ها در batchهای حدوداً batch_chars نویسه‌ای (برای توزیع بین processها)"""
+    batch: List[str] = []
+    size = 0
+    for paragraph in iter_paragraphs(text):
+        batch.append(paragraph)
+        size += len(paragraph)
+        if size >= batch_chars:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def normalize_document(text: str) -> str:
+    """نرمال‌سازی یک سند با حفظ مرز پاراگراف‌ها (برای تقسیم‌بندی)"""
+    return "\n\n".join(iter_normalized_paragraphs(iter_paragraphs(text)))
+
+
+def prepare_document(content: str, chunk_size: int, overlap: int) -> List[str]:
+    """نرمال‌سازی و تقسیم یک سند (CPU-bound؛ در thread یا process جداگانه اجرا شود)"""
+    return list(iter_chunks(normalize_document(content), chunk_size, overlap))
@@ -0,0 +1,121 @@
+"""
+امتیازدهی BM25 با بردارهای sparse در Qdrant برای بازیابی واژگانی در کنار جست‌وجوی معنایی
+
+ایندکس واژگانی در خود کالکشن Qdrant نگه داشته می‌شود (بردار sparse نام‌دار در کنار
+بردار معنایی هر تکه)؛ بنابراین با راه‌اندازی مجدد از نو ساخته نمی‌شود، بین workerها
+مشترک است و تکه‌هایی که ingest.py در Qdrant می‌نویسد بلافاصله قابل جست‌وجو هستند.
+
+- سمت سند: وزن هر واژه بخش TF اشباع‌شده BM25 است که هنگام ذخیره محاسبه می‌شود
+  (نرمال‌سازی طول نسبت به میانگین ثابت hybrid_avg_chunk_terms، چون طول تکه‌ها محدود است)
+- سمت پرسش: وزن هر واژه IDF آن است؛ ضرب داخلی دو بردار همان امتیاز BM25 است
+- تعداد اسناد شامل هر واژه (df) با شمارش روی فیلد payload واژه‌ها خوانده و کش می‌شود
+"""
+from typing import Dict, List, Tuple, Any, Optional
+from collections import Counter, OrderedDict
+import hashlib
+import math
+import time
+import uuid
+
+# نام بردار sparse و فیلدهای payload ایندکس واژگانی در کالکشن
+LEXICAL_VECTOR = "lexical"
+LEXICAL_TERMS_FIELD = "lexical_terms"
+LEXICAL_LENGTH_FIELD = "lexical_length"
+
+
+def normalize_point_id(point_id: Any) -> str:
+    """شکل یکسان شناسه نقطه (Qdrant شناسه‌های hex را به صورت UUID خط‌دار برمی‌گرداند)"""
+    try:
+        return str(uuid.UUID(str(point_id)))
+    except ValueError:
+        return str(point_id)
+
+
+def term_index(term: str) -> int:
+    """اندیس پایدار واژه در بردار sparse (hash بدون نیاز به واژه‌نامه مشترک بین processها)"""
+    return int.from_bytes(hashlib.blake2b(term.encode(), digest_size=4).digest(), "little")
+
+
+def bm25_idf(df: int, doc_count: int) -> float:
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+class BM25Weights:
+    """
+    وزن‌دهی BM25 برای بردارهای sparse
+    
+    ورودی‌ها از پیش توکنایز شده‌اند (توکنایز در RAGEngine و خارج از event loop
+    انجام می‌شود).
+    """
+    
+    def __init__(self, avg_length: float, k1: float = 1.5, b: float = 0.75):
+        self.avg_length = max(1.0, avg_length)
+        self.k1 = k1
+        self.b = b
+    
+    def document(self, tokens: List[str]) -> Tuple[List[int], List[float], List[str]]:
+        """(اندیس‌ها، وزن‌ها، واژه‌های یکتا) برای ذخیره یک تکه"""
+        counts = Counter(tokens)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_length)
+        weights: Dict[int, float] = {}
+        for term, tf in counts.items():
+            index = term_index(term)
+            # برخورد hash بسیار نادر است؛ وزن دو واژه هم‌اندیس جمع می‌شود
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return list(weights), list(weights.values()), list(counts)
+    
+    @staticmethod
+    def query(idf: Dict[str, float]) -> Tuple[List[int], List[float]]:
+        """(اندیس‌ها، وزن‌ها) بردار پرسش از IDF واژه‌ها"""
+        weights: Dict[int, float] = {}
+        for term, value in idf.items():
+            if value > 0:
+                index = term_index(term)
+                weights[index] = weights.get(index, 0.0) + value
+        return list(weights), list(weights.values())
+
+
+class TermStatsCache:
+    """
+    کش محدود با TTL برای df واژه‌ها و تعداد کل تکه‌ها
+    
+    آمار پس از ttl ثانیه دوباره از Qdrant خوانده می‌شود تا تکه‌های جدید (از هر process)
+    در IDF لحاظ شوند؛ تغییر جزئی IDF در این فاصله اثر محسوسی بر رتبه‌بندی ندارد.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_terms: int = 50000):
+        self.ttl = ttl_seconds
+        self.max_terms = max_terms
+        self._df: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._doc_count: Optional[Tuple[float, int]] = None
+    
+    def get_df(self, term: str) -> Optional[int]:
+        entry = self._df.get(term)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        self._df.move_to_end(term)
+        return entry[1]
+    
+    def set_df(self, term: str, df: int):
+        self._df[term] = (time.monotonic(), df)
+        self._df.move_to_end(term)
+        while len(self._df) > self.max_terms:
+            self._df.popitem(last=False)
+    
+    def get_doc_count(self) -> Optional[int]:
+        if self._doc_count is None or time.monotonic() - self._doc_count[0] > self.ttl:
+            return None
+        return self._doc_count[1]
+    
+    def set_doc_count(self, count: int):
+        self._doc_count = (time.monotonic(), count)
+    
+    def clear(self):
+        self._df.clear()
+        self._doc_count = None
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "terms": len(self._df),
+            "doc_count": self._doc_count[1] if self._doc_count else None
+        }
@@ -0,0 +1,102 @@
+"""
+ذخیره اثر انگشت اسناد و تکه‌ها برای افزودن افزایشی
+"""
+from typing import Dict, List, Optional, Any
+from datetime import datetime
+from urllib.parse import urlsplit
+from db.models import Document, DocumentChunk, get_session
+
+
+# منبع محتوای سند (در metadata سند ذخیره می‌شود)
+SOURCE_FIRECRAWL = "firecrawl"  # دریافت‌شده با Firecrawl؛ قابل به‌روزرسانی با scrape مجدد
+SOURCE_SUPPLIED = "supplied"  # محتوای ارسال‌شده (ingest.py، /ingest-jobs/documents)
+
+
+class DocumentStore:
+    """
+    نگه‌داری hash محتوای هر URL و hash هر تکه در جداول documents و document_chunks
+    
+    متدها همگام هستند و باید خارج از event loop (با asyncio.to_thread) فراخوانی شوند.
+    """
+    
+    def get_fingerprint(self, url: str) -> Optional[Dict[str, Any]]:
+        """دریافت hash محتوا و نگاشت hash تکه‌ها به شناسه نقطه برای یک URL"""
+        with get_session() as session:
+            document = session.query(Document).filter(Document.url == url).one_or_none()
+            if document is None:
+                return None
+            
+            chunks = session.query(DocumentChunk.chunk_hash, DocumentChunk.point_id).filter(
+                DocumentChunk.document_id == document.id
+            ).all()
+            
+            return {
+                "content_hash": document.content_hash,
+                "chunk_count": len(chunks),
+                "chunks": {chunk_hash: point_id for chunk_hash, point_id in chunks}
+            }
+    
+    def save(
+        self,
+        url: str,
+        title: str,
+        content_hash: str,
+        chunks: List[Dict[str, Any]],
+        source: str = SOURCE_FIRECRAWL
+    ):
+        """
+        ذخیره یا به‌روزرسانی سند و جایگزینی تکه‌های آن
+        
+        فقط hash محتوا و hash/شناسه نقطه هر تکه ذخیره می‌شود؛ متن تکه‌ها در payload
+        Qdrant است و نگه‌داری دوباره آن در SQL لازم نیست.
+        """
+        with get_session() as session:
+            document = session.query(Document).filter(Document.url == url).one_or_none()
+            if document is None:
+                document = Document(url=url)
+                session.add(document)
+            
+            document.title = title
+            document.content = None  # محتوای ذخیره‌شده در نسخه‌های قبلی پاک می‌شود
+            document.content_hash = content_hash
+            document.meta = {**(document.meta or {}), "source": source}
+            document.updated_at = datetime.utcnow()
+            session.flush()
+            
+            session.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete()
+            session.add_all([
+                DocumentChunk(
+                    document_id=document.id,
+                    chunk_index=chunk["index"],
+                    chunk_hash=chunk["hash"],
+                    point_id=chunk["point_id"]
+                )
+                for chunk in chunks
+            ])
+            session.commit()
+    
+    def list_urls(self) -> List[str]:
+        """لیست همه URLهای افزوده‌شده"""
+        with get_session() as session:
+            return [url for (url,) in session.query(Document.url).order_by(Document.id).all()]
+    
+    def list_refreshable_urls(self) -> List[str]:
+        """
+        URLهای قابل به‌روزرسانی با scrape مجدد
+        
+        اسناد با محتوای ارسال‌شده (file://، شناسه‌های دلخواه یا URL با محتوای داده‌شده)
+        کنار گذاشته می‌شوند. اسناد قدیمی‌تر بدون منبع ثبت‌شده فقط در صورت http(s) بودن.
+        """
+        with get_session() as session:
+            rows = session.query(Document.url, Document.meta).order_by(Document.id).all()
+        
+        urls = []
+        for url, meta in rows:
+            source = (meta or {}).get("source")
+            if source == SOURCE_FIRECRAWL or (source is None and urlsplit(url).scheme in ("http", "https")):
+                urls.append(url)
+        return urls
+
+
+# نمونه سراسری
+document_store = DocumentStore()
@@ -0,0 +1,258 @@
+"""
+backendهای تولید Embedding
+
+انتخاب backend با پیشوند settings.embedding_model:
+
+- بدون پیشوند یا ``st:``: مدل sentence-transformers (PyTorch)
+- ``onnx:``: همان مدل با ONNX Runtime روی CPU (با EMBEDDING_ONNX_QUANTIZE=true به صورت int8)
+- ``openai:``: سرویس Embedding سازگار با OpenAI (مثلاً ``openai:text-embedding-3-small``)
+"""
+from typing import List, Optional
+from concurrent.futures import Executor
+from functools import partial
+from pathlib import Path
+import abc
+import asyncio
+import json
+import numpy as np
+from api.config import settings
+
+
+# فایل‌های ONNX قابل بارگذاری به ترتیب اولویت (سایر نسخه‌های پوشه onnx دانلود نمی‌شوند)
+ONNX_FILES = ("model.onnx", "onnx/model.onnx")
+
+# پیکربندی و tokenizer مدل؛ وزن‌ها فقط در صورت نیاز به export دریافت می‌شوند
+MODEL_CONFIG_PATTERNS = ["*.json", "*.txt", "*.model", "1_Pooling/*"]
+
+
+class EmbeddingBackend(abc.ABC):
+    """رابط مشترک backendهای Embedding"""
+    
+    name = "base"
+    
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.dimension: Optional[int] = None
+    
+    async def initialize(self):
+        """آماده‌سازی backend (برای backendهایی که ابعاد را از سرویس می‌خوانند)"""
+    
+    @abc.abstractmethod
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """تولید Embedding به صورت همگام (CPU-bound)"""
+    
+    async def aencode(self, texts: List[str], executor: Executor, show_progress_bar: bool = False) -> np.ndarray:
+        """تولید Embedding بدون مسدود کردن event loop (پیش‌فرض: encode در executor)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(self.encode, texts, show_progress_bar=show_progress_bar))
+    
+    async def close(self):
+        """آزادسازی منابع"""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """مدل sentence-transformers با PyTorch"""
+    
+    name = "sentence-transformers"
+    
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        return self.model.encode(texts, show_progress_bar=show_progress_bar)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    اجرای مدل با ONNX Runtime روی CPU (نیازمند بسته onnxruntime)
+    
+    فایل model.onnx در پوشه مدل (یا زیرپوشه onnx) خوانده می‌شود؛ از Hugging Face Hub
+    فقط همین فایل و پیکربندی مدل دانلود می‌شود. در صورت نبود و نصب بودن optimum،
+    مدل یک‌بار export می‌شود (وزن‌ها فقط در این حالت دریافت می‌شوند). با quantize=True
+    نسخه int8 (dynamic quantization) ساخته و کنار مدل ذخیره می‌شود. Pooling میانگین با attention mask
+    مانند پیکربندی sentence-transformers انجام می‌شود.
+    """
+    
+    name = "onnx"
+    
+    def __init__(self, model_name: str, quantize: bool = False, threads: int = 0):
+        super().__init__(model_name)
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("برای backend ONNX بسته onnxruntime را نصب کنید") from e
+        from transformers import AutoTokenizer
+        
+        model_dir = self._resolve_model_dir(model_name)
+        onnx_path = self._find_onnx(model_dir) or self._export(model_name, model_dir)
+        if quantize:
+            onnx_path = self._quantize(onnx_path)
+        
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(onnx_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_length = self._max_seq_length(model_dir)
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        if not isinstance(self.dimension, int):
+            self.dimension = int(self.encode(["dimension"]).shape[1])
+        print(f"✅ مدل ONNX بارگذاری شد: {onnx_path.name} (int8: {quantize})")
+    
+    @staticmethod
+    def _resolve_model_dir(model_name: str) -> Path:
+        path = Path(model_name)
+        if path.is_dir():
+            return path
+        from huggingface_hub import HfApi, snapshot_download
+        
+        names = list(ONNX_FILES)
+        try:
+            files = set(HfApi().list_repo_files(model_name))
+            names = [name for name in ONNX_FILES if name in files][:1]
+        except Exception as e:
+            # بدون دسترسی به Hub (مثلاً HF_HUB_OFFLINE) فایل‌ها از کش محلی خوانده می‌شوند
+            print(f"⚠️ فهرست فایل‌های {model_name} دریافت نشد: {e}")
+        
+        # model.onnx_data: وزن‌های خارجی مدل‌های بزرگ‌تر از ۲ گیگابایت
+        onnx_patterns = [pattern for name in names for pattern in (name, f"{name}_data")]
+        return Path(snapshot_download(model_name, allow_patterns=MODEL_CONFIG_PATTERNS + onnx_patterns))
+    
+    @staticmethod
+    def _find_onnx(model_dir: Path) -> Optional[Path]:
+        for name in ONNX_FILES:
+            candidate = model_dir / name
+            if candidate.exists():
+                return candidate
+        return None
+    
+    @staticmethod
+    def _export(model_name: str, model_dir: Path) -> Path:
+        """
+        export یک‌باره مدل به ONNX با optimum
+        
+        برای مدل Hub، optimum وزن‌ها (safetensors/bin) را خودش دانلود می‌کند.
+        """
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+        except ImportError as e:
+            raise RuntimeError(
+                f"فایل model.onnx در {model_dir} یافت نشد؛ مدل را export کنید یا بسته optimum را نصب کنید"
+            ) from e
+        
+        print(f"📦 export مدل {model_name} به ONNX...")
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        model.save_pretrained(str(model_dir))
+        return model_dir / "model.onnx"
+    
+    @staticmethod
+    def _quantize(onnx_path: Path) -> Path:
+        """ساخت (یک‌باره) نسخه int8 مدل"""
+        quantized_path = onnx_path.with_name(onnx_path.stem + "_int8.onnx")
+        if not quantized_path.exists():
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print(f"📦 ساخت نسخه int8 مدل: {quantized_path.name}")
+            quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+        return quantized_path
+    
+    @staticmethod
+    def _max_seq_length(model_dir: Path) -> int:
+        """طول حداکثر توالی از sentence_bert_config.json (مانند sentence-transformers)"""
+        config_path = model_dir / "sentence_bert_config.json"
+        if config_path.exists():
+            return int(json.loads(config_path.read_text()).get("max_seq_length", 512))
+        return 512
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        inputs = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        
+        # mean pooling روی توکن‌های واقعی
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return (summed / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    سرویس Embedding سازگار با OpenAI
+    
+    متن‌ها در batchهای embedding_remote_batch_size تایی و حداکثر
+    embedding_remote_concurrency درخواست همزمان ارسال می‌شوند.
+    """
+    
+    name = "openai"
+    
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from openai import AsyncOpenAI
+        
+        self.client = AsyncOpenAI(
+            api_key=settings.embedding_api_key or settings.openai_api_key,
+            base_url=settings.embedding_base_url or settings.openai_base_url,
+            timeout=settings.embedding_remote_timeout
+        )
+        self.batch_size = max(1, settings.embedding_remote_batch_size)
+        self._slots = asyncio.Semaphore(max(1, settings.embedding_remote_concurrency))
+        self.dimension = settings.embedding_dimension or None
+    
+    async def initialize(self):
+        if self.dimension is None:
+            self.dimension = int((await self._embed_batch(["dimension"])).shape[1])
+    
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        async with self._slots:
+            response = await self.client.embeddings.create(model=self.model_name, input=texts)
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.asarray([item.embedding for item in data], dtype=np.float32)
+    
+    async def aencode(self, texts: List[str], executor: Executor, show_progress_bar: bool = False) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        batches = await asyncio.gather(*[
+            self._embed_batch(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+        return np.vstack(batches)
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        raise RuntimeError("backend openai فقط به صورت async (aencode) قابل استفاده است")
+    
+    async def close(self):
+        await self.client.close()
+
+
+def create_embedding_backend(spec: str) -> EmbeddingBackend:
+    """ساخت backend بر اساس مقدار embedding_model (پیشوند st:، onnx: یا openai:)"""
+    prefix, separator, model_name = spec.partition(":")
+    if not separator or prefix not in ("st", "onnx", "openai"):
+        return SentenceTransformerBackend(spec)
+    if prefix == "st":
+        return SentenceTransformerBackend(model_name)
+    if prefix == "onnx":
+        return OnnxBackend(
+            model_name,
+            quantize=settings.embedding_onnx_quantize,
+            threads=settings.embedding_onnx_threads
+        )
+    return OpenAIEmbeddingBackend(model_name)
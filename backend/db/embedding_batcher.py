@@ -0,0 +1,154 @@
+"""
+زمان‌بند micro-batching برای Embedding پرسش‌های همزمان
+"""
+from typing import Callable, Awaitable, List, Optional, Tuple, Dict, Any, Set
+import asyncio
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    جمع‌آوری درخواست‌های Embedding که در یک پنجره زمانی کوتاه می‌رسند و
+    اجرای آن‌ها در یک فراخوانی encode
+    
+    batch زمانی ارسال می‌شود که یا به max_batch_size برسد یا max_wait_ms از
+    رسیدن اولین درخواست گذشته باشد. نتیجه هر متن به فراخوان خودش برگردانده می‌شود.
+    
+    حداکثر max_concurrent_batches batch همزمان در حال encode است؛ وقتی همه
+    مشغول‌اند درخواست‌های جدید در صف جمع می‌شوند و batch بعدی بزرگ‌تر می‌شود.
+    در بار کم (هیچ batch در حال اجرا نیست) منتظر پنجره زمانی نمی‌ماند.
+    """
+    
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_concurrent_batches: int = 1
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max_concurrent_batches
+        
+        self._queue: "Optional[asyncio.Queue[Tuple[str, asyncio.Future]]]" = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Set[asyncio.Task] = set()
+        
+        self.batches = 0
+        self.items = 0
+    
+    def _ensure_worker(self):
+        """راه‌اندازی تنبل صف و worker در event loop جاری"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """دریافت Embedding یک متن از طریق batch مشترک"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """جمع‌آوری یک batch تا رسیدن به سقف اندازه یا پایان پنجره زمانی"""
+        batch = [await self._queue.get()]
+        
+        # اگر هیچ batch دیگری در حال اجرا نیست، انتظار فقط تأخیر اضافه می‌کند
+        if not self._inflight:
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            return batch
+        
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        
+        try:
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except BaseException:
+            # لغو worker در میانه پنجره: درخواست‌های جمع‌شده به صف برمی‌گردند تا close پاسخ دهد
+            for item in batch:
+                self._queue.put_nowait(item)
+            raise
+        
+        return batch
+    
+    async def _run(self):
+        """حلقه اصلی worker"""
+        while True:
+            # تا آزاد شدن یک ظرفیت encode، درخواست‌ها در صف می‌مانند
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """اجرای encode برای یک batch و رساندن نتیجه به فراخوان‌ها"""
+        try:
+            # درخواست‌هایی که فراخوانشان لغو شده کنار گذاشته می‌شوند
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                return
+            
+            self.batches += 1
+            self.items += len(batch)
+            
+            try:
+                vectors = await self.encode_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self._slots.release()
+    
+    async def close(self):
+        """
+        توقف worker
+        
+        batchهای در حال encode تا پایان اجرا می‌شوند؛ درخواست‌های باقی‌مانده در صف
+        با RuntimeError پاسخ می‌گیرند تا فراخوان‌ها منتظر نمانند.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("EmbeddingBatcher بسته شده است"))
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """آمار batchها"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
@@ -0,0 +1,88 @@
+"""
+کش LRU برای Embeddingها با سقف حافظه
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+import hashlib
+import threading
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    کش LRU برای Embeddingها با کلید (نام مدل + hash متن)
+    
+    اندازه کش بر اساس حجم بایت بردارها محدود می‌شود؛ بردارهای ذخیره‌شده
+    فقط‌خواندنی هستند تا تغییر تصادفی آن‌ها کش را خراب نکند.
+    """
+    
+    def __init__(self, model_name: str, max_bytes: int):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _make_key(self, text: str) -> bytes:
+        """کلید کش: hash نام مدل و متن"""
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode()).digest()
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """دریافت Embeddingهای موجود در کش (برای موارد ناموجود None)"""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = self._make_key(text)
+                vector = self._entries.get(key)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                results.append(vector)
+        return results
+    
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """ذخیره Embeddingها در کش و حذف قدیمی‌ترین موارد در صورت عبور از سقف حافظه"""
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                key = self._make_key(text)
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._bytes -= previous.nbytes
+                self._entries[key] = vector
+                self._bytes += vector.nbytes
+            
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+    
+    def clear(self):
+        """پاک کردن کامل کش"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """آمار کش"""
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
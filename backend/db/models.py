@@ -3,7 +3,10 @@
 """
 from sqlalchemy import Column, Integer, String, Text, DateTime, Float, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker, Session
+from typing import Optional
 from datetime import datetime
 from api.config import settings
 
@@ -17,9 +20,10 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String(500), unique=True, index=True)
     title = Column(String(500))
-    content = Column(Text)
+    content = Column(Text, nullable=True)  # دیگر پر نمی‌شود (متن تکه‌ها در Qdrant است)
+    content_hash = Column(String(64), nullable=True)  # اثر انگشت محتوا برای تشخیص تغییر
     summary = Column(Text, nullable=True)
-    metadata = Column(JSON, nullable=True)
+    meta = Column("metadata", JSON, nullable=True)  # نام metadata در Declarative رزرو شده است
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -30,8 +34,10 @@ class DocumentChunk(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, index=True)
-    chunk_text = Column(Text)
+    chunk_text = Column(Text, nullable=True)  # دیگر پر نمی‌شود
     chunk_index = Column(Integer)
+    chunk_hash = Column(String(64), index=True, nullable=True)
+    point_id = Column(String(64), nullable=True)  # شناسه نقطه در Qdrant
     embedding_vector = Column(JSON, nullable=True)  # در صورت عدم استفاده از Qdrant
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -44,14 +50,71 @@ class SearchHistory(Base):
     query = Column(String(500))
     response = Column(Text)
     sources = Column(JSON)
-    search_type = Column(String(50))  # semantic, web, hybrid
+    search_type = Column(String(50))  # semantic, web, hybrid, cache
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
-# ایجاد موتور دیتابیس
-def get_engine():
-    """دریافت موتور SQLAlchemy"""
-    return create_engine(settings.vector_db_url)
+# موتور مشترک دیتابیس (یک pool اتصال برای کل process)
+_engine: Optional[Engine] = None
+_session_factory = None
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """WAL: خواندن همزمان با نوشتن؛ synchronous=NORMAL در WAL برای پایداری کافی است"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.db_busy_timeout * 1000)}")
+    cursor.close()
+
+
+def get_engine() -> Engine:
+    """
+    دریافت موتور SQLAlchemy (یک‌بار ساخته می‌شود)
+    
+    SQLite فایلی در حالت WAL باز می‌شود؛ برای Postgres و سایر دیتابیس‌ها (vector_db_url)
+    pool اتصال با db_pool_size و db_max_overflow و بررسی اتصال پیش از استفاده ساخته می‌شود.
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+    
+    url = make_url(settings.vector_db_url)
+    if url.get_backend_name() == "sqlite":
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": settings.db_busy_timeout}
+        )
+        if settings.db_sqlite_wal and url.database not in (None, "", ":memory:"):
+            event.listen(engine, "connect", _enable_sqlite_wal)
+    else:
+        engine = create_engine(
+            url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=1800
+        )
+    
+    _engine = engine
+    return _engine
+
+
+def dispose_engine():
+    """بستن اتصال‌های pool (در shutdown)"""
+    global _engine, _session_factory
+    if _engine is not None:
+        _engine.dispose()
+    _engine = None
+    _session_factory = None
+
+
+def get_session() -> Session:
+    """دریافت Session جدید SQLAlchemy"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(bind=get_engine(), expire_on_commit=False)
+    return _session_factory()
 
 
 def init_db():
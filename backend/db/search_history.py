@@ -0,0 +1,128 @@
+"""
+ذخیره تاریخچه جست‌وجوها با تأخیر (write-behind)
+
+رکوردها در حافظه جمع و هر search_history_flush_ms میلی‌ثانیه یا با رسیدن به
+search_history_batch_size رکورد در یک تراکنش (خارج از event loop) درج می‌شوند؛
+بنابراین درخواست جست‌وجو منتظر دیتابیس نمی‌ماند.
+"""
+from typing import Any, Dict, List, Optional
+from collections import deque
+from datetime import datetime
+import asyncio
+from sqlalchemy import insert
+from api.config import settings
+from db.models import SearchHistory, get_session
+
+
+class SearchHistoryWriter:
+    """
+    بافر محدود رکوردهای SearchHistory با ذخیره دسته‌ای در پس‌زمینه
+    
+    با پر شدن بافر (max_pending) رکوردهای جدید دور ریخته و شمرده می‌شوند تا کندی
+    دیتابیس به مصرف حافظه نامحدود منجر نشود. در stop باقی‌مانده بافر ذخیره می‌شود.
+    """
+    
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: "deque[Dict[str, Any]]" = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+    
+    async def start(self):
+        """راه‌اندازی ذخیره دوره‌ای (در startup برنامه)"""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """توقف و ذخیره رکوردهای باقی‌مانده (در shutdown برنامه)"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        
+        # اگر حلقه پیش از اولین دور متوقف شده باشد، ذخیره نهایی اینجا انجام می‌شود
+        await self.flush()
+        if self._pending:
+            print(f"⚠️ {len(self._pending)} رکورد تاریخچه جست‌وجو ذخیره نشد")
+    
+    def record(self, query: str, response: str, sources: List[str], search_type: str):
+        """افزودن یک جست‌وجو به بافر (بدون انتظار؛ قبل از start نادیده گرفته می‌شود)"""
+        if self._task is None or self._stopping:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        
+        self._pending.append({
+            "query": query[:500],
+            "response": response,
+            "sources": sources,
+            "search_type": search_type,
+            "created_at": datetime.utcnow()
+        })
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+    
+    async def _run(self):
+        # پس از درخواست توقف، یک دور دیگر ذخیره انجام و سپس حلقه تمام می‌شود
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+    
+    async def flush(self):
+        """ذخیره همه رکوردهای در انتظار در دسته‌های batch_size تایی"""
+        async with self._flush_lock:
+            while self._pending:
+                rows = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    await asyncio.to_thread(self._insert, rows)
+                except Exception as e:
+                    # بازگرداندن دسته به ابتدای بافر (در حد ظرفیت) برای تلاش در دوره بعد
+                    self.failed_flushes += 1
+                    room = max(0, self.max_pending - len(self._pending))
+                    self._pending.extendleft(reversed(rows[:room]))
+                    self.dropped += len(rows) - min(room, len(rows))
+                    print(f"⚠️ خطا در ذخیره تاریخچه جست‌وجو: {e}")
+                    return
+                self.written += len(rows)
+    
+    @staticmethod
+    def _insert(rows: List[Dict[str, Any]]):
+        with get_session() as session:
+            session.execute(insert(SearchHistory), rows)
+            session.commit()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes
+        }
+
+
+# نمونه سراسری
+search_history = SearchHistoryWriter(
+    flush_interval=settings.search_history_flush_ms / 1000,
+    batch_size=settings.search_history_batch_size,
+    max_pending=settings.search_history_max_pending
+)
@@ -1,12 +1,37 @@
 """
 Vector Store برای ذخیره و جست‌وجوی Embeddings با Qdrant
 """
-from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional, AsyncIterator, Set
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Batch, Distance, VectorParams, Filter, FieldCondition, MatchValue,
+    FilterSelector, PointIdsList, PayloadSchemaType, SetPayload, SetPayloadOperation,
+    HnswConfigDiff, VectorParamsDiff, CollectionParamsDiff, Disabled, SparseVectorParams, SparseIndexParams,
+    SparseVector, NamedSparseVector, PayloadSelectorExclude, IsEmptyCondition, PayloadField, PointStruct,
+    PointVectors, UpdateVectors, UpdateVectorsOperation
+)
 import hashlib
 from api.config import settings
+from db.embedding_cache import EmbeddingCache
+from db.embedding_batcher import EmbeddingBatcher
+from db.embedding_backends import create_embedding_backend, EmbeddingBackend
+from db.bm25_index import (
+    normalize_point_id, bm25_idf, BM25Weights, TermStatsCache, LEXICAL_VECTOR, LEXICAL_TERMS_FIELD, LEXICAL_LENGTH_FIELD
+)
+from db.qdrant_options import build_quantization_config, build_search_params
+
+
+# فیلدهای ایندکس واژگانی در نتایج جست‌وجو برگردانده نمی‌شوند
+RESULT_PAYLOAD = PayloadSelectorExclude(exclude=[LEXICAL_TERMS_FIELD, LEXICAL_LENGTH_FIELD])
+
+# Qdrant محلی روی پوشه ذخیره‌سازی قفل انحصاری می‌گیرد
+LOCAL_MODE_HINT = "حالت local فقط از یک process پشتیبانی می‌کند؛ برای چند worker یا ingest.py همزمان با سرور QDRANT_MODE=remote تنظیم کنید"
+
+# تکه‌هایی که هنوز بردار واژگانی ندارند (ذخیره‌شده پیش از فعال شدن جست‌وجوی ترکیبی)
+MISSING_LEXICAL_FILTER = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key=LEXICAL_LENGTH_FIELD))])
 
 
 class VectorStore:
@@ -14,95 +39,390 @@ class VectorStore:
     
     def __init__(self):
         self.collection_name = settings.qdrant_collection_name
-        self.embedding_model = SentenceTransformer(settings.embedding_model)
-        self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
-        
-        # اتصال به Qdrant (حالت in-memory برای MVP)
-        self.client = QdrantClient(":memory:")  # یا از settings.qdrant_url استفاده کنید
-        
-        # ایجاد کالکشن در صورت عدم وجود
-        self._init_collection()
-    
-    def _init_collection(self):
-        """ایجاد کالکشن در صورت عدم وجود"""
-        try:
-            self.client.get_collection(self.collection_name)
-            print(f"✅ کالکشن {self.collection_name} از قبل موجود است")
-        except:
-            self.client.create_collection(
+        # backend (بر اساس پیشوند embedding_model) و اتصال Qdrant در initialize ساخته می‌شوند
+        self.embedding_backend: Optional[EmbeddingBackend] = None
+        self.embedding_dim: Optional[int] = None
+        self.client: Optional[AsyncQdrantClient] = None
+        
+        # encode سنگین و CPU-bound است؛ در یک executor محدود اجرا می‌شود تا event loop آزاد بماند
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.embedding_workers,
+            thread_name_prefix="embedding"
+        )
+        
+        # کش مشترک Embeddingها برای جست‌وجو و افزودن اسناد
+        self.embedding_cache = EmbeddingCache(
+            model_name=settings.embedding_model,
+            max_bytes=settings.embedding_cache_max_mb * 1024 * 1024
+        )
+        
+        # micro-batching پرسش‌های همزمان در یک فراخوانی encode
+        self.batcher = EmbeddingBatcher(
+            encode_fn=self._encode_batch,
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+            max_concurrent_batches=settings.embedding_workers
+        ) if settings.embedding_batch_enabled else None
+        
+        self.quantization_config = build_quantization_config(
+            settings.qdrant_quantization,
+            always_ram=settings.qdrant_quantization_always_ram
+        )
+        self.search_params = build_search_params(
+            settings.qdrant_search_ef,
+            quantized=self.quantization_config is not None,
+            oversampling=settings.qdrant_search_oversampling,
+            rescore=settings.qdrant_search_rescore
+        )
+        
+        # ایندکس واژگانی BM25 به صورت بردار sparse در همین کالکشن (در _init_collection بررسی می‌شود)
+        self.lexical_enabled = False
+        self.bm25 = BM25Weights(avg_length=settings.hybrid_avg_chunk_terms)
+        self.term_stats = TermStatsCache(ttl_seconds=settings.hybrid_term_stats_ttl)
+    
+    async def initialize(self):
+        """آماده‌سازی Vector Store (باید در startup برنامه فراخوانی شود)"""
+        if self.embedding_backend is None:
+            # خواندن/دانلود وزن‌های مدل در thread تا event loop (و /api/health) پاسخگو بماند
+            self.embedding_backend = await asyncio.to_thread(create_embedding_backend, settings.embedding_model)
+        
+        # ابعاد backendهای راه دور پیش از ساخت کالکشن از سرویس خوانده می‌شود
+        await self.embedding_backend.initialize()
+        self.embedding_dim = self.embedding_backend.dimension
+        
+        # اتصال به Qdrant بر اساس settings.qdrant_mode
+        self.connect()
+        await self._init_collection()
+        
+        if settings.embedding_warmup:
+            await self.warmup()
+    
+    async def warmup(self):
+        """یک encode آزمایشی تا هزینه اجرای اول (تخصیص حافظه، JIT و ...) به اولین پرسش نرسد"""
+        await self._run_encoder(["گرم کردن مدل"])
+    
+    async def close(self):
+        """بستن اتصال Qdrant و executor"""
+        if self.batcher is not None:
+            await self.batcher.close()
+        if self.client is not None:
+            await self.client.close()
+        if self.embedding_backend is not None:
+            await self.embedding_backend.close()
+        self._executor.shutdown(wait=False)
+    
+    def connect(self):
+        """ساخت اتصال Qdrant (در حالت local، بارگذاری و قفل پوشه ذخیره‌سازی)"""
+        if self.client is None:
+            self.client = self._create_client()
+    
+    def _create_client(self) -> AsyncQdrantClient:
+        """
+        ساخت کلاینت Qdrant
+        
+        - memory: داده‌ها فقط در حافظه (با هر راه‌اندازی مجدد از بین می‌روند)
+        - local: ذخیره روی دیسک در settings.qdrant_path (بدون نیاز به سرور)
+        - remote: اتصال به سرور Qdrant در settings.qdrant_url (ترجیحاً با gRPC)
+        """
+        mode = settings.qdrant_mode.lower()
+        
+        if mode == "memory":
+            return AsyncQdrantClient(":memory:")
+        if mode == "local":
+            try:
+                return AsyncQdrantClient(path=settings.qdrant_path)
+            except RuntimeError as e:
+                if "already accessed" not in str(e):
+                    raise
+                raise RuntimeError(
+                    f"پوشه Qdrant محلی {settings.qdrant_path} در اختیار process دیگری است "
+                    f"(worker دیگر uvicorn یا ingest.py)؛ {LOCAL_MODE_HINT}"
+                ) from e
+        if mode == "remote":
+            return AsyncQdrantClient(
+                url=settings.qdrant_url,
+                api_key=settings.qdrant_api_key,
+                prefer_grpc=settings.qdrant_prefer_grpc,
+                grpc_port=settings.qdrant_grpc_port,
+                timeout=settings.qdrant_timeout
+            )
+        
+        raise ValueError(f"حالت Qdrant نامعتبر است: {settings.qdrant_mode} (memory, local یا remote)")
+    
+    async def _init_collection(self):
+        """ایجاد کالکشن در صورت عدم وجود یا استفاده مجدد از کالکشن موجود"""
+        hnsw_config = HnswConfigDiff(m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct)
+        
+        if await self.client.collection_exists(self.collection_name):
+            info = await self.client.get_collection(self.collection_name)
+            
+            vectors_config = info.config.params.vectors
+            if isinstance(vectors_config, VectorParams) and vectors_config.size != self.embedding_dim:
+                raise ValueError(
+                    f"ابعاد بردار کالکشن {self.collection_name} ({vectors_config.size}) "
+                    f"با مدل Embedding ({self.embedding_dim}) سازگار نیست"
+                )
+            
+            print(f"✅ کالکشن {self.collection_name} از قبل موجود است ({info.points_count} سند)")
+            
+            # بردار نام‌دار را نمی‌توان به کالکشن موجود اضافه کرد؛ کالکشن‌های قدیمی فقط جست‌وجوی معنایی دارند
+            self.lexical_enabled = LEXICAL_VECTOR in (info.config.params.sparse_vectors or {})
+            if not self.lexical_enabled:
+                print(
+                    f"⚠️ کالکشن {self.collection_name} بردار واژگانی ندارد؛ جست‌وجوی ترکیبی غیرفعال است "
+                    f"(برای فعال‌سازی، اسناد را در کالکشن جدیدی دوباره ingest کنید)"
+                )
+            
+            if settings.qdrant_mode.lower() == "remote":
+                await self._sync_collection_config(info, hnsw_config)
+        else:
+            await self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.embedding_dim,
-                    distance=Distance.COSINE
-                )
+                    distance=Distance.COSINE,
+                    on_disk=settings.qdrant_on_disk_vectors
+                ),
+                sparse_vectors_config={
+                    LEXICAL_VECTOR: SparseVectorParams(index=SparseIndexParams(on_disk=settings.qdrant_on_disk_vectors))
+                },
+                hnsw_config=hnsw_config,
+                quantization_config=self.quantization_config,
+                on_disk_payload=settings.qdrant_on_disk_payload
             )
-            print(f"✅ کالکشن {self.collection_name} ایجاد شد")
+            self.lexical_enabled = True
+            print(f"✅ کالکشن {self.collection_name} ایجاد شد (quantization: {settings.qdrant_quantization})")
+        
+        # ایندکس payload روی url برای حذف/به‌روزرسانی تکه‌های یک صفحه و روی واژه‌ها برای
+        # شمارش df در BM25 (فقط در سرور Qdrant اثر دارد)
+        if settings.qdrant_mode.lower() == "remote":
+            for field_name in ("url", LEXICAL_TERMS_FIELD):
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType.KEYWORD
+                )
+    
+    async def _sync_collection_config(self, info, hnsw_config: HnswConfigDiff):
+        """
+        اعمال تغییرات تنظیمات ذخیره‌سازی روی کالکشن موجود
+        
+        Qdrant بردارها را در پس‌زمینه دوباره quantize/ایندکس می‌کند؛ جست‌وجو در این مدت ادامه دارد.
+        """
+        config = info.config
+        vectors_config = config.params.vectors
+        changes = {}
+        
+        if config.hnsw_config.m != hnsw_config.m or config.hnsw_config.ef_construct != hnsw_config.ef_construct:
+            changes["hnsw_config"] = hnsw_config
+        
+        if config.quantization_config != self.quantization_config:
+            changes["quantization_config"] = self.quantization_config or Disabled.DISABLED
+        
+        if isinstance(vectors_config, VectorParams) and bool(vectors_config.on_disk) != settings.qdrant_on_disk_vectors:
+            changes["vectors_config"] = {"": VectorParamsDiff(on_disk=settings.qdrant_on_disk_vectors)}
+        
+        if bool(config.params.on_disk_payload) != settings.qdrant_on_disk_payload:
+            changes["collection_params"] = CollectionParamsDiff(on_disk_payload=settings.qdrant_on_disk_payload)
+        
+        if changes:
+            await self.client.update_collection(collection_name=self.collection_name, **changes)
+            print(f"♻️ تنظیمات کالکشن {self.collection_name} به‌روز شد: {', '.join(changes)}")
     
-    def _generate_id(self, text: str) -> str:
+    def generate_id(self, text: str) -> str:
         """تولید ID یکتا برای متن"""
         return hashlib.md5(text.encode()).hexdigest()
     
-    def add_documents(
+    async def _run_encoder(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """اجرای backend Embedding (مدل‌های محلی در executor جداگانه)"""
+        return await self.embedding_backend.aencode(texts, self._executor, show_progress_bar=show_progress_bar)
+    
+    async def _encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """تولید Embeddings با استفاده از کش؛ مدل فقط برای متن‌های جدید اجرا می‌شود"""
+        vectors = self.embedding_cache.get_many(texts)
+        
+        # متن‌های تکراری داخل یک batch فقط یک‌بار encode می‌شوند
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = await self._run_encoder(missing, show_progress_bar=show_progress_bar)
+            self.embedding_cache.put_many(missing, encoded)
+            encoded_by_text = dict(zip(missing, encoded))
+            vectors = [
+                encoded_by_text[text] if vector is None else vector
+                for text, vector in zip(texts, vectors)
+            ]
+        
+        if not vectors:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32, copy=False)
+    
+    async def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """encode یک batch از batcher و ذخیره نتایج در کش"""
+        unique = list(dict.fromkeys(texts))
+        encoded = await self._run_encoder(unique)
+        self.embedding_cache.put_many(unique, encoded)
+        encoded_by_text = dict(zip(unique, encoded))
+        return np.vstack([encoded_by_text[text] for text in texts])
+    
+    async def embed_query(self, query: str) -> np.ndarray:
+        """تولید Embedding برای یک پرسش (از کش یا از طریق micro-batching)"""
+        if self.batcher is None:
+            return (await self._encode([query]))[0]
+        
+        cached = self.embedding_cache.get_many([query])[0]
+        if cached is not None:
+            return cached
+        return await self.batcher.embed(query)
+    
+    async def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """تولید Embedding برای چند سند"""
+        return await self._encode(texts, show_progress_bar=True)
+    
+    async def add_documents(
         self,
         texts: List[str],
-        metadatas: Optional[List[Dict[str, Any]]] = None
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings: Optional[np.ndarray] = None,
+        ids: Optional[List[str]] = None,
+        wait: Optional[bool] = None,
+        token_lists: Optional[List[List[str]]] = None
     ) -> List[str]:
-        """افزودن اسناد به Vector Store"""
+        """
+        افزودن اسناد به Vector Store
+        
+        با token_lists (توکن‌های BM25 هر تکه) بردار واژگانی و واژه‌های هر تکه نیز ذخیره می‌شوند.
+        
+        نقاط در batchهای qdrant_upsert_batch_size تایی و حداکثر qdrant_upsert_parallelism
+        درخواست همزمان ارسال می‌شوند. با wait=False درخواست‌ها پیش از اعمال در ایندکس
+        برمی‌گردند و آخرین batch (پس از پذیرش بقیه) با wait=True به عنوان مانع نهایی
+        ارسال می‌شود؛ به‌روزرسانی‌های یک کالکشن به ترتیب اعمال می‌شوند، پس پس از
+        بازگشت این متد همه نقاط قابل جست‌وجو هستند.
+        """
+        if not texts:
+            return []
         
         if metadatas is None:
             metadatas = [{}] * len(texts)
         
-        # تولید Embeddings
-        embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
+        # تولید Embeddings (در صورتی که از قبل محاسبه نشده باشد)
+        if embeddings is None:
+            embeddings = await self.embed_documents(texts)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
         
-        # تولید IDs
-        ids = [self._generate_id(text) for text in texts]
+        # تولید IDs (در صورتی که از بیرون تعیین نشده باشد)
+        if ids is None:
+            ids = [self.generate_id(text) for text in texts]
         
-        # ایجاد Points
-        points = []
-        for i, (text, embedding, metadata) in enumerate(zip(texts, embeddings, metadatas)):
-            point = PointStruct(
-                id=ids[i],
-                vector=embedding.tolist(),
-                payload={
-                    "text": text,
-                    **metadata
-                }
-            )
-            points.append(point)
+        batch_size = max(1, settings.qdrant_upsert_batch_size)
+        spans = [(start, min(start + batch_size, len(texts))) for start in range(0, len(texts), batch_size)]
+        slots = asyncio.Semaphore(max(1, settings.qdrant_upsert_parallelism))
         
-        # افزودن به Qdrant
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
+        lexical = token_lists is not None and self.lexical_enabled
+        
+        async def upsert(start: int, end: int, wait_for_result: bool):
+            async with slots:
+                # payload و لیست بردارها فقط برای همین batch ساخته می‌شوند
+                vectors = embeddings[start:end].tolist()
+                payloads = [
+                    {"text": text, **metadata}
+                    for text, metadata in zip(texts[start:end], metadatas[start:end])
+                ]
+                if lexical:
+                    sparse_vectors = []
+                    for payload, tokens in zip(payloads, token_lists[start:end]):
+                        sparse_vector, lexical_payload = self._lexical_entry(tokens)
+                        sparse_vectors.append(sparse_vector)
+                        payload.update(lexical_payload)
+                    vectors = {"": vectors, LEXICAL_VECTOR: sparse_vectors}
+                
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=Batch(ids=ids[start:end], vectors=vectors, payloads=payloads),
+                    wait=wait_for_result
+                )
+        
+        wait_each = settings.qdrant_upsert_wait if wait is None else wait
+        await asyncio.gather(*[upsert(start, end, wait_each) for start, end in spans[:-1]])
+        await upsert(*spans[-1], True)
         
-        print(f"✅ {len(texts)} سند به Vector Store اضافه شد")
+        print(f"✅ {len(texts)} سند به Vector Store اضافه شد ({len(spans)} batch)")
         return ids
     
-    def search(
+    def _lexical_entry(self, tokens: List[str]):
+        """بردار sparse و فیلدهای payload واژگانی یک تکه"""
+        indices, values, terms = self.bm25.document(tokens)
+        return (
+            SparseVector(indices=indices, values=values),
+            {LEXICAL_TERMS_FIELD: terms, LEXICAL_LENGTH_FIELD: len(tokens)}
+        )
+    
+    async def delete_points(self, ids: List[str]):
+        """حذف نقاط با شناسه مشخص"""
+        if not ids:
+            return
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=ids)
+        )
+    
+    async def delete_by_url(self, url: str):
+        """حذف همه تکه‌های یک URL"""
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(must=[FieldCondition(key="url", match=MatchValue(value=url))])
+            )
+        )
+    
+    async def count_by_url(self, url: str) -> int:
+        """تعداد تکه‌های ذخیره‌شده برای یک URL"""
+        result = await self.client.count(
+            collection_name=self.collection_name,
+            count_filter=Filter(must=[FieldCondition(key="url", match=MatchValue(value=url))]),
+            exact=True
+        )
+        return result.count
+    
+    async def update_payloads(self, payloads: Dict[str, Dict[str, Any]]):
+        """به‌روزرسانی payload چند نقطه (بدون تغییر بردار) در یک درخواست"""
+        if not payloads:
+            return
+        await self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in payloads.items()
+            ]
+        )
+    
+    async def search(
         self,
         query: str,
         top_k: int = 5,
-        score_threshold: float = 0.5
+        score_threshold: float = 0.5,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """جست‌وجوی معنایی در Vector Store"""
         
         # تولید Embedding برای query
-        query_embedding = self.embedding_model.encode([query])[0]
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
         
         # جست‌وجو در Qdrant
-        results = self.client.search(
+        results = await self.client.search(
             collection_name=self.collection_name,
             query_vector=query_embedding.tolist(),
             limit=top_k,
-            score_threshold=score_threshold
+            score_threshold=score_threshold,
+            search_params=self.search_params,
+            with_payload=RESULT_PAYLOAD
         )
         
         # تبدیل نتایج
         documents = []
         for result in results:
             documents.append({
+                "id": normalize_point_id(result.id),
                 "text": result.payload.get("text", ""),
                 "score": result.score,
                 "metadata": {k: v for k, v in result.payload.items() if k != "text"}
@@ -110,9 +430,125 @@ class VectorStore:
         
         return documents
     
-    def delete_collection(self):
+    async def lexical_search(self, tokens: List[str], top_k: int = 10) -> List[Dict[str, Any]]:
+        """جست‌وجوی BM25 روی بردارهای sparse (امتیاز: مجموع IDF × وزن TF واژه‌های مشترک)"""
+        if not self.lexical_enabled or not tokens:
+            return []
+        
+        idf = await self._idf(set(tokens))
+        indices, values = self.bm25.query(idf)
+        if not indices:
+            return []
+        
+        results = await self.client.search(
+            collection_name=self.collection_name,
+            query_vector=NamedSparseVector(name=LEXICAL_VECTOR, vector=SparseVector(indices=indices, values=values)),
+            limit=top_k,
+            with_payload=RESULT_PAYLOAD
+        )
+        return [
+            {
+                "id": normalize_point_id(result.id),
+                "text": result.payload.get("text", ""),
+                "score": result.score,
+                "metadata": {k: v for k, v in result.payload.items() if k != "text"}
+            }
+            for result in results
+        ]
+    
+    async def _idf(self, terms: Set[str]) -> Dict[str, float]:
+        """IDF واژه‌ها؛ df واژه‌های خارج از کش به صورت همزمان از Qdrant شمرده می‌شود"""
+        doc_count = self.term_stats.get_doc_count()
+        if doc_count is None:
+            doc_count = (await self.client.count(collection_name=self.collection_name, exact=False)).count
+            self.term_stats.set_doc_count(doc_count)
+        
+        df = {term: self.term_stats.get_df(term) for term in terms}
+        missing = [term for term, value in df.items() if value is None]
+        if missing:
+            counts = await asyncio.gather(*[
+                self.client.count(
+                    collection_name=self.collection_name,
+                    count_filter=Filter(must=[FieldCondition(key=LEXICAL_TERMS_FIELD, match=MatchValue(value=term))]),
+                    exact=False
+                )
+                for term in missing
+            ])
+            for term, result in zip(missing, counts):
+                df[term] = result.count
+                self.term_stats.set_df(term, result.count)
+        
+        return {term: bm25_idf(value, max(doc_count, value)) for term, value in df.items() if value}
+    
+    async def count_missing_lexical(self) -> int:
+        """تعداد تکه‌هایی که بردار واژگانی ندارند"""
+        if not self.lexical_enabled:
+            return 0
+        result = await self.client.count(
+            collection_name=self.collection_name,
+            count_filter=MISSING_LEXICAL_FILTER,
+            exact=True
+        )
+        return result.count
+    
+    async def iter_missing_lexical(self, batch_size: int = 256) -> AsyncIterator[List[Dict[str, Any]]]:
+        """پیمایش تکه‌های بدون بردار واژگانی (بدون بردار) به صورت batch"""
+        offset = None
+        while True:
+            records, offset = await self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=MISSING_LEXICAL_FILTER,
+                limit=batch_size,
+                offset=offset,
+                with_payload=RESULT_PAYLOAD,
+                with_vectors=False
+            )
+            if records:
+                yield [{"id": record.id, "text": record.payload.get("text", "")} for record in records]
+            if offset is None:
+                return
+    
+    async def set_lexical(self, ids: List[Any], token_lists: List[List[str]]):
+        """افزودن بردار واژگانی به تکه‌های موجود (بدون تغییر بردار معنایی و متن)"""
+        if not ids or not self.lexical_enabled:
+            return
+        entries = [self._lexical_entry(tokens) for tokens in token_lists]
+        
+        if settings.qdrant_mode.lower() == "remote":
+            operations = []
+            for point_id, (sparse_vector, lexical_payload) in zip(ids, entries):
+                operations.append(UpdateVectorsOperation(update_vectors=UpdateVectors(
+                    points=[PointVectors(id=point_id, vector={LEXICAL_VECTOR: sparse_vector})]
+                )))
+                operations.append(SetPayloadOperation(set_payload=SetPayload(payload=lexical_payload, points=[point_id])))
+            await self.client.batch_update_points(collection_name=self.collection_name, update_operations=operations)
+            return
+        
+        # Qdrant محلی بردار sparse افزوده‌شده با update_vectors را در جست‌وجو نمی‌بیند؛ نقاط با
+        # همه بردارها دوباره upsert می‌شوند. کلاینت محلی بین retrieve و upsert به event loop
+        # برنمی‌گردد، پس نقطه‌ای که در این فاصله حذف شده باشد دوباره ساخته نمی‌شود.
+        records = await self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=ids,
+            with_payload=True,
+            with_vectors=True
+        )
+        entry_by_id = {normalize_point_id(point_id): entry for point_id, entry in zip(ids, entries)}
+        points = []
+        for record in records:
+            sparse_vector, lexical_payload = entry_by_id[normalize_point_id(record.id)]
+            vector = record.vector.get("", []) if isinstance(record.vector, dict) else record.vector
+            points.append(PointStruct(
+                id=record.id,
+                vector={"": vector, LEXICAL_VECTOR: sparse_vector},
+                payload={**record.payload, **lexical_payload}
+            ))
+        if points:
+            await self.client.upsert(collection_name=self.collection_name, points=points)
+    
+    async def delete_collection(self):
         """حذف کالکشن"""
-        self.client.delete_collection(self.collection_name)
+        await self.client.delete_collection(self.collection_name)
         print(f"✅ کالکشن {self.collection_name} حذف شد")
 
 
@@ -0,0 +1,93 @@
+"""
+سرور Embedding مشترک با API سازگار با OpenAI (POST /v1/embeddings)
+
+با اجرای چند worker برای uvicorn، هر worker نسخه جداگانه‌ای از مدل را در حافظه بارگذاری
+می‌کند. با این سرور مدل فقط یک‌بار بارگذاری می‌شود و workerها از backend openai استفاده می‌کنند.
+چند worker به سرور Qdrant نیاز دارند (QDRANT_MODE=remote)؛ حالت local پوشه ذخیره‌سازی را
+قفل می‌کند و فقط یک process را می‌پذیرد:
+
+    python embedding_server.py
+    QDRANT_MODE=remote QDRANT_URL=http://localhost:6333 \\
+    EMBEDDING_MODEL=openai:local EMBEDDING_BASE_URL=http://127.0.0.1:8001/v1 \\
+        uvicorn main:app --workers 4
+
+مدل سرور همان EMBEDDING_MODEL (backendهای sentence-transformers یا onnx) است.
+"""
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from api.config import settings
+from db.embedding_backends import create_embedding_backend, EmbeddingBackend
+
+
+app = FastAPI(title="سرور Embedding", docs_url=None, redoc_url=None)
+
+_backend: Optional[EmbeddingBackend] = None
+_executor = ThreadPoolExecutor(max_workers=settings.embedding_workers, thread_name_prefix="embedding")
+
+
+class EmbeddingsRequest(BaseModel):
+    """درخواست Embedding (زیرمجموعه API سازگار با OpenAI)"""
+    input: Union[str, List[str]]
+    model: str = ""
+    encoding_format: str = "float"  # float | base64
+
+
+@app.on_event("startup")
+async def startup_event():
+    global _backend
+    if settings.embedding_model.startswith("openai:"):
+        raise RuntimeError("مدل سرور Embedding باید محلی باشد (sentence-transformers یا onnx)")
+    
+    _backend = await asyncio.to_thread(create_embedding_backend, settings.embedding_model)
+    await _backend.initialize()
+    if settings.embedding_warmup:
+        await _backend.aencode(["گرم کردن مدل"], _executor)
+    print(f"✅ سرور Embedding آماده است: {settings.embedding_model} ({_backend.dimension} بعد)")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _backend is not None:
+        await _backend.close()
+    _executor.shutdown(wait=False)
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy" if _backend is not None else "starting"}
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: EmbeddingsRequest):
+    if _backend is None:
+        raise HTTPException(status_code=503, detail="مدل در حال بارگذاری است")
+    
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    vectors = np.asarray(await _backend.aencode(texts, _executor), dtype=np.float32)
+    
+    if request.encoding_format == "base64":
+        embeddings = [base64.b64encode(vector.tobytes()).decode() for vector in vectors]
+    else:
+        embeddings = vectors.tolist()
+    
+    return {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": index, "embedding": embedding}
+            for index, embedding in enumerate(embeddings)
+        ],
+        "model": request.model or settings.embedding_model,
+        "usage": {"prompt_tokens": 0, "total_tokens": 0}
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=settings.host, port=settings.embedding_server_port)
@@ -0,0 +1,101 @@
+"""
+افزودن دسته‌ای اسناد محلی از خط فرمان با خط لوله چند-process
+
+نمونه اجرا:
+    python ingest.py ./docs                  # همه فایل‌های .txt و .md پوشه (بازگشتی)
+    python ingest.py data.jsonl --workers 8  # هر خط: {"url": ..., "title": ..., "content": ...}
+
+در حالت QDRANT_MODE=local پوشه Qdrant قفل می‌شود؛ هنگام اجرای سرور API از حالت
+remote استفاده کنید یا اسناد را از طریق POST /api/ingest-jobs/documents بفرستید.
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+
+
+def iter_directory(path: Path, patterns: List[str]) -> AsyncIterator[Dict[str, Any]]:
+    """اسناد فایل‌های متنی یک پوشه (شناسه سند: file:// مسیر مطلق)"""
+    async def generate():
+        for pattern in patterns:
+            for file in sorted(path.rglob(pattern)):
+                if not file.is_file():
+                    continue
+                content = await asyncio.to_thread(file.read_text, encoding="utf-8", errors="ignore")
+                yield {"url": file.resolve().as_uri(), "title": file.stem, "content": content}
+    return generate()
+
+
+def iter_jsonl(path: Path) -> AsyncIterator[Dict[str, Any]]:
+    """اسناد یک فایل JSONL (خط به خط خوانده می‌شود)"""
+    async def generate():
+        with path.open(encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                document = json.loads(line)
+                if not document.get("url"):
+                    raise ValueError(f"خط {line_number}: فیلد url الزامی است")
+                yield document
+    return generate()
+
+
+async def run(args: argparse.Namespace):
+    # ماژول‌های سنگین (مدل Embedding) فقط در process اصلی بارگذاری می‌شوند
+    from db.models import init_db
+    from core.rag_engine import rag_engine
+    from core.ingest_pipeline import IngestPipeline
+    from api.config import settings
+    
+    path = Path(args.path)
+    if path.is_dir():
+        documents = iter_directory(path, args.patterns)
+    elif path.suffix == ".jsonl":
+        documents = iter_jsonl(path)
+    else:
+        raise SystemExit("مسیر باید یک پوشه یا فایل .jsonl باشد")
+    
+    init_db()
+    await rag_engine.initialize()
+    
+    pipeline = IngestPipeline(
+        rag_engine,
+        process_workers=args.workers if args.workers is not None else settings.ingest_process_workers,
+        encode_batch_size=args.batch_size or settings.ingest_encode_batch_size,
+        queue_size=settings.ingest_queue_size
+    )
+    
+    def on_result(url: str, result: Dict[str, Any]):
+        if not result["success"]:
+            print(f"❌ {url}: {result['message']}")
+        elif args.verbose:
+            print(f"✅ {url}: {result['chunks_count']} تکه ({result['added']} جدید)")
+    
+    try:
+        stats = await pipeline.run(documents, on_result=on_result)
+    finally:
+        pipeline.close()
+        await rag_engine.close()
+    
+    print(
+        f"📊 {stats['documents']} سند ({stats['unchanged']} بدون تغییر، {stats['failed']} ناموفق)، "
+        f"{stats['embedded']} تکه جدید در {stats['elapsed_seconds']} ثانیه "
+        f"({stats['chunks_per_second']} تکه در ثانیه)"
+    )
+    if stats["error"]:
+        print(f"⚠️ خواندن اسناد متوقف شد: {stats['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="افزودن دسته‌ای اسناد محلی")
+    parser.add_argument("path", help="پوشه فایل‌های متنی یا فایل JSONL")
+    parser.add_argument("--patterns", nargs="+", default=["*.txt", "*.md"], help="الگوی فایل‌ها در حالت پوشه")
+    parser.add_argument("--workers", type=int, default=None, help="تعداد processهای نرمال‌سازی/تقسیم")
+    parser.add_argument("--batch-size", type=int, default=None, help="اندازه batch در Embedding و upsert")
+    parser.add_argument("--verbose", action="store_true", help="چاپ نتیجه هر سند")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,18 @@
 FastAPI Main Application
 موتور جست‌وجوی فارسی با هوش مصنوعی
 """
-from fastapi import FastAPI
+import asyncio
+import time
+from typing import Optional
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from api.search import router as search_router
 from api.config import settings
-from db.models import init_db
+from core.rag_engine import rag_engine
+from core.ingest_jobs import ingest_job_manager
+from db.models import init_db, dispose_engine
+from db.search_history import search_history
 
 # ایجاد اپلیکیشن FastAPI
 app = FastAPI(
@@ -34,22 +41,77 @@ app.add_middleware(
 app.include_router(search_router, prefix="/api", tags=["جست‌وجو"])
 
 
+# آماده‌سازی موتور در پس‌زمینه (در حالت startup_background_init)
+_initialize_task: Optional[asyncio.Task] = None
+
+
+async def initialize_services():
+    """بارگذاری مدل Embedding، اتصال Qdrant و ابزارهای hazm"""
+    started = time.perf_counter()
+    try:
+        await rag_engine.initialize()
+    except Exception as e:
+        print(f"❌ خطا در آماده‌سازی موتور جست‌وجو: {e}")
+        if not settings.startup_background_init:
+            raise
+        return
+    print(f"✅ موتور جست‌وجو در {time.perf_counter() - started:.1f} ثانیه آماده شد")
+
+
 @app.on_event("startup")
 async def startup_event():
     """رویدادهای هنگام راه‌اندازی"""
+    global _initialize_task
     print("🚀 در حال راه‌اندازی موتور جست‌وجوی فارسی...")
     
+    # Qdrant محلی پوشه ذخیره‌سازی را قفل انحصاری می‌کند؛ اتصال در startup انجام می‌شود تا
+    # worker دوم (با هر launcher) یا اجرای همزمان ingest.py به جای ماندن در حالت 503 متوقف شود
+    if settings.qdrant_mode.lower() == "local":
+        rag_engine.vector_store.connect()
+    
     # مقداردهی اولیه دیتابیس
     try:
         init_db()
         print("✅ دیتابیس آماده است")
+        
+        # ذخیره دسته‌ای تاریخچه جست‌وجوها در پس‌زمینه
+        if settings.search_history_enabled:
+            await search_history.start()
     except Exception as e:
         print(f"⚠️ خطا در مقداردهی دیتابیس: {e}")
     
+    # ثبت کار فقط پس از آماده شدن موتور ممکن است (require_ready)
+    await ingest_job_manager.start()
+    
+    # آماده‌سازی Vector Store؛ در حالت پس‌زمینه سرور بلافاصله درخواست می‌پذیرد
+    if settings.startup_background_init:
+        _initialize_task = asyncio.create_task(initialize_services())
+    else:
+        await initialize_services()
+    
     print(f"✅ سرور در حال اجرا در: http://{settings.host}:{settings.port}")
     print(f"📚 مستندات API: http://{settings.host}:{settings.port}/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """رویدادهای هنگام خاموش شدن"""
+    if _initialize_task is not None and not _initialize_task.done():
+        _initialize_task.cancel()
+    await ingest_job_manager.stop()
+    await rag_engine.close()
+    
+    # ذخیره رکوردهای باقی‌مانده تاریخچه پیش از بستن pool اتصال‌ها
+    await search_history.stop()
+    dispose_engine()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """معیارهای Prometheus (زمان مراحل جست‌وجو و توکن‌های مدل زبانی)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/")
 async def root():
     """صفحه اصلی API"""
@@ -59,9 +121,14 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "search": "/api/search",
+            "search_stream": "/api/search/stream",
             "ingest": "/api/ingest-url",
+            "ingest_jobs": "/api/ingest-jobs",
             "config": "/api/config",
-            "health": "/api/health"
+            "health": "/api/health",
+            "ready": "/api/ready",
+            "search_history": "/api/search-history/stats",
+            "metrics": "/metrics"
         }
     }
 
@@ -0,0 +1,116 @@
+"""
+تست‌های تقسیم متن به تکه‌ها (core.chunker)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import random
+
+import pytest
+
+from core.chunker import WORD_PATTERN, iter_chunk_spans, iter_chunks
+
+
+SENTENCES = [
+    "تهران پایتخت ایران است.",
+    "اصفهان نصف جهان است!",
+    "آیا شیراز شهر شعر و ادب است؟",
+    "کتابخانه ملی (در تهران) قرار دارد.»",
+    "این جمله علامت پایانی ندارد",
+    "Hello world.",
+]
+
+SIZES = [
+    (1, 0),
+    (2, 1),
+    (3, 1),
+    (3, 2),
+    (5, 4),
+    (8, 3),
+    (10, 5),
+    (10, 9),
+    (50, 10),
+]
+
+
+def make_text(seed: int, sentences: int = 60) -> str:
+    """متن تصادفی با مرز جمله، خط و پاراگراف"""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(sentences):
+        parts.append(rng.choice(SENTENCES))
+        parts.append(rng.choice([" ", " ", " ", "\n", "\n\n", "  "]))
+    return "".join(parts)
+
+
+def word_spans(text: str):
+    return [match.span() for match in WORD_PATTERN.finditer(text)]
+
+
+def word_count(text: str, start: int, end: int) -> int:
+    return len(WORD_PATTERN.findall(text, start, end))
+
+
+@pytest.mark.parametrize("chunk_size,overlap", SIZES)
+@pytest.mark.parametrize("seed", range(5))
+def test_spans_cover_all_words(chunk_size, overlap, seed):
+    text = make_text(seed)
+    spans = list(iter_chunk_spans(text, chunk_size, overlap))
+    
+    assert spans
+    for word_start, word_end in word_spans(text):
+        assert any(start <= word_start and word_end <= end for start, end in spans)
+    
+    words = word_spans(text)
+    assert spans[0][0] == words[0][0]
+    assert spans[-1][1] == words[-1][1]
+
+
+@pytest.mark.parametrize("chunk_size,overlap", SIZES)
+@pytest.mark.parametrize("seed", range(5))
+def test_chunk_size_bounds(chunk_size, overlap, seed):
+    text = make_text(seed)
+    for start, end in iter_chunk_spans(text, chunk_size, overlap):
+        assert 1 <= word_count(text, start, end) <= chunk_size
+
+
+@pytest.mark.parametrize("chunk_size,overlap", SIZES)
+@pytest.mark.parametrize("seed", range(5))
+def test_ends_strictly_increasing(chunk_size, overlap, seed):
+    text = make_text(seed)
+    spans = list(iter_chunk_spans(text, chunk_size, overlap))
+    
+    for (previous_start, previous_end), (start, end) in zip(spans, spans[1:]):
+        assert end > previous_end
+        assert start > previous_start
+
+
+def test_no_suffix_chunk_with_large_overlap():
+    # با overlap >= chunk_size / 2 تکه بعدی نباید فقط پسوندی از تکه قبلی باشد
+    chunks = list(iter_chunks("سلام. خوب است؟ بله خوب است؟ آری.", chunk_size=2, overlap=1))
+    
+    for previous, current in zip(chunks, chunks[1:]):
+        assert not previous.endswith(current)
+
+
+def test_chunks_are_slices_of_text():
+    text = make_text(0)
+    spans = list(iter_chunk_spans(text, 10, 3))
+    assert list(iter_chunks(text, 10, 3)) == [text[start:end] for start, end in spans]
+
+
+def test_prefers_sentence_boundary():
+    text = "یک دو سه. چهار پنج شش هفت هشت"
+    assert next(iter_chunks(text, chunk_size=5, overlap=0)) == "یک دو سه."
+
+
+def test_short_and_empty_text():
+    assert list(iter_chunks("", 5, 1)) == []
+    assert list(iter_chunks("   \n ", 5, 1)) == []
+    assert list(iter_chunks("فقط سه کلمه", 5, 1)) == ["فقط سه کلمه"]
+
+
+@pytest.mark.parametrize("chunk_size,overlap", [(0, 0), (-1, 0), (5, 5), (5, -1)])
+def test_invalid_arguments(chunk_size, overlap):
+    with pytest.raises(ValueError):
+        list(iter_chunk_spans("متن آزمایشی", chunk_size, overlap))
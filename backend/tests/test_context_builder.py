@@ -0,0 +1,98 @@
+"""
+تست‌های ساخت context با بودجه توکن (core.context_builder)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+from core.context_builder import ContextBuilder, MIN_PARTIAL_TOKENS
+
+
+def make_builder(max_tokens: int) -> ContextBuilder:
+    builder = ContextBuilder(max_tokens=max_tokens)
+    # شمارش کلمه به جای tokenizer مدل تا نتایج قطعی باشند
+    builder._count_tokens = lambda text: len(text.split())
+    return builder
+
+
+def chunk(text, url="https://example.com/a", index=0, score=0.5):
+    return {"text": text, "score": score, "metadata": {"url": url, "title": "", "chunk_index": index}}
+
+
+def test_duplicate_texts_are_removed():
+    blocks = make_builder(1000).merge_results([
+        chunk("متن تکراری", index=0),
+        chunk("متن تکراری", url="https://example.com/b", index=3),
+        chunk("  ", index=5),
+    ])
+    
+    assert [block["text"] for block in blocks] == ["متن تکراری"]
+
+
+def test_adjacent_chunks_are_merged_without_overlap():
+    overlap = "این بخش مشترک دو تکه مجاور است"
+    blocks = make_builder(1000).merge_results([
+        chunk(f"{overlap} و ادامه دوم", index=1, score=0.9),
+        chunk(f"آغاز تکه اول {overlap}", index=0, score=0.4),
+    ])
+    
+    assert len(blocks) == 1
+    assert blocks[0]["text"] == f"آغاز تکه اول {overlap} و ادامه دوم"
+    assert blocks[0]["score"] == 0.9
+
+
+def test_contained_chunk_is_skipped():
+    blocks = make_builder(1000).merge_results([
+        chunk("جمله اول. جمله دوم. جمله سوم.", index=0),
+        chunk("جمله دوم.", index=4),
+    ])
+    
+    assert len(blocks) == 1
+
+
+def test_blocks_are_ordered_by_score():
+    blocks = make_builder(1000).merge_results([
+        chunk("کم", url="https://example.com/a", score=0.1),
+        chunk("زیاد", url="https://example.com/b", score=0.9),
+    ])
+    
+    assert [block["source"] for block in blocks] == ["https://example.com/b", "https://example.com/a"]
+
+
+def test_context_respects_token_budget():
+    builder = make_builder(60)
+    results = [
+        chunk(" ".join(["الف"] * 30) + ".", url="https://example.com/a", score=0.9),
+        chunk(" ".join(["ب"] * 30) + ".", url="https://example.com/b", score=0.8),
+        chunk(" ".join(["ج"] * 30) + ".", url="https://example.com/c", score=0.7),
+    ]
+    
+    built = builder.build(results)
+    
+    assert built["tokens"] <= 60
+    assert built["sources"] == ["https://example.com/a"]
+    assert "ب" not in built["context"]
+
+
+def test_last_block_is_truncated_at_sentence_boundary():
+    builder = make_builder(40 + MIN_PARTIAL_TOKENS)
+    first = " ".join(["الف"] * 35) + "."
+    second = " ".join(["ب"] * 20) + ". " + " ".join(["پ"] * 40) + "."
+    
+    built = builder.build([
+        chunk(first, url="https://example.com/a", score=0.9),
+        chunk(second, url="https://example.com/b", score=0.8),
+    ])
+    
+    assert built["blocks"] == 2
+    assert built["tokens"] <= builder.max_tokens
+    assert built["context"].endswith(" ".join(["ب"] * 20) + ".")
+    assert "پ" not in built["context"]
+
+
+def test_single_long_sentence_is_cut_at_word_boundary():
+    builder = make_builder(MIN_PARTIAL_TOKENS + 10)
+    
+    built = builder.build([chunk(" ".join(["کلمه"] * 200))])
+    
+    assert built["blocks"] == 1
+    assert 0 < built["tokens"] <= builder.max_tokens
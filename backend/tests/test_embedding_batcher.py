@@ -0,0 +1,156 @@
+"""
+تست‌های micro-batching پرسش‌های همزمان (db.embedding_batcher)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from db.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEncoder:
+    """encode ساختگی: بردار هر متن شماره آن است؛ با gate می‌توان encode را نگه داشت"""
+    
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+    
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return np.asarray([[float(text)] for text in texts], dtype=np.float32)
+
+
+async def embed_all(batcher, texts):
+    return await asyncio.gather(*[batcher.embed(text) for text in texts])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_batch():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8)
+    try:
+        vectors = await embed_all(batcher, ["1", "2", "3", "4"])
+    finally:
+        await batcher.close()
+    
+    assert encoder.calls == [["1", "2", "3", "4"]]
+    assert [float(vector[0]) for vector in vectors] == [1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_requests_coalesce_while_a_batch_is_running():
+    encoder = FakeEncoder()
+    encoder.gate.clear()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+    try:
+        first = asyncio.create_task(batcher.embed("1"))
+        while not encoder.calls:
+            await asyncio.sleep(0)
+        
+        # encode اول در جریان است؛ درخواست‌های بعدی در batch دوم جمع می‌شوند
+        rest = asyncio.gather(*[batcher.embed(text) for text in ["2", "3", "4"]])
+        await asyncio.sleep(0.01)
+        encoder.gate.set()
+        await first
+        vectors = await rest
+    finally:
+        await batcher.close()
+    
+    assert encoder.calls == [["1"], ["2", "3", "4"]]
+    assert [float(vector[0]) for vector in vectors] == [2, 3, 4]
+    assert batcher.stats()["batches"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_capped():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=3, max_wait_ms=1)
+    texts = [str(i) for i in range(7)]
+    try:
+        vectors = await embed_all(batcher, texts)
+    finally:
+        await batcher.close()
+    
+    assert all(len(call) <= 3 for call in encoder.calls)
+    assert sorted(text for call in encoder.calls for text in call) == sorted(texts)
+    assert [float(vector[0]) for vector in vectors] == list(range(7))
+
+
+@pytest.mark.asyncio
+async def test_error_is_fanned_out_to_every_caller():
+    encoder = FakeEncoder(error=RuntimeError("encode failed"))
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8)
+    try:
+        results = await asyncio.gather(
+            *[batcher.embed(text) for text in ["1", "2", "3"]],
+            return_exceptions=True
+        )
+        
+        # خطای یک batch batcher را از کار نمی‌اندازد
+        encoder.error = None
+        vector = await batcher.embed("4")
+    finally:
+        await batcher.close()
+    
+    assert len(encoder.calls[0]) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert float(vector[0]) == 4
+
+
+@pytest.mark.asyncio
+async def test_cancelled_callers_are_skipped():
+    encoder = FakeEncoder()
+    encoder.gate.clear()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+    try:
+        first = asyncio.create_task(batcher.embed("1"))
+        while not encoder.calls:
+            await asyncio.sleep(0)
+        
+        cancelled = asyncio.create_task(batcher.embed("2"))
+        kept = asyncio.create_task(batcher.embed("3"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        
+        encoder.gate.set()
+        await first
+        vector = await kept
+    finally:
+        await batcher.close()
+    
+    assert encoder.calls == [["1"], ["3"]]
+    assert float(vector[0]) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrent_batches", [1, 2])
+async def test_close_fails_queued_requests(concurrent_batches):
+    encoder = FakeEncoder()
+    encoder.gate.clear()
+    batcher = EmbeddingBatcher(
+        encoder, max_batch_size=8, max_wait_ms=1000, max_concurrent_batches=concurrent_batches
+    )
+    first = asyncio.create_task(batcher.embed("1"))
+    while not encoder.calls:
+        await asyncio.sleep(0)
+    
+    # batch اول در حال encode است؛ بقیه در صف (یک ظرفیت) یا پنجره batch بعدی (دو ظرفیت) منتظرند
+    queued = [asyncio.create_task(batcher.embed(text)) for text in ["2", "3"]]
+    await asyncio.sleep(0.01)
+    asyncio.get_running_loop().call_later(0.01, encoder.gate.set)
+    await asyncio.wait_for(batcher.close(), 1.0)
+    
+    assert float((await first)[0]) == 1
+    for task in queued:
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(task, 1.0)
+    assert encoder.calls == [["1"]]
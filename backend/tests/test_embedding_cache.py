@@ -0,0 +1,80 @@
+"""
+تست‌های کش LRU بردارهای Embedding (db.embedding_cache)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import numpy as np
+import pytest
+
+from db.embedding_cache import EmbeddingCache
+
+
+# هر بردار دوبعدی float32 هشت بایت است
+VECTOR_BYTES = 8
+
+
+def vectors(*rows):
+    return np.asarray(rows, dtype=np.float32)
+
+
+def test_hit_and_miss():
+    cache = EmbeddingCache("model", max_bytes=1024)
+    cache.put_many(["یک"], vectors([1, 0]))
+    
+    found, missing = cache.get_many(["یک", "دو"])
+    
+    np.testing.assert_array_equal(found, [1, 0])
+    assert missing is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_keys_include_model_name():
+    first = EmbeddingCache("model-a", max_bytes=1024)
+    second = EmbeddingCache("model-b", max_bytes=1024)
+    assert first._make_key("متن") != second._make_key("متن")
+
+
+def test_evicts_least_recently_used():
+    cache = EmbeddingCache("model", max_bytes=2 * VECTOR_BYTES)
+    cache.put_many(["یک", "دو"], vectors([1, 0], [0, 1]))
+    cache.get_many(["یک"])
+    cache.put_many(["سه"], vectors([1, 1]))
+    
+    one, two, three = cache.get_many(["یک", "دو", "سه"])
+    
+    assert two is None
+    assert one is not None and three is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 2 * VECTOR_BYTES
+
+
+def test_overwrite_keeps_byte_count():
+    cache = EmbeddingCache("model", max_bytes=1024)
+    cache.put_many(["یک"], vectors([1, 0]))
+    cache.put_many(["یک"], vectors([0, 1]))
+    
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == VECTOR_BYTES
+    np.testing.assert_array_equal(cache.get_many(["یک"])[0], [0, 1])
+
+
+def test_cached_vectors_are_read_only():
+    cache = EmbeddingCache("model", max_bytes=1024)
+    source = vectors([1, 0])
+    cache.put_many(["یک"], source)
+    source[0, 0] = 5
+    
+    vector = cache.get_many(["یک"])[0]
+    
+    assert vector[0] == 1
+    with pytest.raises(ValueError):
+        vector[0] = 2
+
+
+def test_disabled_cache_stores_nothing():
+    cache = EmbeddingCache("model", max_bytes=0)
+    cache.put_many(["یک"], vectors([1, 0]))
+    
+    assert cache.get_many(["یک"]) == [None]
+    assert cache.stats()["entries"] == 0
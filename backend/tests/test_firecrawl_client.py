@@ -0,0 +1,79 @@
+"""
+تست‌های تکرار درخواست‌های Firecrawl (core.firecrawl_client)
+
+درخواست‌ها با httpx.MockTransport پاسخ داده می‌شوند (بدون شبکه).
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import httpx
+import pytest
+
+from api.config import settings
+from core.firecrawl_client import FirecrawlClient
+
+
+def make_client(monkeypatch, responses):
+    """کلاینت با پاسخ‌های ترتیبی (کد وضعیت، هدرها) یا استثنا؛ آخرین پاسخ تکرار می‌شود"""
+    monkeypatch.setattr(settings, "firecrawl_max_retries", 3)
+    monkeypatch.setattr(settings, "firecrawl_retry_base_delay", 0.001)
+    monkeypatch.setattr(settings, "firecrawl_retry_max_delay", 0.01)
+    calls = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = responses[min(len(calls), len(responses) - 1)]
+        calls.append(request.url.path)
+        if isinstance(response, Exception):
+            raise response
+        status, headers = response
+        return httpx.Response(status, json={"id": "crawl-1"}, headers=headers)
+    
+    client = FirecrawlClient()
+    client._client = httpx.AsyncClient(base_url="http://firecrawl/v1", transport=httpx.MockTransport(handler))
+    return client, calls
+
+
+@pytest.mark.asyncio
+async def test_idempotent_requests_retry_server_errors(monkeypatch):
+    client, calls = make_client(monkeypatch, [(502, {}), (503, {}), (200, {})])
+    
+    response = await client._request("GET", "/crawl/crawl-1")
+    await client.close()
+    
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("response", [
+    (502, {}),
+    (504, {}),
+    (429, {}),
+    httpx.ReadTimeout("read timeout"),
+])
+async def test_crawl_start_is_not_retried_after_possible_acceptance(monkeypatch, response):
+    client, calls = make_client(monkeypatch, [response, (200, {})])
+    
+    if isinstance(response, Exception):
+        with pytest.raises(httpx.ReadTimeout):
+            await client._start_crawl("https://example.com", max_pages=5, include_paths=None)
+    else:
+        assert await client._start_crawl("https://example.com", max_pages=5, include_paths=None) is None
+    await client.close()
+    
+    assert calls == ["/v1/crawl"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("response", [
+    (429, {"Retry-After": "0"}),
+    httpx.ConnectError("connection refused"),
+])
+async def test_crawl_start_retries_when_not_accepted(monkeypatch, response):
+    client, calls = make_client(monkeypatch, [response, (200, {})])
+    
+    crawl_id = await client._start_crawl("https://example.com", max_pages=5, include_paths=None)
+    await client.close()
+    
+    assert crawl_id == "crawl-1"
+    assert len(calls) == 2
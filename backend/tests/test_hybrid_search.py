@@ -0,0 +1,120 @@
+"""
+تست‌های امتیاز BM25 و ادغام RRF در جست‌وجوی ترکیبی (db.bm25_index و RAGEngine._search)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from api.config import settings
+from core.rag_engine import RAGEngine
+from db.bm25_index import BM25Weights, TermStatsCache, bm25_idf, normalize_point_id
+
+
+def sparse_dot(document, query):
+    """ضرب داخلی بردار sparse سند (اندیس‌ها، وزن‌ها، واژه‌ها) در بردار پرسش"""
+    left_weights = dict(zip(document[0], document[1]))
+    return sum(left_weights.get(index, 0.0) * weight for index, weight in zip(*query))
+
+
+def test_bm25_score_matches_formula():
+    weights = BM25Weights(avg_length=4, k1=1.5, b=0.75)
+    indices, values, terms = weights.document(["تهران", "پایتخت", "تهران", "ایران"])
+    idf = {"تهران": bm25_idf(2, 10), "اصفهان": bm25_idf(1, 10)}
+    
+    score = sparse_dot((indices, values, terms), BM25Weights.query(idf))
+    
+    norm = 1.5 * (1 - 0.75 + 0.75 * 4 / 4)
+    assert score == pytest.approx(idf["تهران"] * 2 * 2.5 / (2 + norm))
+    assert sorted(terms) == sorted({"تهران", "پایتخت", "ایران"})
+
+
+def test_bm25_prefers_rarer_terms_and_shorter_chunks():
+    weights = BM25Weights(avg_length=5)
+    query = BM25Weights.query({"نادر": bm25_idf(1, 100), "رایج": bm25_idf(50, 100)})
+    
+    rare = sparse_dot(weights.document(["نادر", "x", "y"]), query)
+    common = sparse_dot(weights.document(["رایج", "x", "y"]), query)
+    long_rare = sparse_dot(weights.document(["نادر"] + ["x"] * 20), query)
+    
+    assert rare > common
+    assert rare > long_rare
+
+
+def test_term_stats_cache_expires(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("db.bm25_index.time.monotonic", lambda: now[0])
+    cache = TermStatsCache(ttl_seconds=10, max_terms=2)
+    cache.set_df("یک", 1)
+    cache.set_df("دو", 2)
+    cache.set_df("سه", 3)
+    
+    assert cache.get_df("یک") is None
+    assert cache.get_df("سه") == 3
+    now[0] = 11
+    assert cache.get_df("سه") is None
+
+
+def test_point_ids_are_normalized():
+    assert normalize_point_id("0123456789abcdef0123456789abcdef") == "01234567-89ab-cdef-0123-456789abcdef"
+    assert normalize_point_id(42) == "42"
+
+
+def result(point_id, score):
+    return {"id": point_id, "text": f"متن {point_id}", "score": score, "metadata": {"url": point_id}}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(settings, "hybrid_search_enabled", True)
+    monkeypatch.setattr(settings, "hybrid_rrf_k", 60)
+    monkeypatch.setattr(settings, "hybrid_candidates", 10)
+    
+    dense = [result("a", 0.9), result("b", 0.8), result("c", 0.7)]
+    lexical = [result("c", 12.0), result("d", 9.0), result("a", 4.0)]
+    
+    async def search(query, top_k, score_threshold, query_embedding):
+        return dense[:top_k]
+    
+    async def lexical_search(tokens, top_k):
+        return lexical[:top_k]
+    
+    rag = RAGEngine()
+    rag.vector_store = SimpleNamespace(lexical_enabled=True, search=search, lexical_search=lexical_search)
+    rag.tokenize = lambda text: text.split()
+    return rag
+
+
+@pytest.mark.asyncio
+async def test_rrf_fusion_order(engine):
+    results = await engine._search("پرسش", np.zeros(4), top_k=4, score_threshold=0.5)
+    
+    # a و c: 1/61 + 1/63، b و d: 1/62؛ امتیازهای برابر به ترتیب فهرست معنایی می‌مانند
+    assert [item["id"] for item in results] == ["a", "c", "b", "d"]
+    assert results[0]["score"] == pytest.approx(1 / 61 + 1 / 63)
+    
+    by_id = {item["id"]: item for item in results}
+    assert by_id["a"]["vector_score"] == 0.9 and by_id["a"]["lexical_score"] == 4.0
+    assert by_id["b"]["lexical_score"] is None
+    assert by_id["d"]["vector_score"] is None and by_id["d"]["lexical_score"] == 9.0
+
+
+@pytest.mark.asyncio
+async def test_rrf_rewards_agreement_between_lists(engine):
+    results = await engine._search("پرسش", np.zeros(4), top_k=2, score_threshold=0.5)
+    
+    # تکه‌های حاضر در هر دو فهرست بالاتر از تکه‌های تنها در یک فهرست قرار می‌گیرند
+    assert {item["id"] for item in results} == {"a", "c"}
+
+
+@pytest.mark.asyncio
+async def test_dense_only_without_lexical_index(engine):
+    engine.vector_store.lexical_enabled = False
+    
+    results = await engine._search("پرسش", np.zeros(4), top_k=3, score_threshold=0.5)
+    
+    assert [item["id"] for item in results] == ["a", "b", "c"]
+    assert results[0]["score"] == 0.9
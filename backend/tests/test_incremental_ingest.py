@@ -0,0 +1,142 @@
+"""
+تست‌های افزودن افزایشی اسناد (RAGEngine.ingest_document و db.document_store)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from core.rag_engine import RAGEngine
+from db import models
+from db.document_store import DocumentStore
+
+
+class FakeVectorStore:
+    """Vector Store درون حافظه با همان متدهای مورد استفاده در افزودن افزایشی"""
+    
+    lexical_enabled = False
+    
+    def __init__(self):
+        self.points = {}
+        self.embedded = []
+    
+    async def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return np.zeros((len(texts), 4), dtype=np.float32)
+    
+    async def add_documents(self, texts, metadatas, embeddings=None, ids=None, token_lists=None):
+        for point_id, text, metadata in zip(ids, texts, metadatas):
+            self.points[point_id] = {"text": text, **metadata}
+        return ids
+    
+    async def count_by_url(self, url):
+        return sum(1 for payload in self.points.values() if payload["url"] == url)
+    
+    async def delete_by_url(self, url):
+        self.points = {key: payload for key, payload in self.points.items() if payload["url"] != url}
+    
+    async def update_payloads(self, payloads):
+        for point_id, metadata in payloads.items():
+            self.points[point_id].update(metadata)
+    
+    async def delete_points(self, ids):
+        for point_id in ids:
+            self.points.pop(point_id, None)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    database = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=database)
+    monkeypatch.setattr(models, "_engine", database)
+    monkeypatch.setattr(models, "_session_factory", None)
+    
+    rag = RAGEngine()
+    rag.vector_store = FakeVectorStore()
+    rag.document_store = DocumentStore()
+    rag.cache = None
+    
+    async def prepare_chunks_async(content):
+        # هر خط یک تکه (مستقل از chunk_size تنظیمات)
+        return [line for line in content.split("\n") if line]
+    
+    rag.prepare_chunks_async = prepare_chunks_async
+    yield rag
+    database.dispose()
+
+
+URL = "https://example.com/page"
+
+
+@pytest.mark.asyncio
+async def test_first_ingest_adds_all_chunks(engine):
+    result = await engine.ingest_document(URL, "عنوان", "یک\nدو\nسه")
+    
+    assert result["success"]
+    assert (result["chunks_count"], result["added"], result["removed"]) == (3, 3, 0)
+    assert not result["unchanged"]
+    assert len(engine.vector_store.points) == 3
+
+
+@pytest.mark.asyncio
+async def test_unchanged_content_is_skipped(engine):
+    await engine.ingest_document(URL, "عنوان", "یک\nدو\nسه")
+    engine.vector_store.embedded.clear()
+    
+    result = await engine.ingest_document(URL, "عنوان", "یک\nدو\nسه")
+    
+    assert result["unchanged"]
+    assert (result["chunks_count"], result["added"], result["removed"]) == (3, 0, 0)
+    assert engine.vector_store.embedded == []
+
+
+@pytest.mark.asyncio
+async def test_changed_content_embeds_only_new_chunks(engine):
+    await engine.ingest_document(URL, "عنوان", "یک\nدو\nسه")
+    engine.vector_store.embedded.clear()
+    
+    result = await engine.ingest_document(URL, "عنوان جدید", "دو\nچهار\nسه\nپنج")
+    
+    assert (result["chunks_count"], result["added"], result["removed"]) == (4, 2, 1)
+    assert engine.vector_store.embedded == ["چهار", "پنج"]
+    
+    payloads = sorted(engine.vector_store.points.values(), key=lambda payload: payload["chunk_index"])
+    assert [payload["text"] for payload in payloads] == ["دو", "چهار", "سه", "پنج"]
+    assert all(payload["title"] == "عنوان جدید" for payload in payloads)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_chunks_are_embedded_once(engine):
+    result = await engine.ingest_document(URL, "عنوان", "یک\nیک\nدو")
+    
+    assert result["chunks_count"] == 3
+    assert engine.vector_store.embedded == ["یک", "دو"]
+    assert len(engine.vector_store.points) == 2
+
+
+@pytest.mark.asyncio
+async def test_out_of_sync_vector_store_reingests(engine):
+    await engine.ingest_document(URL, "عنوان", "یک\nدو")
+    engine.vector_store.points.clear()
+    
+    result = await engine.ingest_document(URL, "عنوان", "یک\nدو")
+    
+    assert not result["unchanged"]
+    assert result["added"] == 2
+
+
+@pytest.mark.asyncio
+async def test_only_hashes_are_stored_in_sql(engine):
+    await engine.ingest_document(URL, "عنوان", "یک\nدو")
+    
+    with models.get_session() as session:
+        document = session.query(models.Document).one()
+        chunks = session.query(models.DocumentChunk).all()
+    
+    assert document.content is None
+    assert document.content_hash == engine.hash_text("یک\nدو")
+    assert [chunk.chunk_text for chunk in chunks] == [None, None]
+    assert {chunk.point_id for chunk in chunks} == set(engine.vector_store.points)
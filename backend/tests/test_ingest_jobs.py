@@ -0,0 +1,234 @@
+"""
+تست‌های صف کارهای افزودن (core.ingest_jobs)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from core.ingest_jobs import IngestJob, IngestJobManager, TransientIngestError, is_transient
+
+
+class FakeFirecrawl:
+    def __init__(self, failures=None):
+        # تعداد خطاهای پیاپی پیش از موفقیت برای هر URL
+        self.failures = dict(failures or {})
+    
+    async def scrape_url(self, url):
+        # مانند FirecrawlClient: پس از پایان تلاش‌های HTTP، None برمی‌گرداند
+        if self.failures.get(url, 0) > 0:
+            self.failures[url] -= 1
+            return None
+        return {"title": url, "content": "متن صفحه"}
+
+
+class FakeEngine:
+    def __init__(self, failures=None, empty=(), errors=None, unchanged=()):
+        self.firecrawl_client = FakeFirecrawl(failures)
+        self.empty = set(empty)
+        self.errors = dict(errors or {})
+        self.unchanged = set(unchanged)
+        self.ingested = []
+    
+    async def ingest_document(self, url, title, content):
+        self.ingested.append(url)
+        if url in self.errors:
+            raise self.errors[url]
+        if url in self.empty:
+            return {"success": False, "message": "محتوای خالی", "chunks_count": 0}
+        if url in self.unchanged:
+            return {"success": True, "message": "بدون تغییر", "chunks_count": 2, "added": 0}
+        return {"success": True, "message": "ok", "chunks_count": 2, "added": 2}
+
+
+def make_manager(engine, **kwargs):
+    pipeline = SimpleNamespace(close=lambda: None)
+    kwargs.setdefault("workers", 2)
+    kwargs.setdefault("retry_backoff", 0.0)
+    return IngestJobManager(engine, pipeline, **kwargs)
+
+
+async def wait_finished(job, timeout=2.0):
+    async def poll():
+        while not job.is_finished:
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_job_states():
+    job = IngestJob(kind="urls", urls=["a", "b", "a"])
+    assert list(job.items) == ["a", "b"]
+    assert job.status == "queued"
+    
+    # کار در صف یا در حال کراول پایان نمی‌یابد
+    job.finish_if_done()
+    assert not job.is_finished
+    
+    job.status = "running"
+    job.pending = 1
+    job.finish_if_done()
+    assert not job.is_finished
+    
+    job.pending = 0
+    job.completed, job.failed = 1, 1
+    job.finish_if_done()
+    assert job.status == "completed_with_errors"
+    assert job.is_finished
+
+
+@pytest.mark.parametrize("completed,failed,status", [
+    (2, 0, "completed"),
+    (1, 1, "completed_with_errors"),
+    (0, 2, "failed"),
+])
+def test_final_status(completed, failed, status):
+    job = IngestJob(kind="urls", urls=["a", "b"])
+    job.status = "running"
+    job.completed, job.failed = completed, failed
+    job.finish_if_done()
+    assert job.status == status
+
+
+@pytest.mark.asyncio
+async def test_empty_job_completes_immediately():
+    manager = make_manager(FakeEngine())
+    await manager.start()
+    try:
+        job = manager.submit_urls([])
+        assert job.status == "completed"
+        assert job.is_finished
+        assert job.to_dict()["total"] == 0
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_urls_job_runs_to_completion():
+    engine = FakeEngine()
+    manager = make_manager(engine)
+    await manager.start()
+    try:
+        job = manager.submit_urls(["a", "b", "c"])
+        assert job.status == "queued"
+        await wait_finished(job)
+    finally:
+        await manager.stop()
+    
+    assert job.status == "completed"
+    assert (job.completed, job.failed, job.pending, job.chunks) == (3, 0, 0, 6)
+    assert sorted(engine.ingested) == ["a", "b", "c"]
+    assert all(item["status"] == "completed" for item in job.items.values())
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    engine = FakeEngine(failures={"a": 2, "b": 5})
+    manager = make_manager(engine, max_retries=3)
+    await manager.start()
+    try:
+        job = manager.submit_urls(["a", "b"])
+        await wait_finished(job)
+    finally:
+        await manager.stop()
+    
+    assert job.status == "completed_with_errors"
+    assert job.items["a"]["status"] == "completed"
+    assert job.items["a"]["attempts"] == 3
+    assert job.items["b"]["status"] == "failed"
+    assert job.items["b"]["attempts"] == 4
+    assert manager.retries == 5
+
+
+@pytest.mark.asyncio
+async def test_transient_storage_errors_are_retried():
+    engine = FakeEngine(errors={"a": httpx.ConnectError("connection refused")})
+    manager = make_manager(engine, max_retries=2)
+    await manager.start()
+    try:
+        job = manager.submit_urls(["a"])
+        await wait_finished(job)
+    finally:
+        await manager.stop()
+    
+    assert job.items["a"]["attempts"] == 3
+    assert manager.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_deterministic_errors_fail_on_first_attempt():
+    engine = FakeEngine(errors={"a": ValueError("بعد بردار نادرست")})
+    manager = make_manager(engine, max_retries=3)
+    await manager.start()
+    try:
+        job = manager.submit_urls(["a"])
+        await wait_finished(job)
+    finally:
+        await manager.stop()
+    
+    assert job.status == "failed"
+    assert job.items["a"]["attempts"] == 1
+    assert job.items["a"]["error"] == "بعد بردار نادرست"
+    assert manager.retries == 0
+
+
+def test_transient_errors():
+    response = httpx.Response(503, request=httpx.Request("POST", "http://firecrawl/v1/scrape"))
+    assert is_transient(httpx.HTTPStatusError("503", request=response.request, response=response))
+    assert is_transient(httpx.ReadTimeout("timeout"))
+    assert is_transient(TransientIngestError("empty"))
+    
+    response = httpx.Response(400, request=response.request)
+    assert not is_transient(httpx.HTTPStatusError("400", request=response.request, response=response))
+    assert not is_transient(ValueError("schema"))
+
+
+@pytest.mark.asyncio
+async def test_throughput_counts_only_embedded_chunks():
+    engine = FakeEngine(unchanged=["b"])
+    manager = make_manager(engine)
+    await manager.start()
+    try:
+        job = manager.submit_urls(["a", "b"])
+        await wait_finished(job)
+    finally:
+        await manager.stop()
+    
+    assert job.completed == 2
+    assert job.chunks == 2
+    assert manager.chunks_added == 2
+    assert job.items["b"]["chunks"] == 2
+
+
+@pytest.mark.asyncio
+async def test_empty_content_is_not_retried():
+    engine = FakeEngine(empty=["a"])
+    manager = make_manager(engine)
+    await manager.start()
+    try:
+        job = manager.submit_urls(["a"])
+        await wait_finished(job)
+    finally:
+        await manager.stop()
+    
+    assert job.status == "failed"
+    assert job.items["a"]["attempts"] == 1
+    assert engine.ingested == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_history_evicts_oldest_finished_job():
+    manager = make_manager(FakeEngine(), history_size=2)
+    await manager.start()
+    try:
+        first = manager.submit_urls([])
+        second = manager.submit_urls([])
+        third = manager.submit_urls([])
+    finally:
+        await manager.stop()
+    
+    assert manager.get(first.id) is None
+    assert [job.id for job in manager.list()] == [third.id, second.id]
@@ -0,0 +1,116 @@
+"""
+تست‌های آزادسازی قفل URL در خط لوله افزودن (core.ingest_pipeline)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from core.ingest_pipeline import IngestPipeline
+from core.rag_engine import RAGEngine
+
+
+class FakeVectorStore:
+    def __init__(self, error=None):
+        self.error = error
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+    
+    async def embed_documents(self, texts):
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def pipeline():
+    engine = RAGEngine()
+    engine.vector_store = FakeVectorStore()
+    engine.finished = []
+    
+    async def check_unchanged(url, title, content_hash):
+        return None, None
+    
+    async def plan_chunks(url, title, chunks, previous):
+        return {
+            "records": [],
+            "new_texts": chunks,
+            "new_metadatas": [{"url": url} for _ in chunks],
+            "new_ids": [f"{url}#{i}" for i in range(len(chunks))],
+        }
+    
+    async def store_embedded(texts, metadatas, embeddings, ids):
+        return ids
+    
+    async def finish_ingest(url, title, content_hash, plan, source):
+        engine.finished.append(url)
+        return {"success": True, "url": url, "chunks_count": len(plan["new_texts"]), "added": len(plan["new_texts"])}
+    
+    engine.check_unchanged = check_unchanged
+    engine.plan_chunks = plan_chunks
+    engine.store_embedded = store_embedded
+    engine.finish_ingest = finish_ingest
+    
+    executor = ThreadPoolExecutor(max_workers=1)
+    pipeline = IngestPipeline(engine, process_workers=1, encode_batch_size=8)
+    pipeline._get_pool = lambda: executor
+    yield pipeline
+    executor.shutdown(wait=True)
+
+
+async def documents(*urls):
+    for url in urls:
+        yield {"url": url, "title": "", "content": "یک متن کوتاه برای آزمایش."}
+
+
+async def assert_unlocked(engine, url):
+    assert url not in engine._url_locks
+    await asyncio.wait_for(engine.lock_url(url), 1.0)
+    engine.unlock_url(url)
+
+
+@pytest.mark.asyncio
+async def test_locks_released_after_success(pipeline):
+    pipeline.engine.vector_store.release.set()
+    results = {}
+    
+    stats = await pipeline.run(documents("a", "b"), on_result=results.__setitem__)
+    
+    assert stats["documents"] == 2
+    assert sorted(pipeline.engine.finished) == ["a", "b"]
+    assert all(result["success"] for result in results.values())
+    assert pipeline.engine._url_locks == {}
+
+
+@pytest.mark.asyncio
+async def test_locks_released_after_embedding_error(pipeline):
+    pipeline.engine.vector_store.error = RuntimeError("embedding failed")
+    pipeline.engine.vector_store.release.set()
+    results = {}
+    
+    await pipeline.run(documents("a"), on_result=results.__setitem__)
+    
+    assert not results["a"]["success"]
+    await assert_unlocked(pipeline.engine, "a")
+
+
+@pytest.mark.asyncio
+async def test_locks_released_when_run_is_cancelled(pipeline):
+    vector_store = pipeline.engine.vector_store
+    task = asyncio.create_task(pipeline.run(documents("a")))
+    await asyncio.wait_for(vector_store.started.wait(), 5.0)
+    
+    # سند به مرحله Embedding رسیده و قفل آن به مرحله upsert سپرده شده است
+    assert "a" in pipeline.engine._url_locks
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    
+    assert pipeline.engine.finished == []
+    await assert_unlocked(pipeline.engine, "a")
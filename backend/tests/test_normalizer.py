@@ -0,0 +1,49 @@
+"""
+تست یکسانی خروجی مسیر سریع نرمال‌سازی (core.text_processing.PersianNormalizer) با hazm.Normalizer
+
+همان مجموعه ورودی‌های benchmarks/bench_normalizer.py (پرسش‌ها، پاراگراف‌ها، نویسه‌های مرزی
+و fuzz) در اندازه کوچک‌تر بررسی می‌شود تا تغییر hazm یا شرط‌های مسیر سریع در CI دیده شود.
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import pytest
+
+from benchmarks.bench_chunker import make_document
+from benchmarks.bench_normalizer import FUZZ_TOKENS, make_fuzz, make_reference, reference_document
+from benchmarks.bench_text import make_queries
+from core.text_processing import PARAGRAPH_PATTERN, WHITESPACE_PATTERN, PersianNormalizer, normalize_document
+
+
+CORPORA = {
+    "queries": lambda: make_queries(200),
+    "paragraphs": lambda: [
+        paragraph for paragraph in PARAGRAPH_PATTERN.split(make_document(0.02)) if paragraph.strip()
+    ],
+    "tokens": lambda: FUZZ_TOKENS,
+    "fuzz": lambda: make_fuzz(1000),
+}
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return make_reference()
+
+
+@pytest.fixture(scope="module")
+def fast():
+    normalizer = PersianNormalizer(fast=True)
+    return lambda text: normalizer.normalize(WHITESPACE_PATTERN.sub(' ', text)).strip()
+
+
+@pytest.mark.parametrize("corpus", list(CORPORA))
+def test_fast_path_matches_hazm(corpus, reference, fast):
+    different = [text for text in CORPORA[corpus]() if fast(text) != reference(text)]
+    
+    assert not different, f"{len(different)} خروجی متفاوت، نمونه: {different[0]!r}"
+
+
+def test_document_matches_hazm(reference):
+    text = make_document(0.01)
+    
+    assert normalize_document(text) == reference_document(reference, text)
@@ -0,0 +1,209 @@
+"""
+تست‌های تکرار، Retry-After و hedging کلاینت مدل زبانی (core.openai_client)
+
+درخواست‌ها با httpx.MockTransport پاسخ داده می‌شوند (بدون شبکه).
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, RateLimitError
+
+from api.config import settings
+from core.openai_client import OpenAIClient, LLMError, LLMClientError
+
+
+def completion(text: str) -> dict:
+    return {
+        "id": "x",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "m",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    }
+
+
+class FakeService:
+    """
+    سرویس ساختگی: برای هر host فهرستی از پاسخ‌ها به ترتیب
+    
+    هر پاسخ (کد وضعیت، متن یا بدنه خطا، هدرها، تأخیر ثانیه) است؛ آخرین پاسخ تکرار می‌شود.
+    """
+    
+    def __init__(self, **responses):
+        self.responses = responses
+        self.calls = {host: 0 for host in responses}
+    
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        index = self.calls[host]
+        self.calls[host] += 1
+        status, body, headers, delay = self.responses[host][min(index, len(self.responses[host]) - 1)]
+        if delay:
+            await asyncio.sleep(delay)
+        if status == 200:
+            return httpx.Response(200, json=completion(body), headers=headers)
+        return httpx.Response(status, json={"error": {"message": body, "type": "error"}}, headers=headers)
+
+
+def ok(text="پاسخ", delay=0.0):
+    return (200, text, {}, delay)
+
+
+def fail(status, headers=None):
+    return (status, f"HTTP {status}", headers or {}, 0.0)
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "key")
+    monkeypatch.setattr(settings, "openai_base_url", "http://primary/v1")
+    monkeypatch.setattr(settings, "llm_timeout", 2.0)
+    monkeypatch.setattr(settings, "llm_max_retries", 2)
+    monkeypatch.setattr(settings, "llm_retry_base_delay", 0.001)
+    monkeypatch.setattr(settings, "llm_retry_max_delay", 1.0)
+    monkeypatch.setattr(settings, "llm_hedge_base_url", None)
+    monkeypatch.setattr(settings, "llm_hedge_after_ms", 50.0)
+    
+    def factory(service: FakeService, hedge: bool = False) -> OpenAIClient:
+        if hedge:
+            monkeypatch.setattr(settings, "llm_hedge_base_url", "http://hedge/v1")
+        
+        def build(api_key, base_url):
+            return AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=httpx.AsyncClient(transport=httpx.MockTransport(service))
+            )
+        
+        monkeypatch.setattr(OpenAIClient, "_build_client", staticmethod(build))
+        return OpenAIClient()
+    
+    return factory
+
+
+async def ask(client: OpenAIClient) -> str:
+    try:
+        return await client.chat_completion([{"role": "user", "content": "پرسش"}])
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(make_client):
+    service = FakeService(primary=[fail(503), fail(429), ok("پاسخ نهایی")])
+    
+    assert await ask(make_client(service)) == "پاسخ نهایی"
+    assert service.calls["primary"] == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [500, 429])
+async def test_retries_are_bounded(make_client, status):
+    service = FakeService(primary=[fail(status)])
+    
+    with pytest.raises(LLMError) as info:
+        await ask(make_client(service))
+    
+    assert not isinstance(info.value, LLMClientError)
+    assert service.calls["primary"] == settings.llm_max_retries + 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(make_client):
+    service = FakeService(primary=[fail(401)])
+    
+    with pytest.raises(LLMClientError) as info:
+        await ask(make_client(service))
+    
+    assert info.value.status_code == 401
+    assert service.calls["primary"] == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_header_is_honored(make_client):
+    service = FakeService(primary=[fail(429, {"Retry-After": "0.2"}), ok()])
+    
+    started = time.perf_counter()
+    await ask(make_client(service))
+    
+    assert time.perf_counter() - started >= 0.2
+    assert service.calls["primary"] == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_deadline_fails_fast(make_client, monkeypatch):
+    monkeypatch.setattr(settings, "llm_retry_max_delay", 30.0)
+    service = FakeService(primary=[fail(429, {"Retry-After": "10"}), ok()])
+    
+    started = time.perf_counter()
+    with pytest.raises(LLMError) as info:
+        await ask(make_client(service))
+    
+    # محدودیت نرخ رفع‌نشده خطای موقت است (503)، نه رد درخواست (502)
+    assert not isinstance(info.value, LLMClientError)
+    assert time.perf_counter() - started < 1.0
+    assert service.calls["primary"] == 1
+
+
+def rate_limit(headers: dict) -> RateLimitError:
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://primary/v1"))
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def test_retry_delay(monkeypatch):
+    monkeypatch.setattr(settings, "llm_retry_base_delay", 0.5)
+    monkeypatch.setattr(settings, "llm_retry_max_delay", 8.0)
+    
+    assert OpenAIClient._retry_delay(rate_limit({"Retry-After": "3"}), 0) == 3.0
+    assert OpenAIClient._retry_delay(rate_limit({"Retry-After": "60"}), 0) == 8.0
+    # بدون Retry-After (یا مقدار تاریخ): backoff نمایی با jitter
+    for attempt in range(6):
+        delay = OpenAIClient._retry_delay(rate_limit({"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}), attempt)
+        assert 0 <= delay <= min(8.0, 0.5 * 2 ** attempt)
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged(make_client):
+    service = FakeService(primary=[ok("اصلی", delay=1.0)], hedge=[ok("دوم")])
+    client = make_client(service, hedge=True)
+    
+    started = time.perf_counter()
+    assert await ask(client) == "دوم"
+    
+    assert time.perf_counter() - started < 0.5
+    assert service.calls == {"primary": 1, "hedge": 1}
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged(make_client):
+    service = FakeService(primary=[ok("اصلی")], hedge=[ok("دوم")])
+    
+    assert await ask(make_client(service, hedge=True)) == "اصلی"
+    assert service.calls == {"primary": 1, "hedge": 0}
+
+
+@pytest.mark.asyncio
+async def test_hedge_failure_falls_back_to_primary(make_client):
+    service = FakeService(primary=[ok("اصلی", delay=0.2)], hedge=[fail(401)])
+    
+    assert await ask(make_client(service, hedge=True)) == "اصلی"
+    assert service.calls == {"primary": 1, "hedge": 1}
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_whole_request(make_client, monkeypatch):
+    monkeypatch.setattr(settings, "llm_timeout", 0.2)
+    service = FakeService(primary=[ok(delay=5.0)])
+    
+    started = time.perf_counter()
+    with pytest.raises(LLMError):
+        await ask(make_client(service))
+    
+    assert time.perf_counter() - started < 1.0
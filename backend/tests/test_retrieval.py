@@ -0,0 +1,74 @@
+"""
+تست‌های ادغام نتایج بازیابی (RAGEngine و ContextBuilder)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from api.config import settings
+from core.context_builder import ContextBuilder
+from core.rag_engine import RAGEngine
+
+
+def make_engine(monkeypatch, hybrid: bool) -> RAGEngine:
+    monkeypatch.setattr(settings, "hybrid_search_enabled", hybrid)
+    monkeypatch.setattr(settings, "hybrid_rrf_k", 60)
+    engine = RAGEngine()
+    engine.vector_store = SimpleNamespace(lexical_enabled=True)
+    return engine
+
+
+def hit(point_id: str, score: float, url: str = None, **extra):
+    return {
+        "id": point_id,
+        "text": f"متن {point_id}",
+        "score": score,
+        "metadata": {"url": url or f"https://example.com/{point_id}", "chunk_index": 0},
+        **extra
+    }
+
+
+def test_web_chunks_are_rank_fused_in_hybrid_mode(monkeypatch):
+    engine = make_engine(monkeypatch, hybrid=True)
+    search_results = [hit("dense", 1 / 61 + 1 / 62, vector_score=0.8, lexical_score=3.0)]
+    web_results = [hit("web-low", 0.4), hit("web-high", 0.9)]
+    
+    merged = engine._merge_web_results(search_results, web_results)
+    
+    assert [result["id"] for result in merged] == ["dense", "web-high", "web-low"]
+    assert merged[1]["score"] == pytest.approx(1 / 61)
+    assert merged[1]["vector_score"] == 0.9
+    assert merged[2]["score"] == pytest.approx(1 / 62)
+
+
+def test_web_chunks_keep_cosine_scores_without_hybrid(monkeypatch):
+    engine = make_engine(monkeypatch, hybrid=False)
+    search_results = [hit("dense", 0.6)]
+    web_results = [hit("web-low", 0.4), hit("web-high", 0.9)]
+    
+    merged = engine._merge_web_results(search_results, web_results)
+    
+    assert [result["id"] for result in merged] == ["web-high", "dense", "web-low"]
+    assert merged[0]["score"] == 0.9
+
+
+def test_known_web_chunks_are_not_duplicated(monkeypatch):
+    engine = make_engine(monkeypatch, hybrid=True)
+    search_results = [hit("shared", 1 / 61, vector_score=0.7)]
+    
+    merged = engine._merge_web_results(search_results, [hit("shared", 0.7)])
+    
+    assert merged == search_results
+
+
+def test_context_order_follows_fused_scores(monkeypatch):
+    engine = make_engine(monkeypatch, hybrid=True)
+    search_results = [hit("dense", 1 / 61 + 1 / 61, vector_score=0.6, lexical_score=2.0)]
+    merged = engine._merge_web_results(search_results, [hit("web", 0.9)])
+    
+    blocks = ContextBuilder(max_tokens=1000).merge_results(merged)
+    
+    assert [block["text"] for block in blocks] == ["متن dense", "متن web"]
@@ -0,0 +1,128 @@
+"""
+تست‌های ذخیره write-behind تاریخچه جست‌وجو (db.search_history)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from db import models
+from db.search_history import SearchHistoryWriter
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(models, "_engine", engine)
+    monkeypatch.setattr(models, "_session_factory", None)
+    yield engine
+    engine.dispose()
+
+
+def stored_queries():
+    with models.get_session() as session:
+        return [row.query for row in session.query(models.SearchHistory).order_by(models.SearchHistory.id)]
+
+
+def record(writer, *queries):
+    for query in queries:
+        writer.record(query, "پاسخ", ["https://example.com"], "semantic")
+
+
+async def wait_written(writer, count, timeout=2.0):
+    async def poll():
+        while writer.written < count:
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_records_before_start_are_ignored():
+    writer = SearchHistoryWriter(flush_interval=10, batch_size=10, max_pending=10)
+    record(writer, "یک")
+    
+    assert writer.stats()["pending"] == 0
+    assert not writer.stats()["enabled"]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_without_waiting_for_interval():
+    writer = SearchHistoryWriter(flush_interval=10, batch_size=3, max_pending=100)
+    await writer.start()
+    try:
+        record(writer, "یک", "دو", "سه")
+        await wait_written(writer, 3, timeout=1.0)
+    finally:
+        await writer.stop()
+    
+    assert stored_queries() == ["یک", "دو", "سه"]
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval():
+    writer = SearchHistoryWriter(flush_interval=0.05, batch_size=100, max_pending=100)
+    await writer.start()
+    try:
+        record(writer, "یک")
+        assert stored_queries() == []
+        await wait_written(writer, 1)
+    finally:
+        await writer.stop()
+    
+    assert stored_queries() == ["یک"]
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending_records():
+    writer = SearchHistoryWriter(flush_interval=10, batch_size=100, max_pending=100)
+    await writer.start()
+    record(writer, "یک", "دو")
+    
+    await writer.stop()
+    
+    assert stored_queries() == ["یک", "دو"]
+    assert writer.stats() == {"enabled": False, "pending": 0, "written": 2, "dropped": 0, "failed_flushes": 0}
+    
+    # پس از توقف رکوردی پذیرفته نمی‌شود
+    record(writer, "سه")
+    assert writer.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_new_records():
+    writer = SearchHistoryWriter(flush_interval=10, batch_size=100, max_pending=2)
+    await writer.start()
+    record(writer, "یک", "دو", "سه")
+    
+    assert writer.stats()["dropped"] == 1
+    await writer.stop()
+    assert stored_queries() == ["یک", "دو"]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_records_for_next_round(monkeypatch):
+    writer = SearchHistoryWriter(flush_interval=10, batch_size=100, max_pending=100)
+    insert = writer._insert
+    failures = [RuntimeError("database is locked")]
+    
+    def flaky_insert(rows):
+        if failures:
+            raise failures.pop()
+        insert(rows)
+    
+    monkeypatch.setattr(writer, "_insert", flaky_insert)
+    await writer.start()
+    record(writer, "یک", "دو")
+    
+    await writer.flush()
+    assert writer.stats()["pending"] == 2
+    assert writer.stats()["failed_flushes"] == 1
+    
+    await writer.stop()
+    assert stored_queries() == ["یک", "دو"]
+    assert writer.stats()["dropped"] == 0
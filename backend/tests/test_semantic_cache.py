@@ -0,0 +1,108 @@
+"""
+تست‌های کش معنایی پاسخ‌ها (core.semantic_cache)
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+import numpy as np
+
+from core.semantic_cache import SemanticCache
+
+
+def vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def response(answer, sources=("https://example.com/a",)):
+    return {"answer": answer, "sources": list(sources)}
+
+
+def test_exact_hit():
+    cache = SemanticCache()
+    cache.set("پرسش", vector(1, 0), 5, False, response("پاسخ"))
+    
+    assert cache.get_exact("پرسش", 5, False)["answer"] == "پاسخ"
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_exact_key_includes_search_parameters():
+    cache = SemanticCache()
+    cache.set("پرسش", vector(1, 0), 5, False, response("پاسخ"))
+    
+    assert cache.get_exact("پرسش", 3, False) is None
+    assert cache.get_exact("پرسش", 5, True) is None
+
+
+def test_semantic_hit_above_threshold():
+    cache = SemanticCache(similarity_threshold=0.95)
+    cache.set("پرسش", vector(1, 0), 5, False, response("پاسخ"))
+    
+    assert cache.get_similar(vector(1, 0.1), 5, False)["answer"] == "پاسخ"
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_miss_below_threshold():
+    cache = SemanticCache(similarity_threshold=0.95)
+    cache.set("پرسش", vector(1, 0), 5, False, response("پاسخ"))
+    
+    assert cache.get_similar(vector(1, 1), 5, False) is None
+    assert cache.get_similar(vector(1, 0), 3, False) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_hit_returns_copy():
+    cache = SemanticCache()
+    cache.set("پرسش", vector(1, 0), 5, False, response("پاسخ"))
+    
+    cache.get_exact("پرسش", 5, False)["sources"].append("تغییر")
+    
+    assert cache.get_exact("پرسش", 5, False)["sources"] == ["https://example.com/a"]
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("core.semantic_cache.time.monotonic", lambda: now[0])
+    cache = SemanticCache(ttl_seconds=10)
+    cache.set("پرسش", vector(1, 0), 5, False, response("پاسخ"))
+    
+    now[0] += 11
+    
+    assert cache.get_exact("پرسش", 5, False) is None
+    assert cache.get_similar(vector(1, 0), 5, False) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = SemanticCache(max_entries=2)
+    cache.set("یک", vector(1, 0), 5, False, response("۱"))
+    cache.set("دو", vector(0, 1), 5, False, response("۲"))
+    cache.get_exact("یک", 5, False)
+    cache.set("سه", vector(1, 1), 5, False, response("۳"))
+    
+    assert cache.get_exact("دو", 5, False) is None
+    assert cache.get_exact("یک", 5, False) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_by_source_url():
+    cache = SemanticCache()
+    cache.set("یک", vector(1, 0), 5, False, response("۱", ["https://example.com/a"]))
+    cache.set("دو", vector(0, 1), 5, False, response("۲", ["https://example.com/b"]))
+    
+    assert cache.invalidate(["https://example.com/a"]) == 1
+    assert cache.get_exact("یک", 5, False) is None
+    assert cache.get_exact("دو", 5, False) is not None
+
+
+def test_invalidate_by_new_chunk_similarity():
+    cache = SemanticCache()
+    cache.set("یک", vector(1, 0), 5, False, response("۱"))
+    cache.set("دو", vector(0, 1), 5, False, response("۲"))
+    
+    # تکه جدید فقط به پرسش اول شبیه است
+    removed = cache.invalidate(["https://example.com/new"], np.asarray([[0.9, 0.1]]), score_threshold=0.5)
+    
+    assert removed == 1
+    assert cache.get_exact("یک", 5, False) is None
+    assert cache.get_similar(vector(0, 1), 5, False)["answer"] == "۲"
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,97 @@
+"""
+تست‌های پاسخ stream (RAGEngine.stream_query) و یکسانی آن با process_query
+
+اجرا از پوشه backend:
+    python -m pytest -q tests
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core.rag_engine import RAGEngine
+from core.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def engine():
+    rag = RAGEngine()
+    rag.cache = SemanticCache(max_entries=10, ttl_seconds=60)
+    rag.history = []
+    rag._record_history = lambda *args: rag.history.append(args)
+    
+    async def embed_query(query):
+        return np.ones(4, dtype=np.float32)
+    
+    async def retrieve(normalized_query, use_web_search, top_k, query_embedding):
+        return {
+            "search_results": [{"id": "1", "text": "متن", "score": 0.9, "metadata": {"url": "https://example.com"}}],
+            "context": "متن",
+            "sources": ["https://example.com"],
+            "query_embedding": query_embedding,
+            "search_type": "semantic"
+        }
+    
+    async def stream_rag_response(query, context, sources):
+        for delta in ("پاسخ ", "کامل"):
+            yield delta
+    
+    rag.vector_store = SimpleNamespace(embed_query=embed_query)
+    rag.retrieve = retrieve
+    rag.openai_client = SimpleNamespace(stream_rag_response=stream_rag_response)
+    return rag
+
+
+@pytest.mark.asyncio
+async def test_answer_is_cached_when_client_disconnects_after_done(engine):
+    stream = engine.stream_query("پرسش", top_k=3)
+    async for event, data in stream:
+        if event == "done":
+            break
+    # قطع اتصال کلاینت: generator پس از آخرین رویداد ادامه داده نمی‌شود
+    await stream.aclose()
+    
+    assert data["answer"] == "پاسخ کامل"
+    cached = engine.cache.get_exact("پرسش", 3, False)
+    assert cached["answer"] == "پاسخ کامل"
+    assert len(engine.history) == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_answer_is_streamed(engine):
+    async for _ in engine.stream_query("پرسش", top_k=3):
+        pass
+    
+    events = [event async for event in engine.stream_query("پرسش", top_k=3)]
+    
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[-1][1]["answer"] == "پاسخ کامل"
+    assert engine.history[-1][-1] == "cache"
+
+
+@pytest.mark.asyncio
+async def test_no_results_sources_carry_normalized_query(engine):
+    async def retrieve(normalized_query, use_web_search, top_k, query_embedding):
+        return {"search_results": [], "query_embedding": query_embedding, "search_type": "semantic"}
+    
+    engine.retrieve = retrieve
+    engine.normalize_text = lambda text: text.strip()
+    
+    events = [event async for event in engine.stream_query("  پرسش  ", top_k=3)]
+    
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[0][1]["query"] == "پرسش"
+
+
+@pytest.mark.asyncio
+async def test_no_results_response_carries_normalized_query(engine):
+    async def retrieve(normalized_query, use_web_search, top_k, query_embedding):
+        return {"search_results": [], "query_embedding": query_embedding, "search_type": "semantic"}
+    
+    engine.retrieve = retrieve
+    engine.normalize_text = lambda text: text.strip()
+    
+    response = await engine.process_query("  پرسش  ", top_k=3)
+    
+    assert response["query"] == "پرسش"
+    assert response["sources"] == []